@@ -0,0 +1,227 @@
+"""
+Append-only audit log store.
+
+Entries get a monotonically increasing sequence number and a normalized
+UTC ISO-8601 timestamp. The most recent entries are kept in a fixed-size
+in-memory ring buffer; every entry is also appended to JSONL segment files
+on disk, so older pages and restarts are served from the segments.
+Secondary indexes (user_id, action, record_id) map values to ascending
+sequence numbers, which makes newest-first cursor pagination a bisect
+instead of a sort.
+"""
+
+import json
+import logging
+import os
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+AUDIT_RING_SIZE = int(os.environ.get('AUDIT_RING_SIZE', 50000))
+AUDIT_SEGMENT_MAX_ENTRIES = int(os.environ.get('AUDIT_SEGMENT_MAX_ENTRIES', 100000))
+
+INDEXED_FIELDS = ("user_id", "action", "record_id")
+
+
+def normalize_timestamp(value) -> str:
+    """Return a UTC ISO-8601 string for datetime objects, ISO strings or None."""
+    if value is None:
+        value = datetime.now(timezone.utc)
+    elif isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat()
+
+
+def index_keys(entry: dict) -> Dict[str, List[str]]:
+    """Values an entry is indexed under, per indexed field."""
+    details = entry.get("details") or {}
+    record_ids = list(details.get("record_ids") or [])
+    if details.get("record_id"):
+        record_ids.append(details["record_id"])
+    return {
+        "user_id": [entry["user_id"]] if entry.get("user_id") else [],
+        # Review action (approve, request_verification, ...) rather than the free-text summary
+        "action": [details["action"]] if details.get("action") else [],
+        "record_id": record_ids,
+    }
+
+
+class AuditStore:
+    """Ring buffer + on-disk segments with secondary indexes over sequence numbers."""
+
+    def __init__(self, directory: Optional[Path], ring_size: int = AUDIT_RING_SIZE,
+                 segment_max_entries: int = AUDIT_SEGMENT_MAX_ENTRIES):
+        self.directory = Path(directory) if directory else None
+        self.ring_size = ring_size
+        self.segment_max_entries = segment_max_entries
+
+        self._ring: List[Optional[dict]] = [None] * ring_size
+        self._next_seq = 0
+        self._indexes: Dict[str, Dict[str, array]] = {field: {} for field in INDEXED_FIELDS}
+        self._lock = threading.RLock()
+
+        # Segment bookkeeping: first seq of each segment and byte offset of every line
+        self._segment_starts: List[int] = []
+        self._segment_offsets: List[array] = []
+        self._segment_file = None
+
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._load_segments()
+
+    def __len__(self) -> int:
+        return self._next_seq
+
+    # Writes
+
+    def append(self, entry: dict) -> dict:
+        return self.append_many([entry])[0]
+
+    def append_many(self, entries: Iterable[dict]) -> List[dict]:
+        stored = []
+        with self._lock:
+            for entry in entries:
+                entry = dict(entry)
+                entry["timestamp"] = normalize_timestamp(entry.get("timestamp"))
+                entry["seq"] = self._next_seq
+                if self.directory is not None:
+                    self._write_to_segment(entry)
+                self._remember(entry)
+                stored.append(entry)
+            if self._segment_file is not None:
+                self._segment_file.flush()
+        return stored
+
+    def _remember(self, entry: dict):
+        seq = entry["seq"]
+        self._ring[seq % self.ring_size] = entry
+        for field, values in index_keys(entry).items():
+            for value in values:
+                self._indexes[field].setdefault(value, array('q')).append(seq)
+        self._next_seq = seq + 1
+
+    def _write_to_segment(self, entry: dict):
+        if self._segment_file is None or len(self._segment_offsets[-1]) >= self.segment_max_entries:
+            self._open_segment(entry["seq"])
+        self._segment_offsets[-1].append(self._segment_file.tell())
+        self._segment_file.write(json.dumps(entry, default=str) + "\n")
+
+    def _open_segment(self, first_seq: int):
+        if self._segment_file is not None:
+            self._segment_file.close()
+        path = self.directory / f"segment-{first_seq:012d}.jsonl"
+        self._segment_file = open(path, "a", encoding="utf-8")
+        self._segment_starts.append(first_seq)
+        self._segment_offsets.append(array('q'))
+
+    def _load_segments(self):
+        """Rebuild indexes, offsets and the ring buffer from existing segment files."""
+        paths = sorted(self.directory.glob("segment-*.jsonl"))
+        for path in paths:
+            offsets = array('q')
+            with open(path, "r+b") as f:
+                first_seq = None
+                while True:
+                    offset = f.tell()
+                    line = f.readline()
+                    if not line:
+                        break
+                    if not line.endswith(b"\n"):
+                        # Torn write from a crash: drop the partial line
+                        f.truncate(offset)
+                        break
+                    entry = json.loads(line)
+                    if first_seq is None:
+                        first_seq = entry["seq"]
+                    offsets.append(offset)
+                    self._remember(entry)
+            if first_seq is None:
+                path.unlink()
+                continue
+            self._segment_starts.append(first_seq)
+            self._segment_offsets.append(offsets)
+            last_path = path
+        if self._segment_offsets:
+            self._segment_file = open(last_path, "a", encoding="utf-8")
+        if self._next_seq:
+            logger.info(f"Loaded {self._next_seq} audit log entries from {len(paths)} segments")
+
+    # Reads
+
+    def get(self, seq: int) -> Optional[dict]:
+        if seq >= self._next_seq - self.ring_size:
+            return self._ring[seq % self.ring_size]
+        if self.directory is None:
+            return None
+        segment = bisect_right(self._segment_starts, seq) - 1
+        if segment < 0:
+            return None
+        offsets = self._segment_offsets[segment]
+        position = seq - self._segment_starts[segment]
+        if position >= len(offsets):
+            return None
+        path = self.directory / f"segment-{self._segment_starts[segment]:012d}.jsonl"
+        with open(path, "r", encoding="utf-8") as f:
+            f.seek(offsets[position])
+            return json.loads(f.readline())
+
+    def query(self, limit: int = 100, cursor: Optional[str] = None, user_id: Optional[str] = None,
+              action: Optional[str] = None, record_id: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """
+        Newest-first page of entries matching all given filters.
+
+        Args:
+            limit: Maximum entries to return
+            cursor: Opaque cursor from a previous page (entries older than it)
+            user_id, action, record_id: Optional exact-match filters
+
+        Returns:
+            (entries, next_cursor); next_cursor is None on the last page
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        before = self._next_seq if cursor is None else int(cursor)
+        if before < 0:
+            raise ValueError("Invalid cursor")
+
+        filters = {f: v for f, v in (("user_id", user_id), ("action", action), ("record_id", record_id)) if v}
+
+        with self._lock:
+            if filters:
+                # Walk the most selective index, check the others per entry
+                postings = [self._indexes[f].get(v, array('q')) for f, v in filters.items()]
+                candidates = min(postings, key=len)
+                position = bisect_left(candidates, before)
+                seqs = (candidates[i] for i in range(position - 1, -1, -1))
+            else:
+                seqs = iter(range(min(before, self._next_seq) - 1, -1, -1))
+
+            results = []
+            for seq in seqs:
+                entry = self.get(seq)
+                if entry is None:
+                    continue
+                keys = index_keys(entry)
+                if all(value in keys[field] for field, value in filters.items()):
+                    results.append(entry)
+                    if len(results) > limit:
+                        break
+
+        if len(results) > limit:
+            results = results[:limit]
+            return results, str(results[-1]["seq"])
+        return results, None
+
+    def close(self):
+        with self._lock:
+            if self._segment_file is not None:
+                self._segment_file.close()
+                self._segment_file = None
@@ -0,0 +1,247 @@
+"""
+Write-ahead, batched audit log persistence.
+
+Review handlers hand audit entries to AuditWriter.submit(), which returns
+once the entry is fsynced to a local write-ahead log (one fsync is shared by
+every entry submitted in the same group). A background task then ships
+pending entries to the sink (Mongo `insert_many`) in batches by size or
+time, and records the highest shipped log sequence number (LSN) in a
+checkpoint file. On startup, WAL entries past the checkpoint are replayed.
+
+When the sink falls behind, submit() waits once AUDIT_MAX_PENDING entries
+are unshipped, so memory stays bounded and callers feel the backpressure.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', 500))
+AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL', 1.0))
+AUDIT_MAX_PENDING = int(os.environ.get('AUDIT_MAX_PENDING', 20000))
+AUDIT_WAL_SEGMENT_BYTES = int(os.environ.get('AUDIT_WAL_SEGMENT_BYTES', 16 * 1024 * 1024))
+AUDIT_RETRY_MAX_DELAY = 30.0
+
+
+class AuditWriter:
+    """Group-committed WAL in front of a batched, retrying audit sink."""
+
+    def __init__(self, wal_dir: Path, sink: Callable[[List[dict]], Awaitable[None]],
+                 batch_size: int = AUDIT_BATCH_SIZE, flush_interval: float = AUDIT_FLUSH_INTERVAL,
+                 max_pending: int = AUDIT_MAX_PENDING, segment_bytes: int = AUDIT_WAL_SEGMENT_BYTES):
+        self.wal_dir = Path(wal_dir)
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.segment_bytes = segment_bytes
+
+        self._next_lsn = 1
+        self._checkpoint_lsn = 0
+        self._pending: List[tuple] = []          # (lsn, entry) durable but not shipped
+        self._wal_queue: List[tuple] = []        # (lsn, entry, future) waiting for fsync
+        self._wal_file = None
+        self._segments: List[tuple] = []         # (first_lsn, path)
+        self._wal_wakeup: Optional[asyncio.Event] = None
+        self._flush_wakeup: Optional[asyncio.Event] = None
+        self._space_available: Optional[asyncio.Condition] = None
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+        self._draining = False
+
+        self.stats = {"submitted": 0, "shipped": 0, "batches": 0, "sink_failures": 0, "recovered": 0}
+
+    # Lifecycle
+
+    async def start(self):
+        self.wal_dir.mkdir(parents=True, exist_ok=True)
+        self._wal_wakeup = asyncio.Event()
+        self._flush_wakeup = asyncio.Event()
+        self._space_available = asyncio.Condition()
+        await asyncio.to_thread(self._recover)
+        self._tasks = [
+            asyncio.create_task(self._wal_loop()),
+            asyncio.create_task(self._flush_loop()),
+        ]
+
+    async def stop(self):
+        """Drain the WAL queue, then make a final attempt to ship pending entries."""
+        wal_task, flush_task = self._tasks
+        self._stopping = True
+        self._wal_wakeup.set()
+        # A group being fsynced reaches _pending only once the WAL loop is done with it
+        await asyncio.gather(wal_task, return_exceptions=True)
+        self._draining = True
+        self._flush_wakeup.set()
+        await asyncio.gather(flush_task, return_exceptions=True)
+        if self._wal_file is not None:
+            self._wal_file.close()
+            self._wal_file = None
+
+    # Submission
+
+    async def submit(self, entry: dict):
+        """Queue an entry; returns once it is durable in the local WAL."""
+        async with self._space_available:
+            await self._space_available.wait_for(
+                lambda: len(self._pending) + len(self._wal_queue) < self.max_pending
+            )
+        future = asyncio.get_running_loop().create_future()
+        self._wal_queue.append((self._next_lsn, dict(entry), future))
+        self._next_lsn += 1
+        self.stats["submitted"] += 1
+        self._wal_wakeup.set()
+        await future
+
+    async def submit_many(self, entries: List[dict]):
+        await asyncio.gather(*(self.submit(entry) for entry in entries))
+
+    def status(self) -> dict:
+        return {
+            **self.stats,
+            "pending": len(self._pending),
+            "awaiting_fsync": len(self._wal_queue),
+            "last_lsn": self._next_lsn - 1,
+            "checkpoint_lsn": self._checkpoint_lsn,
+        }
+
+    # WAL (group commit)
+
+    async def _wal_loop(self):
+        while True:
+            await self._wal_wakeup.wait()
+            self._wal_wakeup.clear()
+            group, self._wal_queue = self._wal_queue, []
+            if group:
+                try:
+                    await asyncio.to_thread(self._append_to_wal, [(lsn, entry) for lsn, entry, _ in group])
+                except Exception as e:
+                    logger.error(f"Audit WAL write failed: {e}")
+                    for _, _, future in group:
+                        future.set_exception(e)
+                else:
+                    self._pending.extend((lsn, entry) for lsn, entry, _ in group)
+                    for _, _, future in group:
+                        future.set_result(None)
+                    if len(self._pending) >= self.batch_size:
+                        self._flush_wakeup.set()
+            if self._stopping and not self._wal_queue:
+                return
+
+    def _append_to_wal(self, records: List[tuple]):
+        if self._wal_file is None or self._wal_file.tell() >= self.segment_bytes:
+            self._rotate(records[0][0])
+        for lsn, entry in records:
+            self._wal_file.write(json.dumps({"lsn": lsn, "entry": entry}, default=str) + "\n")
+        self._wal_file.flush()
+        os.fsync(self._wal_file.fileno())
+
+    def _rotate(self, first_lsn: int):
+        if self._wal_file is not None:
+            self._wal_file.close()
+        path = self.wal_dir / f"wal-{first_lsn:012d}.jsonl"
+        self._wal_file = open(path, "a", encoding="utf-8")
+        self._segments.append((first_lsn, path))
+
+    # Shipping to the sink
+
+    async def _flush_loop(self):
+        delay = self.flush_interval
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wakeup.clear()
+
+            failed = False
+            while self._pending and not failed:
+                batch = self._pending[:self.batch_size]
+                try:
+                    await self.sink([entry for _, entry in batch])
+                except Exception as e:
+                    self.stats["sink_failures"] += 1
+                    logger.error(f"Audit sink failed for batch of {len(batch)}: {e}")
+                    failed = True
+                    break
+                del self._pending[:len(batch)]
+                self.stats["shipped"] += len(batch)
+                self.stats["batches"] += 1
+                await asyncio.to_thread(self._checkpoint, batch[-1][0])
+                async with self._space_available:
+                    self._space_available.notify_all()
+                if len(self._pending) < self.batch_size and not self._draining:
+                    break
+
+            # Back off exponentially while the sink is failing
+            delay = min(AUDIT_RETRY_MAX_DELAY, delay * 2) if failed else self.flush_interval
+
+            if self._draining and (failed or not self._pending):
+                return
+
+    def _checkpoint(self, lsn: int):
+        self._checkpoint_lsn = lsn
+        path = self.wal_dir / "checkpoint"
+        tmp_path = self.wal_dir / "checkpoint.tmp"
+        tmp_path.write_text(str(lsn))
+        os.replace(tmp_path, path)
+        # Drop WAL segments whose entries have all been shipped
+        while len(self._segments) > 1 and self._segments[1][0] <= lsn + 1:
+            _, old_path = self._segments.pop(0)
+            old_path.unlink(missing_ok=True)
+
+    # Crash recovery
+
+    def _recover(self):
+        checkpoint_path = self.wal_dir / "checkpoint"
+        if checkpoint_path.exists():
+            self._checkpoint_lsn = int(checkpoint_path.read_text().strip() or 0)
+
+        last_lsn = self._checkpoint_lsn
+        for path in sorted(self.wal_dir.glob("wal-*.jsonl")):
+            first_lsn = int(path.stem.split("-")[1])
+            self._segments.append((first_lsn, path))
+            with open(path, "r+b") as f:
+                while True:
+                    offset = f.tell()
+                    line = f.readline()
+                    if not line:
+                        break
+                    if not line.endswith(b"\n"):
+                        # Torn write: the entry was never acknowledged, drop it
+                        f.truncate(offset)
+                        break
+                    record = json.loads(line)
+                    last_lsn = max(last_lsn, record["lsn"])
+                    if record["lsn"] > self._checkpoint_lsn:
+                        self._pending.append((record["lsn"], record["entry"]))
+
+        self._next_lsn = last_lsn + 1
+        self.stats["recovered"] = len(self._pending)
+        if self._pending:
+            logger.info(f"Recovered {len(self._pending)} unshipped audit entries from the WAL")
+
+
+def mongo_audit_sink(collection) -> Callable[[List[dict]], Awaitable[None]]:
+    """
+    Sink writing batches with insert_many. audit_id is used as _id, so a batch
+    replayed after a crash does not create duplicates.
+    """
+    from pymongo.errors import BulkWriteError
+
+    async def sink(entries: List[dict]):
+        documents = [{**entry, "_id": entry["audit_id"]} for entry in entries]
+        try:
+            await collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            # Duplicate keys (code 11000) are entries shipped before a crash
+            other_errors = [err for err in e.details.get("writeErrors", []) if err.get("code") != 11000]
+            if other_errors or e.details.get("writeConcernErrors"):
+                raise
+
+    return sink
@@ -0,0 +1,385 @@
+"""
+Load test with mixed-role traffic against the backend.
+
+Virtual users log in through /api/auth/dev-login as supervisors, district
+admins, state analysts and policy makers, then loop over weighted journeys
+that mirror how each role uses the portal:
+
+    review_queue       browse flagged records, open a few, approve some
+    household_view     open household graphs
+    dashboard          analytics summary, state table, audit log
+    map_filters        pincode map with changing filters
+    simulation_sweep   policy simulation while dragging the income slider
+
+Concurrency is ramped through stages (e.g. 5, 10, 20, 40 users, each for
+--stage-duration seconds). Every stage reports throughput, latency
+percentiles and error rate, per endpoint and overall. The saturation point
+is the first stage where throughput stops growing with users, p99 exceeds
+--p99-slo-ms or errors exceed --max-error-rate.
+
+Usage:
+    python benchmarks/load_test.py                                 # in-process ASGI app
+    python benchmarks/load_test.py --uvicorn --ramp 10,20,40,80    # spawn a local uvicorn
+    python benchmarks/load_test.py --url http://127.0.0.1:8001     # already running server
+
+In-process and --uvicorn runs read CENSUS_DATA_FILE / CENSUS_MAX_RECORDS
+from the environment like the server does.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCHMARK_DIR.parent
+
+sys.path.insert(0, str(BACKEND_DIR))
+
+from run_benchmarks import percentile  # noqa: E402
+
+# Share of virtual users per role
+ROLE_WEIGHTS = {"supervisor": 0.4, "district_admin": 0.2, "state_analyst": 0.25, "policy_maker": 0.15}
+
+# Journey weights per role
+ROLE_JOURNEYS = {
+    "supervisor": {"review_queue": 0.6, "household_view": 0.3, "map_filters": 0.1},
+    "district_admin": {"review_queue": 0.4, "dashboard": 0.4, "household_view": 0.2},
+    "state_analyst": {"dashboard": 0.6, "map_filters": 0.4},
+    "policy_maker": {"simulation_sweep": 0.6, "map_filters": 0.3, "dashboard": 0.1},
+}
+
+STATES = ["all", "Bihar", "Jharkhand", "Maharashtra", "Uttar Pradesh", "West Bengal"]
+CASTES = [None, "SC", "ST", "OBC", "General"]
+
+
+class Stats:
+    """Latencies and errors per stage and endpoint."""
+
+    def __init__(self):
+        self.stage = 0
+        self.latencies: Dict[int, Dict[str, List[float]]] = defaultdict(lambda: defaultdict(list))
+        self.errors: Dict[int, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.error_samples: Dict[str, str] = {}
+
+    def record(self, endpoint: str, elapsed: float, error: Optional[str]):
+        self.latencies[self.stage][endpoint].append(elapsed * 1000)
+        if error:
+            self.errors[self.stage][endpoint] += 1
+            self.error_samples.setdefault(endpoint, error)
+
+
+class VirtualUser:
+    def __init__(self, client, role: str, headers: dict, stats: Stats, ctx: dict, rng: random.Random,
+                 think_time: float, writes: bool):
+        self.client = client
+        self.role = role
+        self.headers = headers
+        self.stats = stats
+        self.ctx = ctx
+        self.rng = rng
+        self.think_time = think_time
+        self.writes = writes
+
+    async def request(self, endpoint: str, method: str, path: str, **kwargs):
+        start = time.perf_counter()
+        error = None
+        response = None
+        try:
+            response = await self.client.request(method, path, headers=self.headers, **kwargs)
+            await response.aread()
+            if response.status_code >= 400:
+                error = f"HTTP {response.status_code}"
+        except Exception as e:
+            error = type(e).__name__
+        self.stats.record(endpoint, time.perf_counter() - start, error)
+        return response if error is None else None
+
+    async def think(self):
+        if self.think_time > 0:
+            await asyncio.sleep(self.rng.expovariate(1 / self.think_time))
+
+    # Journeys
+
+    async def review_queue(self):
+        response = await self.request("GET /census/records", "GET", "/api/census/records?flag_status=review")
+        records = response.json() if response is not None else []
+        for record in self.rng.sample(records, min(3, len(records))):
+            await self.think()
+            await self.request("GET /census/records/{id}", "GET", f"/api/census/records/{record['record_id']}")
+            if self.writes and self.rng.random() < 0.3:
+                action = self.rng.choice(["approve", "request_verification"])
+                await self.request(
+                    "PUT /census/records/{id}/review", "PUT",
+                    f"/api/census/records/{record['record_id']}/review", json={"action": action},
+                )
+
+    async def household_view(self):
+        household_id = self.rng.choice(self.ctx["household_ids"])
+        await self.request("GET /census/household/{id}", "GET", f"/api/census/household/{household_id}")
+
+    async def dashboard(self):
+        await self.request("GET /analytics/summary", "GET", "/api/analytics/summary")
+        await self.think()
+        await self.request("GET /analytics/states", "GET", "/api/analytics/states")
+        if self.role in ("state_analyst", "district_admin"):
+            await self.think()
+            await self.request("GET /audit/logs", "GET", "/api/audit/logs?limit=50")
+
+    async def map_filters(self):
+        params = {"income_threshold": 50000, "state_filter": "all"}
+        for _ in range(self.rng.randint(2, 5)):
+            # Each filter change re-queries the map
+            params["state_filter"] = self.rng.choice(STATES)
+            params["income_threshold"] = self.rng.choice([25000, 50000, 75000, 100000, 150000])
+            caste = self.rng.choice(CASTES)
+            query = "&".join(f"{k}={v}" for k, v in params.items())
+            if caste:
+                query += f"&caste_filter={caste}"
+            await self.request("GET /analytics/pincode-points", "GET", f"/api/analytics/pincode-points?{query}")
+            await self.think()
+
+    async def simulation_sweep(self):
+        body = {"income_threshold": 10000, "caste_filter": self.rng.choice(CASTES)}
+        # Slider drag: a burst of closely spaced thresholds
+        for threshold in range(self.rng.choice([10000, 50000]), 200001, self.rng.choice([10000, 25000])):
+            body["income_threshold"] = threshold
+            await self.request("POST /policy/simulate", "POST", "/api/policy/simulate", json=body)
+            await asyncio.sleep(self.rng.uniform(0, self.think_time / 5))
+
+    async def run(self, stop: asyncio.Event):
+        journeys = ROLE_JOURNEYS[self.role]
+        names, weights = list(journeys), list(journeys.values())
+        while not stop.is_set():
+            await getattr(self, self.rng.choices(names, weights)[0])()
+            await self.think()
+
+
+async def login(make_client, role: str, index: int) -> dict:
+    # Logins use their own client: the session cookie would otherwise land in
+    # the shared jar and override other users' Bearer tokens mid-run
+    async with make_client() as client:
+        response = await client.post(
+            "/api/auth/dev-login", json={"email": f"load_{role}_{index}@example.com", "role": role}
+        )
+        response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['session_token']}"}
+
+
+async def discover(client, headers: dict) -> dict:
+    """Record and household ids to drive journeys, fetched through the API."""
+    response = await client.get("/api/census/records", headers=headers)
+    response.raise_for_status()
+    records = response.json()
+    household_ids = sorted({r["household_id"] for r in records}) or ["HH0000001"]
+    return {"household_ids": household_ids}
+
+
+def summarize(latencies: List[float], errors: int, duration: float) -> dict:
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "error_rate": round(errors / len(values), 4) if values else 0.0,
+        "throughput_rps": round(len(values) / duration, 1),
+        "p50_ms": round(percentile(values, 50), 1),
+        "p95_ms": round(percentile(values, 95), 1),
+        "p99_ms": round(percentile(values, 99), 1),
+    }
+
+
+def find_saturation(stages: List[dict], p99_slo_ms: float, max_error_rate: float, min_gain: float) -> Optional[dict]:
+    """First stage where adding users stopped paying off or the SLOs broke."""
+    for previous, stage in zip([None] + stages[:-1], stages):
+        overall = stage["overall"]
+        reasons = []
+        if overall["p99_ms"] > p99_slo_ms:
+            reasons.append(f"p99 {overall['p99_ms']}ms > {p99_slo_ms}ms")
+        if overall["error_rate"] > max_error_rate:
+            reasons.append(f"error rate {overall['error_rate']:.1%} > {max_error_rate:.1%}")
+        if previous is not None:
+            gain = overall["throughput_rps"] / max(previous["overall"]["throughput_rps"], 1e-9) - 1
+            if gain < min_gain:
+                reasons.append(f"throughput +{gain:.0%} for {stage['users'] / previous['users']:.1f}x users")
+        if reasons:
+            return {"users": stage["users"], "reasons": reasons,
+                    "last_good_users": previous["users"] if previous else None,
+                    "last_good_rps": previous["overall"]["throughput_rps"] if previous else None}
+    return None
+
+
+async def run_load(client, make_client, args) -> dict:
+    rng = random.Random(args.seed)
+    stats = Stats()
+    stop = asyncio.Event()
+
+    admin_headers = await login(make_client, "supervisor", -1)
+    ctx = await discover(client, admin_headers)
+
+    roles = list(ROLE_WEIGHTS)
+    users: List[asyncio.Task] = []
+    stages = []
+    print(f"{'users':>6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+
+    for index, target in enumerate(args.ramp):
+        stats.stage = index
+        # Ramp-up time counts towards the stage: existing users keep recording meanwhile
+        start = time.perf_counter()
+        while len(users) < target:
+            role = rng.choices(roles, list(ROLE_WEIGHTS.values()))[0]
+            headers = await login(make_client, role, len(users))
+            user = VirtualUser(client, role, headers, stats, ctx, random.Random(rng.random()),
+                               args.think_time, not args.no_writes)
+            users.append(asyncio.create_task(user.run(stop)))
+
+        await asyncio.sleep(args.stage_duration)
+        duration = time.perf_counter() - start
+
+        by_endpoint = stats.latencies[index]
+        errors = stats.errors[index]
+        stage = {
+            "users": target,
+            "duration_s": round(duration, 1),
+            "overall": summarize([v for vs in by_endpoint.values() for v in vs], sum(errors.values()), duration),
+            "endpoints": {ep: summarize(vs, errors.get(ep, 0), duration) for ep, vs in sorted(by_endpoint.items())},
+        }
+        stages.append(stage)
+        o = stage["overall"]
+        print(f"{target:>6}{o['throughput_rps']:>9.1f}{o['p50_ms']:>9.1f}{o['p95_ms']:>9.1f}{o['p99_ms']:>9.1f}"
+              f"{o['error_rate']:>8.1%}")
+
+    stop.set()
+    # Let in-flight journeys finish their current request
+    await asyncio.wait(users, timeout=30)
+    for task in users:
+        task.cancel()
+
+    return {
+        "config": {
+            "target": args.url or ("uvicorn" if args.uvicorn else "in-process"),
+            "ramp": args.ramp,
+            "stage_duration_s": args.stage_duration,
+            "think_time_s": args.think_time,
+            "writes": not args.no_writes,
+        },
+        "stages": stages,
+        "saturation": find_saturation(stages, args.p99_slo_ms, args.max_error_rate, args.min_throughput_gain),
+        "error_samples": stats.error_samples,
+    }
+
+
+def print_report(results: dict):
+    last = results["stages"][-1]
+    print(f"\nPer endpoint at {last['users']} users:")
+    print(f"{'endpoint':<36}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for endpoint, s in last["endpoints"].items():
+        print(f"{endpoint:<36}{s['throughput_rps']:>8.1f}{s['p50_ms']:>9.1f}{s['p95_ms']:>9.1f}{s['p99_ms']:>9.1f}"
+              f"{s['error_rate']:>8.1%}")
+
+    saturation = results["saturation"]
+    if saturation is None:
+        print("\nNo saturation within the ramp")
+    else:
+        print(f"\nSaturated at {saturation['users']} users: {'; '.join(saturation['reasons'])}")
+        if saturation["last_good_users"]:
+            print(f"Last healthy stage: {saturation['last_good_users']} users, {saturation['last_good_rps']} req/s")
+    for endpoint, error in results["error_samples"].items():
+        print(f"  first error on {endpoint}: {error}")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_for_server(url: str, process: subprocess.Popen, timeout: float = 120):
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=url) as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with status {process.returncode}")
+            try:
+                await client.get("/api/")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.5)
+    raise RuntimeError(f"Server at {url} did not start within {timeout}s")
+
+
+async def main_async(args) -> dict:
+    import httpx
+
+    process = None
+    if args.uvicorn:
+        port = free_port()
+        args.url = f"http://127.0.0.1:{port}"
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port),
+             "--log-level", "warning"],
+            cwd=BACKEND_DIR,
+        )
+    try:
+        if args.url:
+            if process is not None:
+                await wait_for_server(args.url, process)
+            limits = httpx.Limits(max_connections=max(args.ramp) + 10)
+
+            def make_client():
+                return httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits)
+        else:
+            import server
+            transport = httpx.ASGITransport(app=server.app)
+
+            def make_client():
+                return httpx.AsyncClient(transport=transport, base_url="http://load", timeout=args.timeout)
+
+        async with make_client() as client:
+            return await run_load(client, make_client, args)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="Base URL of a running server (default: in-process)")
+    target.add_argument("--uvicorn", action="store_true", help="Spawn a local uvicorn for the run")
+    parser.add_argument("--ramp", type=lambda v: [int(x) for x in v.split(",")], default=[5, 10, 20, 40],
+                        help="Comma-separated concurrent users per stage")
+    parser.add_argument("--stage-duration", type=float, default=20.0, help="Seconds per stage")
+    parser.add_argument("--think-time", type=float, default=0.5, help="Mean pause between user actions (s)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout (s)")
+    parser.add_argument("--no-writes", action="store_true", help="Skip review actions")
+    parser.add_argument("--p99-slo-ms", type=float, default=2000.0)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--min-throughput-gain", type=float, default=0.1,
+                        help="Minimum throughput growth between stages before calling it saturated")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, help="Write the full results JSON here")
+    args = parser.parse_args()
+
+    if not args.url:
+        os.environ.setdefault("MONGO_URL", "")
+        os.environ.setdefault("AUDIT_LOG_DIR", "")
+
+    results = asyncio.run(main_async(args))
+    print_report(results)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
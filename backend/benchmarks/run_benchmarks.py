@@ -0,0 +1,302 @@
+"""
+In-process benchmarks of the backend's hot endpoints.
+
+The FastAPI app is driven through httpx's ASGI transport (no network, no
+uvicorn), against either a synthetic dataset of a given size or an existing
+data file. For every endpoint it reports p50/p95/p99 latency, throughput and
+the process peak RSS, and can save the run as a baseline or compare it with
+a saved one.
+
+Usage:
+    python benchmarks/run_benchmarks.py --rows 100k
+    python benchmarks/run_benchmarks.py --rows 1m --save-baseline synthetic_1m
+    python benchmarks/run_benchmarks.py --rows 1m --compare synthetic_1m --max-regression 0.2
+    python benchmarks/run_benchmarks.py --data ../testdata/output.json --only analytics_summary
+
+The response cache is disabled unless --with-cache is given, so repeated
+requests measure the computation rather than cache hits. Comparison exits
+with status 1 when any endpoint's p50 or p99 regressed by more than
+--max-regression.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Optional
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+DATA_DIR = BENCHMARK_DIR / "data"
+BASELINE_DIR = BENCHMARK_DIR / "baselines"
+
+sys.path.insert(0, str(BENCHMARK_DIR.parent))
+
+from synthetic_census import parse_rows, write_dataset  # noqa: E402
+
+ROLES = ["supervisor", "district_admin", "state_analyst", "policy_maker"]
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    role: str
+    path: Callable[[random.Random, dict], str]
+    body: Optional[Callable[[random.Random, dict], dict]] = None
+
+
+def simulate_body(rng: random.Random, ctx: dict) -> dict:
+    return {
+        "income_threshold": rng.choice([25000, 50000, 100000, 150000]),
+        "caste_filter": rng.choice([None, "SC", "ST", "OBC"]),
+        # /policy/simulate matches region_filter against the state
+        "region_filter": rng.choice([None] + ctx["states"]),
+    }
+
+
+def cross_tab_body(rng: random.Random, ctx: dict) -> dict:
+    return {
+        "group_by": [{"field": "caste"}, {"field": "housing_type"}, {"field": "state"}],
+        "measures": [{"op": "count"}, {"op": "mean", "field": "income"}, {"op": "quantile", "field": "income", "q": 0.5}],
+        "filters": [{"field": "age", "op": "gte", "value": rng.choice([0, 18, 60])}],
+    }
+
+
+SCENARIOS = [
+    Scenario("analytics_summary", "GET", "state_analyst", lambda rng, ctx: "/api/analytics/summary"),
+    Scenario("analytics_states", "GET", "state_analyst", lambda rng, ctx: "/api/analytics/states"),
+    Scenario(
+        "analytics_drilldown", "GET", "state_analyst",
+        lambda rng, ctx: f"/api/analytics/drilldown?state={rng.choice(ctx['states'])}&depth=2",
+    ),
+    Scenario(
+        "analytics_pincode_points", "GET", "policy_maker",
+        lambda rng, ctx: f"/api/analytics/pincode-points?income_threshold={rng.choice([25000, 50000, 100000])}",
+    ),
+    Scenario("analytics_query", "POST", "state_analyst", lambda rng, ctx: "/api/analytics/query", cross_tab_body),
+    Scenario("policy_simulate", "POST", "policy_maker", lambda rng, ctx: "/api/policy/simulate", simulate_body),
+    Scenario("census_records", "GET", "supervisor", lambda rng, ctx: "/api/census/records"),
+    Scenario(
+        "census_household", "GET", "supervisor",
+        lambda rng, ctx: f"/api/census/household/{rng.choice(ctx['household_ids'])}",
+    ),
+]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, min(len(sorted_values), round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[rank - 1]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARK_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def resolve_data_file(args) -> Path:
+    if args.data:
+        return args.data.resolve()
+    path = DATA_DIR / f"census_{args.rows}.jsonl"
+    if not path.exists():
+        print(f"Generating {args.rows} synthetic records into {path}...", file=sys.stderr)
+        write_dataset(path, args.rows, "jsonl", args.seed)
+    return path
+
+
+async def login(client, role: str) -> dict:
+    response = await client.post("/api/auth/dev-login", json={"email": f"bench_{role}@example.com", "role": role})
+    response.raise_for_status()
+    # The session cookie would override the Bearer token of other roles
+    client.cookies.clear()
+    return {"Authorization": f"Bearer {response.json()['session_token']}"}
+
+
+async def run_scenario(client, scenario: Scenario, headers: dict, ctx: dict, requests: int,
+                       concurrency: int, warmup: int, seed: int) -> dict:
+    rng = random.Random(seed)
+
+    async def one() -> tuple:
+        path = scenario.path(rng, ctx)
+        body = scenario.body(rng, ctx) if scenario.body else None
+        start = time.perf_counter()
+        response = await client.request(scenario.method, path, headers=headers, json=body)
+        await response.aread()
+        return time.perf_counter() - start, response.status_code < 400
+
+    for _ in range(warmup):
+        await one()
+
+    latencies = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            elapsed, ok = await one()
+            latencies.append(elapsed)
+            errors += 0 if ok else 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    ms = [v * 1000 for v in latencies]
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p95_ms": round(percentile(ms, 95), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+        "mean_ms": round(sum(ms) / len(ms), 2),
+        "throughput_rps": round(requests / wall, 1),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+async def run(args, data_file: Path) -> dict:
+    import httpx
+
+    # Importing the server loads the census data file
+    load_start = time.perf_counter()
+    import server
+    server.generate_mock_census_data()
+    load_seconds = time.perf_counter() - load_start
+    rss_after_load = peak_rss_mb()
+
+    ctx = {
+        "household_ids": list(server.DEMO_DATA_BY_HOUSEHOLD) or ["HH0000001"],
+        "states": list(server.census_rollups.states()) or ["Bihar"],
+    }
+    scenarios = [s for s in SCENARIOS if not args.only or s.name in args.only]
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        tokens = {role: await login(client, role) for role in ROLES}
+        results = {}
+        for scenario in scenarios:
+            results[scenario.name] = await run_scenario(
+                client, scenario, tokens[scenario.role], ctx, args.requests, args.concurrency, args.warmup, args.seed
+            )
+            print_row(scenario.name, results[scenario.name])
+
+    return {
+        "meta": {
+            "data_file": os.path.relpath(data_file, BENCHMARK_DIR.parent),
+            "records": len(server.DEMO_CENSUS_DATA),
+            "load_seconds": round(load_seconds, 2),
+            "rss_after_load_mb": rss_after_load,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "response_cache": args.with_cache,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "git_commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        },
+        "endpoints": results,
+    }
+
+
+def print_row(name: str, result: dict):
+    print(f"{name:<26}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+          f"{result['throughput_rps']:>10.1f}{result['peak_rss_mb']:>10.1f}{result['errors']:>7}")
+
+
+def compare(current: dict, baseline: dict, max_regression: float, min_delta_ms: float) -> bool:
+    """
+    Print per-endpoint deltas; returns False if any p50/p99 got slower by more
+    than max_regression (relative) and min_delta_ms (absolute, to ignore noise
+    on very fast endpoints).
+    """
+    ok = True
+    print(f"\n{'endpoint':<26}{'metric':>16}{'baseline':>10}{'current':>10}{'change':>9}")
+    for name, result in current["endpoints"].items():
+        base = baseline["endpoints"].get(name)
+        if base is None:
+            continue
+        for metric in ("p50_ms", "p99_ms", "throughput_rps", "peak_rss_mb"):
+            change = (result[metric] - base[metric]) / base[metric] if base[metric] else 0.0
+            # Lower is better except for throughput
+            worse = -change if metric == "throughput_rps" else change
+            flag = ""
+            slower_ms = result[metric] - base[metric]
+            if metric in ("p50_ms", "p99_ms") and worse > max_regression and slower_ms > min_delta_ms:
+                flag = "  REGRESSION"
+                ok = False
+            print(f"{name:<26}{metric:>16}{base[metric]:>10.1f}{result[metric]:>10.1f}{change:>+8.0%}{flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--rows", type=parse_rows, default=100_000, help="Synthetic rows (100k, 1m, 10m or a number)")
+    source.add_argument("--data", type=Path, help="Existing .json/.jsonl census file instead of synthetic data")
+    parser.add_argument("--requests", type=int, default=50, help="Measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", nargs="+", choices=[s.name for s in SCENARIOS])
+    parser.add_argument("--with-cache", action="store_true", help="Keep the analytics response cache enabled")
+    parser.add_argument("--output", type=Path, help="Write the results JSON here")
+    parser.add_argument("--save-baseline", metavar="NAME", help="Save results as benchmarks/baselines/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="Compare with benchmarks/baselines/NAME.json")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed p50/p99 slowdown (0.2 = 20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    data_file = resolve_data_file(args)
+
+    # Configure the app before it is imported
+    os.environ["CENSUS_DATA_FILE"] = str(data_file)
+    os.environ["CENSUS_MAX_RECORDS"] = "0"
+    os.environ["MONGO_URL"] = ""
+    os.environ["AUDIT_LOG_DIR"] = ""
+    if not args.with_cache:
+        os.environ["RESPONSE_CACHE_MAX_BYTES"] = "0"
+
+    print(f"{'endpoint':<26}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>10}{'rss MB':>10}{'errors':>7}")
+    results = asyncio.run(run(args, data_file))
+    meta = results["meta"]
+    print(f"\n{meta['records']} records loaded in {meta['load_seconds']}s, {meta['rss_after_load_mb']} MB RSS")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+    if args.save_baseline:
+        BASELINE_DIR.mkdir(parents=True, exist_ok=True)
+        path = BASELINE_DIR / f"{args.save_baseline}.json"
+        path.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"Saved baseline {path}")
+    if args.compare:
+        baseline = json.loads((BASELINE_DIR / f"{args.compare}.json").read_text())
+        if not compare(results, baseline, args.max_regression, args.min_delta_ms):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Serialization and compression benchmark for the largest API payloads.
+
+Compares the stdlib path FastAPI used before (jsonable_encoder + json.dumps)
+with orjson, and reports gzip/brotli sizes and encode times for the
+pincode map, the census record listing and a household graph.
+
+Usage:
+    python benchmarks/serialization_benchmark.py [--repeat 50]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import zlib
+from pathlib import Path
+
+os.environ.setdefault("MONGO_URL", "")
+os.environ.setdefault("AUDIT_LOG_DIR", "")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+import server  # noqa: E402
+from compression import BROTLI_QUALITY, GZIP_LEVEL, brotli  # noqa: E402
+from json_response import dumps  # noqa: E402
+
+
+def stdlib_dumps(content) -> bytes:
+    # Same settings as starlette.responses.JSONResponse
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def time_per_call(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def build_payloads() -> dict:
+    server.generate_mock_census_data()
+    records = list(server.in_memory_db["census_records"].values())
+    user = {"user_id": "bench", "name": "Bench", "role": "supervisor"}
+    household_id = max(server.DEMO_DATA_BY_HOUSEHOLD, key=lambda hh: len(server.DEMO_DATA_BY_HOUSEHOLD[hh]))
+    household = asyncio.run(server.get_household(household_id, user=user))
+    return {
+        "pincode_points": server.compute_pincode_points(
+            limit=5000, state_filter=None, income_threshold=50000, caste_filter=None, sex_filter=None,
+            occupation_filter=None, housing_type_filter=None, household_size_min=None, household_size_max=None
+        ),
+        "census_records": records[:100],
+        "household_graph": json.loads(household.body),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    payloads = build_payloads()
+    print(f"{'payload':<18}{'bytes':>10}{'stdlib ms':>11}{'orjson ms':>11}{'speedup':>9}"
+          f"{'gzip B':>10}{'gzip ms':>9}{'br B':>10}{'br ms':>8}")
+    for name, payload in payloads.items():
+        body = dumps(payload)
+        assert json.loads(body) == json.loads(stdlib_dumps(payload))
+        stdlib_ms = time_per_call(lambda: stdlib_dumps(payload), args.repeat)
+        orjson_ms = time_per_call(lambda: dumps(payload), args.repeat)
+
+        gzipped = zlib.compress(body, GZIP_LEVEL, wbits=31)
+        gzip_ms = time_per_call(lambda: zlib.compress(body, GZIP_LEVEL, wbits=31), args.repeat)
+        if brotli is not None:
+            br_size = str(len(brotli.compress(body, quality=BROTLI_QUALITY)))
+            br_ms = f"{time_per_call(lambda: brotli.compress(body, quality=BROTLI_QUALITY), args.repeat):.2f}"
+        else:
+            br_size = br_ms = "n/a"
+
+        print(f"{name:<18}{len(body):>10}{stdlib_ms:>11.2f}{orjson_ms:>11.2f}{stdlib_ms / orjson_ms:>8.1f}x"
+              f"{len(gzipped):>10}{gzip_ms:>9.2f}{br_size:>10}{br_ms:>8}")
+
+
+if __name__ == "__main__":
+    main()
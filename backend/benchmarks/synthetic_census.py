@@ -0,0 +1,116 @@
+"""
+Synthetic census generator matching the testdata/output.json schema.
+
+Records are generated household by household (every member shares the
+household's state, pin code and household_size) with the same value
+distributions as the demo data, and streamed to disk so 10M rows never sit
+in memory. Output is deterministic for a given seed.
+
+Usage:
+    python benchmarks/synthetic_census.py --rows 1000000 --out benchmarks/data/census_1m.jsonl
+    python benchmarks/synthetic_census.py --rows 100000 --format json --out census_100k.json
+
+`.jsonl` (one record per line) is preferred for large files: the backend
+streams it and stops reading at CENSUS_MAX_RECORDS.
+"""
+
+import argparse
+import json
+import random
+import sys
+from pathlib import Path
+from typing import Iterator
+
+STATES = ["Bihar", "Jharkhand", "Maharashtra", "Uttar Pradesh", "West Bengal"]
+SEXES = ["Male", "Female"]
+RELATIONS = ["Spouse", "Child", "Parent", "Other"]
+CASTES = ["General", "OBC", "SC", "ST"]
+REGIONS = ["Rural", "Urban"]
+RATION_CARDS = ["APL", "BPL", "AAY"]
+EMPLOYMENT = ["employed", "unemployed", "student"]
+OCCUPATIONS = ["none", "labour", "service", "agriculture"]
+SECTORS = ["none", "informal", "formal"]
+HOUSING = ["pucca", "kutcha", "semi-pucca"]
+
+SIZE_PRESETS = {"100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+
+
+def generate_records(rows: int, seed: int = 42) -> Iterator[dict]:
+    rng = random.Random(seed)
+    individual = 0
+    household = 0
+    while individual < rows:
+        household += 1
+        household_id = f"HH{household:07d}"
+        size = min(rng.randint(1, 7), rows - individual)
+        state = rng.choice(STATES)
+        pin_code = str(rng.randint(100000, 999999))
+        for member in range(size):
+            individual += 1
+            yield {
+                "individual_id": f"IND{individual:08d}",
+                "household_id": household_id,
+                "age": rng.randint(0, 90),
+                "sex": rng.choice(SEXES),
+                "relationship_to_head": "Head" if member == 0 else rng.choice(RELATIONS),
+                "caste_category": rng.choice(CASTES),
+                "monthly_income": rng.randint(0, 249999),
+                "urban_rural": rng.choice(REGIONS),
+                "pin_code": pin_code,
+                "state": state,
+                "timestamp": "2024-01-01T00:00:00",
+                "welfare_score": round(rng.uniform(0, 100), 2),
+                "ration_card_type": rng.choice(RATION_CARDS),
+                "scheme_enrollment_count": rng.randint(0, 4),
+                "scheme_leakage_flag": 1 if rng.random() < 0.1 else 0,
+                "exclusion_error_risk_score": round(rng.random(), 3),
+                "employment_status": rng.choice(EMPLOYMENT),
+                "occupation_category": rng.choice(OCCUPATIONS),
+                "sector": rng.choice(SECTORS),
+                "housing_type": rng.choice(HOUSING),
+                "water_source": rng.randint(0, 1),
+                "toilet_access": rng.randint(0, 1),
+                "cooking_fuel": rng.randint(0, 1),
+                "internet_access": rng.randint(0, 1),
+                "household_size": size,
+                "parent_id": "",
+                "spouse_id": "",
+            }
+
+
+def write_dataset(path: Path, rows: int, fmt: str = "jsonl", seed: int = 42) -> Path:
+    """Write `rows` synthetic records to `path` as a JSON array or JSON lines."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        if fmt == "json":
+            # One record per line inside the array keeps the file greppable
+            f.write("[\n")
+            for i, record in enumerate(generate_records(rows, seed)):
+                f.write((",\n" if i else "") + json.dumps(record))
+            f.write("\n]\n")
+        else:
+            for record in generate_records(rows, seed):
+                f.write(json.dumps(record) + "\n")
+    return path
+
+
+def parse_rows(value: str) -> int:
+    return SIZE_PRESETS.get(value.lower()) or int(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=parse_rows, default=100_000, help="Row count or preset (100k, 1m, 10m)")
+    parser.add_argument("--out", type=Path, required=True)
+    parser.add_argument("--format", choices=["json", "jsonl"], default=None,
+                        help="Defaults to the --out file extension")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    fmt = args.format or ("json" if args.out.suffix == ".json" else "jsonl")
+    write_dataset(args.out, args.rows, fmt, args.seed)
+    print(f"Wrote {args.rows} records to {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
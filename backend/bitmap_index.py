@@ -0,0 +1,197 @@
+"""
+Bitmap indexes over the low-cardinality census fields.
+
+For every value of an indexed field (state, caste, sex, occupation, housing
+type, household size, ...) the index keeps one bit per census row, packed
+into uint64 words. Filters become word-wise AND/OR/NOT over these bitmaps
+and counts become a popcount, so a combined eligibility count touches
+rows/64 words per predicate instead of every record.
+
+Filter expressions are nested dicts:
+
+    {"and": [expr, ...]}, {"or": [expr, ...]}, {"not": expr}
+    {"field": "caste", "op": "in", "value": ["SC", "ST"]}
+
+Leaves use the census_columns filter ops (eq, ne, in, not_in, gt, gte, lt,
+lte, between). Range ops on indexed numeric fields OR together the bitmaps
+of the matching values; fields without an index (income, welfare_score,
+...) are compared on the column store and packed into a bitmap.
+
+The index is rebuilt from the column store when the census data is loaded
+and updated in place for every changed record.
+"""
+
+import json
+import threading
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+from census_columns import FIELD_DEFAULTS, NUMERIC_FIELDS, CensusColumns, QueryError, check_filter
+
+INDEXED_FIELDS = (
+    "state", "region", "caste", "sex", "relation", "employment_status", "occupation_category", "sector",
+    "housing_type", "ration_card_type", "flag_status", "flag_source", "household_size",
+    "scheme_enrollment_count", "scheme_leakage_flag", "water_source", "toilet_access", "cooking_fuel",
+    "internet_access", "reviewed",
+)
+# Fields with more distinct values than this are not worth a bitmap per value
+MAX_CARDINALITY = 256
+
+Expression = Union[dict, list, None]
+
+
+def pack(mask: np.ndarray, words: int) -> np.ndarray:
+    """Pack a boolean row mask into uint64 words; bit i of the result is row i."""
+    packed = np.packbits(mask, bitorder="little")
+    padded = np.zeros(words * 8, dtype=np.uint8)
+    padded[:len(packed)] = packed
+    return padded.view(np.uint64)
+
+
+def popcount(bitmap: np.ndarray) -> int:
+    return int(np.bitwise_count(bitmap).sum())
+
+
+class BitmapIndex:
+    def __init__(self):
+        self.size = 0
+        self.words = 0
+        # field -> (cardinality, words) matrix; row k is the bitmap of values[field][k]
+        self.bitmaps: Dict[str, np.ndarray] = {}
+        self.values: Dict[str, Dict[Any, int]] = {}
+        self.universe = np.zeros(0, dtype=np.uint64)
+        self._columns: Optional[CensusColumns] = None
+        self._lock = threading.Lock()
+
+    def build(self, columns: CensusColumns):
+        size = columns.size
+        words = (size + 63) // 64
+        bitmaps, values = {}, {}
+        for field in INDEXED_FIELDS:
+            if field in columns.codes:
+                codes, labels = columns.codes[field], columns.categories[field]
+            else:
+                distinct, codes = np.unique(columns.values[field], return_inverse=True)
+                labels = distinct.tolist()
+            if len(labels) > MAX_CARDINALITY:
+                continue
+            matrix = np.empty((len(labels), words), dtype=np.uint64)
+            for code in range(len(labels)):
+                matrix[code] = pack(codes == code, words)
+            bitmaps[field] = matrix
+            values[field] = {label: code for code, label in enumerate(labels)}
+        with self._lock:
+            self.size, self.words = size, words
+            self.bitmaps, self.values = bitmaps, values
+            self.universe = pack(np.ones(size, dtype=bool), words)
+            self._columns = columns
+
+    def update(self, record: dict):
+        """Move a changed record's bit to the bitmaps of its new values."""
+        with self._lock:
+            row = self._columns.row_index.get(record["record_id"]) if self._columns else None
+            if row is None:
+                return
+            word, bit = divmod(row, 64)
+            bit_mask = np.uint64(1) << np.uint64(bit)
+            for field, matrix in self.bitmaps.items():
+                value = record.get(field, FIELD_DEFAULTS.get(field))
+                if field in NUMERIC_FIELDS:
+                    value = value or 0
+                code = self.values[field].get(value)
+                if code is None:
+                    code = self.values[field][value] = len(self.values[field])
+                    matrix = self.bitmaps[field] = np.vstack([matrix, np.zeros((1, self.words), dtype=np.uint64)])
+                matrix[:, word] &= ~bit_mask
+                matrix[code, word] |= bit_mask
+
+    # Evaluation
+
+    def evaluate(self, expression: Expression) -> np.ndarray:
+        """Bitmap of the rows matching `expression`; empty expressions match every row."""
+        with self._lock:
+            return self._evaluate(expression)
+
+    def evaluate_many(self, expressions: List[Expression]) -> List[np.ndarray]:
+        """
+        Bitmaps for several expressions, evaluating each distinct leaf once.
+        Scenarios that differ in one criterion share the bitmaps of the rest.
+        """
+        leaf_cache: Dict[str, np.ndarray] = {}
+        with self._lock:
+            return [self._evaluate(expression, leaf_cache) for expression in expressions]
+
+    def count(self, expression: Expression) -> int:
+        return popcount(self.evaluate(expression))
+
+    def rows(self, bitmap: np.ndarray) -> np.ndarray:
+        """Row numbers of the set bits, ascending."""
+        bits = np.unpackbits(bitmap.view(np.uint8), bitorder="little", count=self.size)
+        return np.flatnonzero(bits)
+
+    def _evaluate(self, expression: Expression, leaf_cache: Optional[Dict[str, np.ndarray]] = None) -> np.ndarray:
+        if not expression:
+            return self.universe.copy()
+        if isinstance(expression, list):
+            expression = {"and": expression}
+        if not isinstance(expression, dict):
+            raise QueryError(f"Unrecognised filter expression: {expression!r}")
+        for combinator in ("and", "or"):
+            if combinator in expression and not isinstance(expression[combinator], list):
+                raise QueryError(f"{combinator} takes a list of expressions")
+        if "and" in expression:
+            result = self.universe.copy()
+            for child in expression["and"]:
+                result &= self._evaluate(child, leaf_cache)
+            return result
+        if "or" in expression:
+            result = np.zeros(self.words, dtype=np.uint64)
+            for child in expression["or"]:
+                result |= self._evaluate(child, leaf_cache)
+            return result
+        if "not" in expression:
+            return self.universe & ~self._evaluate(expression["not"], leaf_cache)
+        if "field" in expression:
+            if leaf_cache is None:
+                return self._leaf(expression["field"], expression.get("op", "eq"), expression.get("value"))
+            key = json.dumps(expression, sort_keys=True, default=str)
+            if key not in leaf_cache:
+                leaf_cache[key] = self._leaf(expression["field"], expression.get("op", "eq"), expression.get("value"))
+            # Returned bitmaps belong to the caller, which may modify them
+            return leaf_cache[key].copy()
+        raise QueryError(f"Unrecognised filter expression: {expression}")
+
+    def _leaf(self, field: str, op: str, value) -> np.ndarray:
+        check_filter(field, op, value)
+        if field not in self.bitmaps:
+            if self._columns is None:
+                raise QueryError(f"Unknown field: {field}")
+            return pack(self._columns.predicate_mask(field, op, value), self.words)
+
+        index, matrix = self.values[field], self.bitmaps[field]
+        if op in ("eq", "ne", "in", "not_in"):
+            wanted = [value] if op in ("eq", "ne") else list(value or [])
+            codes = [index[v] for v in wanted if v in index]
+        else:
+            # check_filter only allows comparisons on numeric fields
+            codes = [code for v, code in index.items() if _compare(op, v, value)]
+
+        result = np.bitwise_or.reduce(matrix[codes], axis=0) if codes else np.zeros(self.words, dtype=np.uint64)
+        return self.universe & ~result if op in ("ne", "not_in") else result
+
+
+def _compare(op: str, left, right) -> bool:
+    if op == "gt":
+        return left > right
+    if op == "gte":
+        return left >= right
+    if op == "lt":
+        return left < right
+    if op == "lte":
+        return left <= right
+    # between, whose [low, high] check_filter has validated
+    return right[0] <= left <= right[1]
+
+
+census_bitmaps = BitmapIndex()
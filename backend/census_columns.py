@@ -0,0 +1,372 @@
+"""
+Columnar copy of the in-memory census records and a vectorized group-by
+engine over it.
+
+CensusColumns stores each field as a numpy array: categorical fields are
+dictionary-encoded (int32 codes into a per-field list of values) and numeric
+fields keep their values. It is built when the census data is loaded and
+individual rows are re-encoded when a record changes (reviews update
+flag_status), so it always mirrors in_memory_db["census_records"].
+
+`aggregate()` answers cross-tab queries - any combination of group-by
+dimensions, filters and measures (count, sum, mean, min, max, quantiles) -
+with masks, bincount and one sort per quantile field instead of Python loops
+over records. Continuous fields are grouped through bucketing rules.
+"""
+
+import threading
+from numbers import Real
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+CATEGORICAL_FIELDS = (
+    "state", "district", "pin_code", "region", "caste", "sex", "relation", "employment_status",
+    "occupation_category", "sector", "housing_type", "ration_card_type", "flag_status", "flag_source",
+    "household_id",
+)
+NUMERIC_FIELDS = {
+    "age": np.int32,
+    "income": np.int64,
+    "welfare_score": np.float64,
+    "exclusion_error_risk_score": np.float64,
+    "household_size": np.int32,
+    "scheme_enrollment_count": np.int32,
+    "scheme_leakage_flag": np.int8,
+    "water_source": np.int8,
+    "toilet_access": np.int8,
+    "cooking_fuel": np.int8,
+    "internet_access": np.int8,
+    "reviewed": np.int8,
+}
+# Defaults used by the analytics endpoints for missing values
+FIELD_DEFAULTS = {"caste": "General", "flag_status": "normal", "household_size": 1}
+
+# Default bucketing for continuous fields: (edges, labels); value v falls in
+# bucket bisect_right(edges, v), matching the endpoints' `<` comparisons
+BUCKETS = {
+    "income": ((50000, 100000, 200000), ("0-50k", "50k-100k", "100k-200k", "200k+")),
+    "age": ((18, 35, 50, 65), ("0-18", "18-35", "35-50", "50-65", "65+")),
+    "welfare_score": ((20, 40, 60, 80), ("0-20", "20-40", "40-60", "60-80", "80+")),
+    "exclusion_error_risk_score": ((0.25, 0.5, 0.75), ("0-0.25", "0.25-0.5", "0.5-0.75", "0.75+")),
+}
+# Numeric fields that must be bucketed when grouped on
+CONTINUOUS_FIELDS = frozenset(BUCKETS)
+
+MEASURE_OPS = ("count", "sum", "mean", "min", "max", "quantile")
+FILTER_OPS = ("eq", "ne", "in", "not_in", "gt", "gte", "lt", "lte", "between")
+MAX_GROUP_COMBINATIONS = 1 << 62
+# value_counts switches from sorting to bincount at or below this many distinct values
+SMALL_CARDINALITY = 64
+
+
+class QueryError(ValueError):
+    """Raised for queries that reference unknown fields or invalid options."""
+
+
+def _format_edge(value: float) -> str:
+    return f"{value:g}"
+
+
+def bucket_labels(edges: Sequence[float]) -> List[str]:
+    labels = [f"<{_format_edge(edges[0])}"]
+    labels += [f"{_format_edge(lo)}-{_format_edge(hi)}" for lo, hi in zip(edges, edges[1:])]
+    labels.append(f"{_format_edge(edges[-1])}+")
+    return labels
+
+
+def check_filter(field: str, op: str, value):
+    """Raise QueryError unless `field op value` is a filter the column store can evaluate."""
+    if op not in FILTER_OPS:
+        raise QueryError(f"Unknown filter op: {op}")
+    if field not in CATEGORICAL_FIELDS and field not in NUMERIC_FIELDS:
+        raise QueryError(f"Unknown field: {field}")
+    if op in ("in", "not_in"):
+        if value is not None and not isinstance(value, (list, tuple)):
+            raise QueryError(f"{op} takes a list of values")
+        values = list(value or [])
+    elif op == "between":
+        if not isinstance(value, (list, tuple)) or len(value) != 2:
+            raise QueryError("between takes [low, high]")
+        values = list(value)
+    else:
+        values = [value]
+    if field in CATEGORICAL_FIELDS:
+        if op not in ("eq", "ne", "in", "not_in"):
+            raise QueryError(f"Filter op {op} is not supported on categorical field {field}")
+        # Missing values are stored as None
+        if any(v is not None and not isinstance(v, (str, Real)) for v in values):
+            raise QueryError(f"{field} filter values must be strings or numbers")
+    elif any(not isinstance(v, Real) for v in values):
+        raise QueryError(f"{field} filter values must be numbers")
+
+
+class CensusColumns:
+    def __init__(self):
+        self.size = 0
+        self.codes: Dict[str, np.ndarray] = {}
+        self.categories: Dict[str, List[Any]] = {}
+        self._category_index: Dict[str, Dict[Any, int]] = {}
+        self.values: Dict[str, np.ndarray] = {}
+        self.row_index: Dict[str, int] = {}
+        # The records in row order
+        self.records: List[dict] = []
+        self._lock = threading.Lock()
+
+    def build(self, records: Sequence[dict]):
+        codes, categories, category_index = {}, {}, {}
+        for field in CATEGORICAL_FIELDS:
+            index: Dict[Any, int] = {}
+            default = FIELD_DEFAULTS.get(field)
+            codes[field] = np.fromiter(
+                (index.setdefault(r.get(field, default), len(index)) for r in records),
+                dtype=np.int32, count=len(records),
+            )
+            categories[field] = list(index)
+            category_index[field] = index
+        values = {
+            field: np.fromiter(
+                (r.get(field, FIELD_DEFAULTS.get(field, 0)) or 0 for r in records), dtype=dtype, count=len(records)
+            )
+            for field, dtype in NUMERIC_FIELDS.items()
+        }
+        with self._lock:
+            self.size = len(records)
+            self.codes, self.categories, self._category_index = codes, categories, category_index
+            self.values = values
+            self.row_index = {r["record_id"]: i for i, r in enumerate(records)}
+            self.records = list(records)
+
+    def update(self, record: dict):
+        """Re-encode one record in place after it changed."""
+        with self._lock:
+            row = self.row_index.get(record["record_id"])
+            if row is None:
+                return
+            for field in CATEGORICAL_FIELDS:
+                self.codes[field][row] = self._encode(field, record.get(field, FIELD_DEFAULTS.get(field)))
+            for field in NUMERIC_FIELDS:
+                self.values[field][row] = record.get(field, FIELD_DEFAULTS.get(field, 0)) or 0
+
+    def code_of(self, field: str, value) -> Optional[int]:
+        """Dictionary code of a categorical value, or None if no record has it."""
+        return self._category_index[field].get(value)
+
+    def _encode(self, field: str, value) -> int:
+        index = self._category_index[field]
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(index)
+            self.categories[field].append(value)
+        return code
+
+    # Filters
+
+    def filter_mask(self, filters: Sequence[dict], rows: Optional[np.ndarray] = None) -> np.ndarray:
+        mask = np.ones(self.size if rows is None else len(rows), dtype=bool)
+        for f in filters:
+            mask &= self.predicate_mask(f["field"], f.get("op", "eq"), f.get("value"), rows)
+        return mask
+
+    def predicate_mask(self, field: str, op: str, value, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Boolean mask of the rows (or of just `rows`) where `field op value` holds."""
+        check_filter(field, op, value)
+        if field in self.codes:
+            if op not in ("eq", "ne", "in", "not_in"):
+                raise QueryError(f"Filter op {op} is not supported on categorical field {field}")
+            wanted = [value] if op in ("eq", "ne") else list(value or [])
+            index = self._category_index[field]
+            codes = [index[v] for v in wanted if v in index]
+            column = self.codes[field] if rows is None else self.codes[field][rows]
+            mask = np.isin(column, codes)
+            return ~mask if op in ("ne", "not_in") else mask
+        if field not in self.values:
+            raise QueryError(f"Unknown field: {field}")
+        column = self.values[field] if rows is None else self.values[field][rows]
+        if op in ("in", "not_in"):
+            mask = np.isin(column, list(value or []))
+            return ~mask if op == "not_in" else mask
+        if op == "between":
+            return (column >= value[0]) & (column <= value[1])
+        compare = {
+            "eq": np.equal, "ne": np.not_equal, "gt": np.greater,
+            "gte": np.greater_equal, "lt": np.less, "lte": np.less_equal,
+        }[op]
+        return compare(column, value)
+
+    def value_counts(self, field: str, rows: np.ndarray) -> Dict[Any, int]:
+        """
+        Count of each value of `field` over `rows`, keyed in order of first
+        appearance - the order a dict built by looping over the records has.
+        """
+        if field in self.codes:
+            codes, labels = self.codes[field][rows], self.categories[field]
+        else:
+            values = self.values[field][rows]
+            if values.dtype.kind == "i" and len(values) and 0 <= values.min() and values.max() < SMALL_CARDINALITY:
+                codes, labels = values, range(int(values.max()) + 1)
+            else:
+                distinct, codes = np.unique(values, return_inverse=True)
+                labels = distinct.tolist()
+        
+        if len(labels) <= SMALL_CARDINALITY:
+            # Few distinct values: bincount and a first-match scan per value beat sorting the rows
+            counts = np.bincount(codes, minlength=len(labels))
+            present = np.flatnonzero(counts)
+            first = np.array([np.argmax(codes == code) for code in present.tolist()], dtype=np.int64)
+            counts = counts[present]
+        else:
+            present, first, counts = np.unique(codes, return_index=True, return_counts=True)
+        order = np.argsort(first, kind="stable")
+        return {labels[code]: int(count) for code, count in zip(present[order].tolist(), counts[order].tolist())}
+
+    def bucket_counts(self, field: str, rows: np.ndarray, edges: Sequence[float], labels: Sequence[str]) -> Dict[str, int]:
+        """Count of `rows` per bucket (bucket i holds edges[i-1] <= v < edges[i]); every label is present."""
+        buckets = np.searchsorted(np.asarray(edges), self.values[field][rows], side="right")
+        return dict(zip(labels, np.bincount(buckets, minlength=len(labels)).tolist()))
+
+    # Group-by
+
+    def _dimension(self, spec: dict, rows: np.ndarray):
+        """(codes for the selected rows, cardinality, label for each code)"""
+        field = spec["field"]
+        if field in self.codes:
+            if spec.get("edges"):
+                raise QueryError(f"Categorical field {field} cannot be bucketed")
+            return self.codes[field][rows], max(len(self.categories[field]), 1), self.categories[field]
+        if field not in self.values:
+            raise QueryError(f"Unknown field: {field}")
+        column = self.values[field][rows]
+        edges = spec.get("edges")
+        if edges:
+            edges = sorted(edges)
+            labels = bucket_labels(edges)
+        elif field in CONTINUOUS_FIELDS:
+            edges, labels = BUCKETS[field]
+        else:
+            # Discrete numeric field: one group per distinct value
+            distinct, codes = np.unique(column, return_inverse=True)
+            return codes, max(len(distinct), 1), distinct.tolist()
+        codes = np.searchsorted(np.asarray(edges), column, side="right")
+        return codes, len(labels), list(labels)
+
+    def aggregate(
+        self,
+        group_by: Sequence[dict] = (),
+        measures: Sequence[dict] = ({"op": "count"},),
+        filters: Sequence[dict] = (),
+        sort_by: Optional[str] = None,
+        descending: bool = True,
+        limit: Optional[int] = None,
+    ) -> dict:
+        """
+        Group the rows matching `filters` by `group_by` dimensions and compute
+        `measures` per group. Dimensions are {"field", "edges"?}; measures are
+        {"op", "field"?, "q"?, "name"?}; filters are {"field", "op", "value"}.
+        Groups are ordered by dimension (category first-seen order, buckets
+        ascending) unless `sort_by` names a measure.
+        """
+        with self._lock:
+            rows = np.flatnonzero(self.filter_mask(filters))
+            dimensions = [self._dimension(spec, rows) for spec in group_by]
+
+            group_key = np.zeros(len(rows), dtype=np.int64)
+            combinations = 1
+            for codes, cardinality, _ in dimensions:
+                combinations *= cardinality
+                if combinations > MAX_GROUP_COMBINATIONS:
+                    raise QueryError("Too many group-by combinations")
+                group_key = group_key * cardinality + codes
+            keys, group_ids = np.unique(group_key, return_inverse=True)
+            if not dimensions and not len(keys):
+                # Ungrouped query with no matching rows still returns one row
+                keys = np.zeros(1, dtype=np.int64)
+            counts = np.bincount(group_ids, minlength=len(keys))
+
+            results = {}
+            sorted_by_field = {}
+            for measure in measures:
+                name, values = self._measure(measure, rows, group_ids, counts, sorted_by_field)
+                results[name] = values
+
+        labels = []
+        for i, (_, cardinality, dim_labels) in reversed(list(enumerate(dimensions))):
+            labels.append((group_by[i].get("name") or group_by[i]["field"], dim_labels, keys % cardinality))
+            keys = keys // cardinality
+        labels.reverse()
+
+        output = []
+        for g in range(len(counts)):
+            row = {name: dim_labels[codes[g]] for name, dim_labels, codes in labels}
+            for name, values in results.items():
+                row[name] = values[g]
+            output.append(row)
+        if sort_by is not None:
+            if sort_by not in results:
+                raise QueryError(f"sort_by must name a measure: {sort_by}")
+            # Groups without a value (empty quantiles and means) go last either way
+            present = [r for r in output if r[sort_by] is not None]
+            present.sort(key=lambda r: r[sort_by], reverse=descending)
+            output = present + [r for r in output if r[sort_by] is None]
+
+        return {
+            "matched_records": int(len(rows)),
+            "total_groups": len(output),
+            "rows": output[:limit] if limit is not None else output,
+        }
+
+    def _measure(self, measure: dict, rows, group_ids, counts, sorted_by_field):
+        op = measure.get("op", "count")
+        if op not in MEASURE_OPS:
+            raise QueryError(f"Unknown measure op: {op}")
+        if op == "count":
+            return measure.get("name") or "count", counts.tolist()
+
+        field = measure.get("field")
+        if field not in self.values:
+            raise QueryError(f"Measure {op} needs a numeric field, got {field!r}")
+        column = self.values[field][rows]
+        empty = counts == 0
+        if op == "quantile":
+            q = measure.get("q")
+            if q is None or not 0 <= q <= 1:
+                raise QueryError("quantile measures need q between 0 and 1")
+            default_name = f"p{q * 100:g}_{field}"
+        else:
+            default_name = f"{op}_{field}"
+        name = measure.get("name") or default_name
+
+        if op in ("sum", "mean"):
+            sums = np.bincount(group_ids, weights=column, minlength=len(counts))
+            if op == "sum":
+                result = sums.round().astype(np.int64) if column.dtype.kind == "i" else sums.round(4)
+                return name, result.tolist()
+            with np.errstate(invalid="ignore", divide="ignore"):
+                result = (sums / counts).round(4)
+            return name, [None if e else v for e, v in zip(empty, result.tolist())]
+
+        # min/max/quantile read positions in values sorted within each group
+        if field not in sorted_by_field:
+            sorted_by_field[field] = column[np.lexsort((column, group_ids))]
+        ordered = sorted_by_field[field]
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        safe_counts = np.maximum(counts, 1)
+        if op == "min":
+            result = ordered[np.minimum(starts, len(ordered) - 1)] if len(ordered) else np.zeros(len(counts))
+        elif op == "max":
+            result = ordered[starts + safe_counts - 1] if len(ordered) else np.zeros(len(counts))
+        else:
+            # Linear interpolation, as numpy.quantile's default method
+            position = measure["q"] * (safe_counts - 1)
+            lower = np.floor(position).astype(np.int64)
+            upper = np.minimum(lower + 1, safe_counts - 1)
+            if len(ordered):
+                low_values = ordered[starts + lower].astype(np.float64)
+                high_values = ordered[starts + upper].astype(np.float64)
+                result = (low_values + (high_values - low_values) * (position - lower)).round(4)
+            else:
+                result = np.zeros(len(counts))
+        return name, [None if e else v for e, v in zip(empty, result.tolist())]
+
+
+census_columns = CensusColumns()
@@ -0,0 +1,190 @@
+"""
+Household aggregates for household-level policy simulation.
+
+HouseholdTable derives one row per household from the census column store:
+member count, total and per-capita income, dependants (members under 18 or
+60 and over) and the attributes of the household head, all as numpy arrays
+indexed by household code (the column store's household_id code). Members
+are kept grouped by household (CSR offsets into a sorted row order), so a
+changed record only recomputes its own household.
+
+`simulate()` evaluates household eligibility - income basis against a
+threshold, head attributes, member counts and dependants - and the benefit
+outlay with masks over these arrays.
+"""
+
+import threading
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from census_columns import CensusColumns, QueryError
+
+HEAD_FIELDS = ("state", "caste", "sex", "occupation_category", "housing_type", "ration_card_type")
+CHILD_AGE = 18
+ELDERLY_AGE = 60
+INCOME_BASES = ("total", "per_capita")
+HOUSEHOLD_INCOME_BUCKETS = (
+    (50000, 100000, 200000, 500000), ("0-50k", "50k-100k", "100k-200k", "200k-500k", "500k+")
+)
+
+
+class HouseholdTable:
+    def __init__(self):
+        self.size = 0
+        self.member_count = np.zeros(0, dtype=np.int64)
+        self.total_income = np.zeros(0, dtype=np.int64)
+        self.dependants = np.zeros(0, dtype=np.int64)
+        self.welfare_sum = np.zeros(0, dtype=np.float64)
+        self.head_row = np.zeros(0, dtype=np.int64)
+        # Member rows grouped by household: rows order[offsets[h]:offsets[h + 1]]
+        self.order = np.zeros(0, dtype=np.int64)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self._columns: Optional[CensusColumns] = None
+        self._lock = threading.Lock()
+
+    @property
+    def per_capita_income(self) -> np.ndarray:
+        return self.total_income / np.maximum(self.member_count, 1)
+
+    def build(self, columns: CensusColumns):
+        households = columns.codes["household_id"]
+        size = len(columns.categories["household_id"]) if columns.size else 0
+        ages = columns.values["age"]
+
+        member_count = np.bincount(households, minlength=size)
+        order = np.argsort(households, kind="stable")
+        offsets = np.concatenate(([0], np.cumsum(member_count)))
+
+        # Head is the first member related as "head", else the first member listed
+        head_row = order[offsets[:-1]] if size else np.zeros(0, dtype=np.int64)
+        head_code = columns.code_of("relation", "head") if columns.size else None
+        if head_code is not None:
+            heads = np.flatnonzero(columns.codes["relation"] == head_code)
+            with_head, first = np.unique(households[heads], return_index=True)
+            head_row[with_head] = heads[first]
+
+        with self._lock:
+            self.size = size
+            self.member_count = member_count
+            self.total_income = np.bincount(households, weights=columns.values["income"], minlength=size).astype(np.int64)
+            self.dependants = np.bincount(
+                households, weights=(ages < CHILD_AGE) | (ages >= ELDERLY_AGE), minlength=size
+            ).astype(np.int64)
+            self.welfare_sum = np.bincount(households, weights=columns.values["welfare_score"], minlength=size)
+            self.head_row = head_row
+            self.order, self.offsets = order, offsets
+            self._columns = columns
+
+    def update(self, record: dict):
+        """Recompute the household of a changed record from its members' columns."""
+        with self._lock:
+            columns = self._columns
+            row = columns.row_index.get(record["record_id"]) if columns else None
+            if row is None:
+                return
+            household = columns.codes["household_id"][row]
+            if household >= self.size:
+                # Moved to a household the table has never seen; needs a rebuild
+                return
+            members = self.order[self.offsets[household]:self.offsets[household + 1]]
+            members = members[columns.codes["household_id"][members] == household]
+            ages = columns.values["age"][members]
+            self.member_count[household] = len(members)
+            self.total_income[household] = int(columns.values["income"][members].sum())
+            self.dependants[household] = int(((ages < CHILD_AGE) | (ages >= ELDERLY_AGE)).sum())
+            self.welfare_sum[household] = float(columns.values["welfare_score"][members].sum())
+
+    def head_codes(self, field: str) -> np.ndarray:
+        return self._columns.codes[field][self.head_row]
+
+    def simulate(
+        self,
+        income_threshold: int,
+        income_basis: str = "total",
+        head_filters: Optional[Dict[str, str]] = None,
+        members_min: Optional[int] = None,
+        members_max: Optional[int] = None,
+        dependants_min: Optional[int] = None,
+        benefit_per_household: float = 0,
+        benefit_per_member: float = 0,
+        benefit_per_dependant: float = 0,
+        distributions: Sequence[str] = ("state", "caste"),
+    ) -> dict:
+        """
+        Eligible households and benefit outlay. Households qualify when their
+        total or per-capita income is at most the threshold, their head
+        matches every head filter and their member and dependant counts are
+        within bounds.
+        """
+        if income_basis not in INCOME_BASES:
+            raise QueryError(f"income_basis must be one of {', '.join(INCOME_BASES)}")
+        with self._lock:
+            columns = self._columns
+            if columns is None or self.size == 0:
+                return _empty_result()
+            income = self.total_income if income_basis == "total" else self.per_capita_income
+            eligible = income <= income_threshold
+            for field, value in (head_filters or {}).items():
+                if not value:
+                    continue
+                if field not in HEAD_FIELDS:
+                    raise QueryError(f"Cannot filter households on head {field}")
+                code = columns.code_of(field, value)
+                eligible &= self.head_codes(field) == code if code is not None else False
+            if members_min:
+                eligible &= self.member_count >= members_min
+            if members_max:
+                eligible &= self.member_count <= members_max
+            if dependants_min:
+                eligible &= self.dependants >= dependants_min
+
+            households = np.flatnonzero(eligible & (self.member_count > 0))
+            populated = int(np.count_nonzero(self.member_count))
+            members = int(self.member_count[households].sum())
+            dependants = int(self.dependants[households].sum())
+            outlay = (
+                len(households) * benefit_per_household
+                + members * benefit_per_member
+                + dependants * benefit_per_dependant
+            )
+
+            result = {
+                "income_basis": income_basis,
+                "total_households": populated,
+                "eligible_households": len(households),
+                "eligibility_percentage": round(len(households) / populated * 100, 2) if populated else 0,
+                "individuals_covered": members,
+                "dependants_covered": dependants,
+                "avg_household_income_eligible": round(float(self.total_income[households].mean())) if len(households) else 0,
+                "avg_members_eligible": round(members / len(households), 2) if len(households) else 0,
+                "avg_welfare_eligible": round(float(self.welfare_sum[households].sum()) / members, 2) if members else 0,
+                "total_benefit_outlay": round(float(outlay), 2),
+                "avg_benefit_per_household": round(outlay / len(households), 2) if len(households) else 0,
+                "income_brackets": dict(zip(
+                    HOUSEHOLD_INCOME_BUCKETS[1],
+                    np.bincount(
+                        np.searchsorted(np.asarray(HOUSEHOLD_INCOME_BUCKETS[0]), income[households], side="right"),
+                        minlength=len(HOUSEHOLD_INCOME_BUCKETS[1]),
+                    ).tolist(),
+                )),
+                "household_size_distribution": {
+                    str(size): int(count)
+                    for size, count in zip(*np.unique(self.member_count[households], return_counts=True))
+                },
+            }
+            for field in distributions:
+                if field not in HEAD_FIELDS:
+                    raise QueryError(f"Cannot break households down by head {field}")
+                codes, counts = np.unique(self.head_codes(field)[households], return_counts=True)
+                result[f"{field}_distribution"] = {
+                    columns.categories[field][code]: int(count) for code, count in zip(codes.tolist(), counts.tolist())
+                }
+            return result
+
+
+def _empty_result() -> dict:
+    return {"total_households": 0, "eligible_households": 0, "eligibility_percentage": 0}
+
+
+census_households = HouseholdTable()
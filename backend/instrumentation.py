@@ -0,0 +1,271 @@
+"""
+Request instrumentation: latency histograms, named spans and a sampling
+profiler for slow requests.
+
+InstrumentationMiddleware times every request into a per-route histogram
+and adds a Server-Timing header listing the spans recorded while handling
+it. Handlers mark their stages with `with span("aggregate"):`; span
+durations go into a (route, span) histogram as well. render_metrics()
+produces the Prometheus text exposition format for GET /metrics.
+
+The sampling profiler is opt-in (PROFILE_SLOW_REQUEST_MS > 0). While
+requests are in flight, a background thread samples the stacks of busy
+threads every PROFILE_SAMPLE_INTERVAL_MS. Requests slower than the threshold
+get their samples written to PROFILE_DIR as collapsed stacks, ready for
+flamegraph.pl or speedscope. Samples are process-wide, so concurrent
+requests show up in each other's profiles.
+"""
+
+import contextvars
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+PROFILE_SLOW_REQUEST_MS = float(os.environ.get('PROFILE_SLOW_REQUEST_MS', 0))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.environ.get('PROFILE_SAMPLE_INTERVAL_MS', 5))
+PROFILE_DIR = Path(os.environ.get('PROFILE_DIR', str(Path(__file__).parent / 'profiles')))
+# Stop collecting samples for a single request past this many
+PROFILE_MAX_SAMPLES = 20000
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Leaf frames of threads that are parked rather than doing work
+IDLE_FILES = ("threading.py", "selectors.py", "queue.py", "thread.py", "base_events.py")
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket counts (+Inf last), sum, count
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._series.items()):
+                base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels))
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{self.name}_bucket{{{base},le="{le}"}} {cumulative}')
+                lines.append(f"{self.name}_sum{{{base}}} {total}")
+                lines.append(f"{self.name}_count{{{base}}} {count}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+)
+SPAN_DURATION = Histogram(
+    "handler_span_duration_seconds", "Time spent in named handler stages", ("route", "span")
+)
+
+# name -> (help, callback returning {labels dict as tuple of pairs or (): value})
+_gauges: Dict[str, Tuple[str, Callable[[], Dict[tuple, float]]]] = {}
+
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+
+def register_gauge(name: str, help_text: str, callback: Callable[[], Dict[tuple, float]]):
+    """Expose values computed at scrape time; keys are tuples of (label, value) pairs."""
+    _gauges[name] = (help_text, callback)
+
+
+def render_metrics() -> str:
+    lines = REQUEST_DURATION.render() + SPAN_DURATION.render()
+    lines += ["# HELP http_requests_in_flight Requests currently being handled",
+              "# TYPE http_requests_in_flight gauge", f"http_requests_in_flight {_in_flight}"]
+    for name, (help_text, callback) in sorted(_gauges.items()):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        for labels, value in sorted(callback().items()):
+            label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# Spans
+
+class RequestTiming:
+    def __init__(self, scope: Scope):
+        self.scope = scope
+        self.method = scope["method"]
+        self.spans: List[Tuple[str, float]] = []
+        self.samples: Optional[Counter] = None
+
+    @property
+    def route(self) -> str:
+        # Set by FastAPI's router once the request has been matched
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or "unmatched"
+
+
+_current: contextvars.ContextVar[Optional[RequestTiming]] = contextvars.ContextVar("request_timing", default=None)
+
+
+@contextmanager
+def span(name: str):
+    """Time a handler stage; recorded against the current request's route."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        timing = _current.get()
+        if timing is not None:
+            timing.spans.append((name, elapsed))
+            SPAN_DURATION.observe((timing.route, name), elapsed)
+        else:
+            SPAN_DURATION.observe(("background", name), elapsed)
+
+
+def _server_timing(spans: List[Tuple[str, float]], total: float) -> str:
+    merged: Dict[str, float] = {}
+    for name, elapsed in spans:
+        merged[name] = merged.get(name, 0.0) + elapsed
+    entries = [f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in merged.items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+# Sampling profiler
+
+class SamplingProfiler:
+    """Samples busy thread stacks while requests are in flight."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._active: List[RequestTiming] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def begin(self, timing: RequestTiming):
+        timing.samples = Counter()
+        with self._lock:
+            self._active.append(timing)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+            self._thread.start()
+        self._wakeup.set()
+
+    def end(self, timing: RequestTiming):
+        with self._lock:
+            if timing in self._active:
+                self._active.remove(timing)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while True:
+            # Clear before checking so a begin() racing with this check is not missed
+            self._wakeup.clear()
+            with self._lock:
+                active = list(self._active)
+            if not active:
+                self._wakeup.wait()
+                continue
+            stacks = [
+                collapse(frame) for thread_id, frame in sys._current_frames().items() if thread_id != own_id
+            ]
+            stacks = [stack for stack in stacks if stack]
+            for timing in active:
+                if sum(timing.samples.values()) < PROFILE_MAX_SAMPLES:
+                    timing.samples.update(stacks)
+            time.sleep(self.interval)
+
+
+def collapse(frame) -> Optional[str]:
+    """Root-first `file:function` frames joined by ';', or None for idle threads."""
+    if os.path.basename(frame.f_code.co_filename) in IDLE_FILES:
+        return None
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def write_profile(timing: RequestTiming, elapsed: float, directory: Path = PROFILE_DIR) -> Optional[Path]:
+    if not timing.samples:
+        return None
+    directory.mkdir(parents=True, exist_ok=True)
+    route = timing.route.strip("/").replace("/", "_").replace("{", "").replace("}", "") or "root"
+    path = directory / f"{time.strftime('%Y%m%dT%H%M%S')}_{timing.method}_{route}_{elapsed * 1000:.0f}ms.folded"
+    path.write_text("".join(f"{stack} {count}\n" for stack, count in timing.samples.most_common()))
+    return path
+
+
+profiler = SamplingProfiler(PROFILE_SAMPLE_INTERVAL_MS / 1000) if PROFILE_SLOW_REQUEST_MS > 0 else None
+
+
+# Middleware
+
+class InstrumentationMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        global _in_flight
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timing = RequestTiming(scope)
+        token = _current.set(timing)
+        start = time.perf_counter()
+        status = 500
+        with _in_flight_lock:
+            _in_flight += 1
+        if profiler is not None:
+            profiler.begin(timing)
+
+        async def send_with_timing(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", _server_timing(timing.spans, time.perf_counter() - start))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.reset(token)
+            with _in_flight_lock:
+                _in_flight -= 1
+            REQUEST_DURATION.observe((timing.method, timing.route, str(status)), elapsed)
+            if profiler is not None:
+                profiler.end(timing)
+                if elapsed * 1000 >= PROFILE_SLOW_REQUEST_MS:
+                    write_profile(timing, elapsed)
@@ -0,0 +1,42 @@
+"""
+orjson-based JSON responses.
+
+ORJSONResponse is the app's default response class. Endpoints with large
+payloads return it directly, which also skips FastAPI's jsonable_encoder
+pass: orjson serializes datetimes, UUIDs, dataclasses and numpy values
+natively, and `_default` covers the remaining types we hand it.
+"""
+
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+from instrumentation import span
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(obj: Any):
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    # bson ObjectId and other opaque identifiers
+    return str(obj)
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+class ORJSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        with span("serialize"):
+            return dumps(content)
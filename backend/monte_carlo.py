@@ -0,0 +1,266 @@
+"""
+Monte Carlo uncertainty for policy simulation.
+
+Incomes are self-reported and exclusion_error_risk_score is a model output,
+so a simulated eligible count is one draw rather than a certainty. Each
+replicate perturbs the people who pass the category filters:
+
+    income      reported income times mean-one lognormal noise with log
+                standard deviation `income_noise` (misreporting either way)
+    exclusion   an eligible person is missed with probability
+                exclusion_error_risk_score * `exclusion_scale`
+
+and records the eligible count, income sum and per-category counts. The
+spread across replicates gives confidence intervals (percentile intervals
+at `confidence`) for the count, percentage, average income and every
+distribution in the /policy/simulate response.
+
+Replicates run in chunks on a process pool. The candidate columns are
+copied once into a shared memory block that workers map read-only, so a
+chunk only pickles its seeds and gets back one row of numbers per
+replicate. Every replicate has its own seed spawned from the run's seed,
+so results do not depend on how replicates are split across workers.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import secrets
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from census_columns import CensusColumns, QueryError
+
+MONTE_CARLO_WORKERS = int(os.environ.get('MONTE_CARLO_WORKERS', os.cpu_count() or 1))
+MONTE_CARLO_MAX_REPLICATES = int(os.environ.get('MONTE_CARLO_MAX_REPLICATES', 1000))
+# Replicates per pool task; small enough for regular progress updates
+CHUNK_REPLICATES = 25
+# Response key -> categorical field, as in the /policy/simulate response
+DISTRIBUTIONS = {
+    "region_distribution": "state",
+    "caste_distribution": "caste",
+    "sex_distribution": "sex",
+    "occupation_distribution": "occupation_category",
+    "housing_distribution": "housing_type",
+}
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def executor() -> Optional[ProcessPoolExecutor]:
+    """The shared worker pool, or None when configured to run in-process."""
+    global _executor
+    if MONTE_CARLO_WORKERS <= 1:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            # Spawned rather than forked: the server process runs threads
+            _executor = ProcessPoolExecutor(
+                max_workers=MONTE_CARLO_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+class SharedColumns:
+    """Named arrays packed into one shared memory block, described by a picklable spec."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        layout, offset = [], 0
+        for name, array in arrays.items():
+            layout.append((name, array.dtype.str, len(array), offset))
+            # Keep every array 8-byte aligned
+            offset += -(-array.nbytes // 8) * 8
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 8))
+        for (name, dtype, length, start), array in zip(layout, arrays.values()):
+            np.ndarray(length, dtype=dtype, buffer=self.shm.buf, offset=start)[:] = array
+        self.spec = {"name": self.shm.name, "layout": layout}
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+    @staticmethod
+    def attach(spec: dict) -> Tuple[shared_memory.SharedMemory, Dict[str, np.ndarray]]:
+        shm = shared_memory.SharedMemory(name=spec["name"])
+        arrays = {
+            name: np.ndarray(length, dtype=dtype, buffer=shm.buf, offset=start)
+            for name, dtype, length, start in spec["layout"]
+        }
+        return shm, arrays
+
+
+def run_replicates(arrays: Dict[str, np.ndarray], params: dict, seeds: Sequence) -> np.ndarray:
+    """
+    One row per seed: eligible count, eligible income sum, then the eligible
+    count of every category code of each distribution field in turn.
+    """
+    income, risk = arrays["income"], arrays["risk"]
+    n = len(income)
+    out = np.zeros((len(seeds), 2 + sum(params["sizes"])), dtype=np.float64)
+    sigma, scale, threshold = params["income_noise"], params["exclusion_scale"], params["income_threshold"]
+    for i, seed in enumerate(seeds):
+        rng = np.random.default_rng(seed)
+        perturbed = income * rng.lognormal(-sigma * sigma / 2, sigma, n) if sigma > 0 else income
+        eligible = perturbed <= threshold
+        if scale > 0:
+            eligible &= rng.random(n) >= risk * scale
+        out[i, 0] = np.count_nonzero(eligible)
+        out[i, 1] = perturbed[eligible].sum()
+        column = 2
+        for field, size in zip(params["fields"], params["sizes"]):
+            out[i, column:column + size] = np.bincount(arrays[field][eligible], minlength=size)
+            column += size
+    return out
+
+
+def _run_shared(spec: dict, params: dict, seeds: Sequence) -> np.ndarray:
+    """Pool task: attach to the shared columns for one chunk of replicates."""
+    shm, arrays = SharedColumns.attach(spec)
+    try:
+        return run_replicates(arrays, params, seeds)
+    finally:
+        # Views must go before the mapping can be closed
+        del arrays
+        shm.close()
+
+
+def _interval(samples: np.ndarray, confidence: float, digits: int) -> dict:
+    tail = (1 - confidence) / 2 * 100
+    lower, upper = np.percentile(samples, [tail, 100 - tail])
+    return {
+        "mean": round(float(samples.mean()), digits),
+        "std": round(float(samples.std(ddof=1)), digits) if len(samples) > 1 else 0,
+        "lower": round(float(lower), digits),
+        "upper": round(float(upper), digits),
+    }
+
+
+class MonteCarloRun:
+    """A batch of perturbed replicates over the rows passing the category filters."""
+
+    def __init__(
+        self,
+        columns: CensusColumns,
+        rows: np.ndarray,
+        income_threshold: int,
+        replicates: int = 200,
+        income_noise: float = 0.1,
+        exclusion_scale: float = 1.0,
+        confidence: float = 0.95,
+        seed: Optional[int] = None,
+    ):
+        if not 1 <= replicates <= MONTE_CARLO_MAX_REPLICATES:
+            raise QueryError(f"replicates must be between 1 and {MONTE_CARLO_MAX_REPLICATES}")
+        if income_noise < 0 or exclusion_scale < 0:
+            raise QueryError("income_noise and exclusion_scale must not be negative")
+        if not 0 < confidence < 1:
+            raise QueryError("confidence must be between 0 and 1")
+
+        self.total_population = columns.size
+        self.replicates = replicates
+        self.confidence = confidence
+        if seed is None:
+            # Reported back so a run can be repeated; 63 bits keeps it a JSON-safe integer
+            seed = secrets.randbits(63)
+        if seed < 0:
+            raise QueryError("seed must not be negative")
+        sequence = np.random.SeedSequence(seed)
+        self.seed = seed
+        self.seeds = sequence.spawn(replicates)
+
+        fields = list(DISTRIBUTIONS.values())
+        self.labels = {field: list(columns.categories[field]) for field in fields}
+        self.params = {
+            "income_threshold": income_threshold,
+            "income_noise": income_noise,
+            "exclusion_scale": exclusion_scale,
+            "fields": fields,
+            "sizes": [len(self.labels[field]) for field in fields],
+        }
+        self.arrays = {
+            "income": columns.values["income"][rows].astype(np.float64),
+            "risk": columns.values["exclusion_error_risk_score"][rows],
+            **{field: columns.codes[field][rows] for field in fields},
+        }
+        # Chunk index -> replicate rows, concatenated in seed order for reproducible summaries
+        self.results: Dict[int, np.ndarray] = {}
+
+    def chunks(self) -> List[Sequence]:
+        return [self.seeds[i:i + CHUNK_REPLICATES] for i in range(0, self.replicates, CHUNK_REPLICATES)]
+
+    async def progress(self) -> AsyncIterator[dict]:
+        """Yield the summary so far each time a chunk of replicates completes."""
+        pool = executor()
+        if pool is None:
+            for index, chunk in enumerate(self.chunks()):
+                self.results[index] = await asyncio.to_thread(run_replicates, self.arrays, self.params, chunk)
+                yield self.summary()
+            return
+
+        shared = SharedColumns(self.arrays)
+        futures = [
+            asyncio.wrap_future(pool.submit(_run_shared, shared.spec, self.params, chunk))
+            for chunk in self.chunks()
+        ]
+        pending = {future: index for index, future in enumerate(futures)}
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    self.results[pending.pop(future)] = future.result()
+                yield self.summary()
+        finally:
+            for future in futures:
+                future.cancel()
+            # Workers still mapping the block keep it alive until they close it
+            shared.close()
+
+    async def run(self) -> dict:
+        summary = None
+        async for summary in self.progress():
+            pass
+        return summary
+
+    def summary(self) -> dict:
+        samples = np.concatenate([self.results[i] for i in sorted(self.results)]) if self.results else np.zeros((0, 2 + sum(self.params["sizes"])))
+        counts, income_sums = samples[:, 0], samples[:, 1]
+        percentages = counts / self.total_population * 100 if self.total_population else np.zeros_like(counts)
+        averages = np.divide(income_sums, counts, out=np.zeros_like(counts), where=counts > 0)
+
+        summary = {
+            "replicates_done": len(samples),
+            "replicates": self.replicates,
+            "done": len(samples) == self.replicates,
+            "confidence": self.confidence,
+            "seed": self.seed,
+        }
+        if len(samples) == 0:
+            return summary
+        summary.update({
+            "eligible_population": _interval(counts, self.confidence, 1),
+            "eligibility_percentage": _interval(percentages, self.confidence, 2),
+            "avg_income_eligible": _interval(averages, self.confidence, 0),
+        })
+        column = 2
+        for key, field, size in zip(DISTRIBUTIONS, self.params["fields"], self.params["sizes"]):
+            block = samples[:, column:column + size]
+            column += size
+            summary[key] = {
+                self.labels[field][code]: _interval(block[:, code], self.confidence, 1)
+                for code in range(size)
+                if block[:, code].any()
+            }
+        return summary
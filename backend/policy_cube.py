@@ -0,0 +1,340 @@
+"""
+Pre-aggregated cube for policy simulation.
+
+Every /policy/simulate criterion except income is on a low-cardinality
+field, so people are grouped into cells - one per distinct combination of
+the DIMENSIONS - and each cell is split into fine income buckets of
+INCOME_BUCKET_WIDTH. Each (cell, bucket) entry holds a count, income and
+welfare sums and the smallest row index it contains, with running totals
+over the buckets of its cell. A simulation then:
+
+  1. selects the cells matching the category filters,
+  2. takes each cell's running totals up to the bucket below the income
+     threshold (one binary search per cell), and
+  3. corrects exactly for the bucket holding the threshold from its rows,
+     which are kept sorted by income with running totals of their own.
+
+The cost depends on the number of matching cells, not on the population,
+so the cube pays off once cells hold many people each (see `compact`).
+Distributions come from the cells' dimension values, the income brackets
+from bucket boundaries (the bracket edges are multiples of the bucket
+width) and the key order of each distribution from the smallest row per
+cell, so the result is the /policy/simulate response for the same inputs.
+
+Updates are incremental: a changed row is masked out of its entry, whose
+row and cell running totals are recomputed locally, and its new version
+is kept in a small overlay evaluated directly at query time. The cube is
+rebuilt when the overlay outgrows CUBE_OVERLAY_LIMIT.
+"""
+
+import os
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from census_columns import BUCKETS, CensusColumns, QueryError
+
+CATEGORICAL_DIMENSIONS = ("caste", "state", "sex", "occupation_category", "housing_type")
+# household_size is kept as its value and age as its age-group index
+DIMENSIONS = CATEGORICAL_DIMENSIONS + ("household_size", "age_group")
+INCOME_BUCKET_WIDTH = int(os.environ.get('CUBE_INCOME_BUCKET_WIDTH', 1000))
+CUBE_OVERLAY_LIMIT = int(os.environ.get('CUBE_OVERLAY_LIMIT', 10000))
+# Below this many people per cell a scan of the eligible rows is as cheap as the cube
+CUBE_MIN_ROWS_PER_CELL = int(os.environ.get('CUBE_MIN_ROWS_PER_CELL', 16))
+# Buckets of the /policy/simulate response
+INCOME_EDGES, INCOME_LABELS = (25000, 50000, 100000), ("0-25k", "25k-50k", "50k-100k", "100k+")
+AGE_EDGES, AGE_LABELS = BUCKETS["age"]
+# Response key -> categorical dimension, in response order
+DISTRIBUTIONS = {
+    "region_distribution": "state",
+    "caste_distribution": "caste",
+    "sex_distribution": "sex",
+    "occupation_distribution": "occupation_category",
+    "housing_distribution": "housing_type",
+}
+
+if any(edge % INCOME_BUCKET_WIDTH for edge in INCOME_EDGES):
+    raise ValueError("CUBE_INCOME_BUCKET_WIDTH must divide the simulation income bracket edges")
+
+
+def _segment_sums(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Running sums that restart at each segment; starts[i] is where item i's segment begins."""
+    total = np.cumsum(values)
+    return total - (total[starts] - values[starts])
+
+
+def _segment_mins(values: np.ndarray, segments: np.ndarray, empty: int) -> np.ndarray:
+    """Running minimums that restart at each segment; segments must be non-decreasing."""
+    # Within a segment segments * empty - values only grows where values shrink
+    shifted = segments.astype(np.int64) * empty - values
+    return segments.astype(np.int64) * empty - np.maximum.accumulate(shifted)
+
+
+class PolicyCube:
+    def __init__(self):
+        self.size = 0
+        self.cells = 0
+        self._columns: Optional[CensusColumns] = None
+        self._lock = threading.Lock()
+        # Row -> (dimension values, income, welfare) of rows changed since the build
+        self.overlay: Dict[int, Tuple[tuple, int, float]] = {}
+
+    # Build
+
+    def build(self, columns: CensusColumns):
+        with self._lock:
+            self._build(columns)
+
+    def _build(self, columns: CensusColumns):
+        n = columns.size
+        income = columns.values["income"].astype(np.int64)
+        welfare = columns.values["welfare_score"].astype(np.float64)
+        dimensions = [self._dimension(columns, field).astype(np.int64) for field in DIMENSIONS]
+
+        # Cells are the distinct dimension combinations, numbered in mixed-radix key order
+        key = np.zeros(n, dtype=np.int64)
+        for values in dimensions:
+            radix = int(values.max()) + 1 if n else 1
+            key = key * radix + values
+        _, first_rows, row_cell = np.unique(key, return_index=True, return_inverse=True)
+        row_cell = row_cell.reshape(-1)
+        bucket = income // INCOME_BUCKET_WIDTH
+        self.bucket_base = int(bucket.min()) if n else 0
+        self.buckets = int(bucket.max()) - self.bucket_base + 2 if n else 1
+        entry_key, row_entry = np.unique(row_cell * self.buckets + (bucket - self.bucket_base), return_inverse=True)
+
+        # Rows sorted by entry, then income
+        order = np.lexsort((np.arange(n), income, row_entry))
+        entry_sizes = np.bincount(row_entry, minlength=len(entry_key))
+        entry_offsets = np.concatenate(([0], np.cumsum(entry_sizes))).astype(np.int64)
+        sorted_entry = row_entry[order]
+        position = np.empty(n, dtype=np.int64)
+        position[order] = np.arange(n)
+
+        self.size = n
+        self.cells = len(first_rows)
+        self.empty = n + 1
+        self.cell_dimensions = {field: values[first_rows] for field, values in zip(DIMENSIONS, dimensions)}
+        self.cell_offsets = np.searchsorted(entry_key // self.buckets, np.arange(self.cells + 1))
+        self.entry_key = entry_key
+        self.entry_cell = entry_key // self.buckets
+        self.entry_bucket = entry_key % self.buckets
+        self.entry_offsets = entry_offsets
+        self.order = order
+        self.position = position
+        self.alive = np.ones(n, dtype=bool)
+        self.row_key = sorted_entry * INCOME_BUCKET_WIDTH + (income - bucket * INCOME_BUCKET_WIDTH)[order]
+        self.row_cell = row_cell
+        self.row_income = income
+        self.row_welfare = welfare
+
+        starts = entry_offsets[sorted_entry]
+        self.row_count = _segment_sums(np.ones(n, dtype=np.int64), starts)
+        self.row_income_sum = _segment_sums(income[order], starts)
+        self.row_welfare_sum = _segment_sums(welfare[order], starts)
+        self.row_first = _segment_mins(order, sorted_entry, self.empty)
+
+        last = entry_offsets[1:] - 1
+        entry_starts = self.cell_offsets[self.entry_cell]
+        self.cell_count = _segment_sums(self.row_count[last], entry_starts)
+        self.cell_income_sum = _segment_sums(self.row_income_sum[last], entry_starts)
+        self.cell_welfare_sum = _segment_sums(self.row_welfare_sum[last], entry_starts)
+        self.cell_first = _segment_mins(self.row_first[last], self.entry_cell, self.empty)
+
+        self.overlay = {}
+        self._columns = columns
+
+    @staticmethod
+    def _dimension(columns: CensusColumns, field: str) -> np.ndarray:
+        if field == "age_group":
+            return np.searchsorted(np.asarray(AGE_EDGES), columns.values["age"], side="right")
+        if field == "household_size":
+            return columns.values["household_size"].astype(np.int64)
+        return columns.codes[field].astype(np.int64)
+
+    @property
+    def compact(self) -> bool:
+        """Whether the cube aggregates enough people per cell to beat scanning rows."""
+        return self._columns is not None and self.size >= self.cells * CUBE_MIN_ROWS_PER_CELL
+
+    # Updates
+
+    def update(self, record: dict):
+        """Move a changed record out of the cube and into the overlay (or back)."""
+        with self._lock:
+            columns = self._columns
+            row = columns.row_index.get(record["record_id"]) if columns else None
+            if row is None:
+                return
+            version = (
+                tuple(int(self._dimension_value(columns, field, row)) for field in DIMENSIONS),
+                int(columns.values["income"][row]),
+                float(columns.values["welfare_score"][row]),
+            )
+            base = (
+                tuple(int(self.cell_dimensions[field][self.row_cell[row]]) for field in DIMENSIONS),
+                int(self.row_income[row]),
+                float(self.row_welfare[row]),
+            )
+            if version == self.overlay.get(row, base):
+                return
+            if version == base:
+                self.overlay.pop(row)
+                self._set_alive(row, True)
+                return
+            if row not in self.overlay:
+                self._set_alive(row, False)
+            self.overlay[row] = version
+            if len(self.overlay) > CUBE_OVERLAY_LIMIT:
+                self._build(columns)
+
+    @staticmethod
+    def _dimension_value(columns: CensusColumns, field: str, row: int) -> int:
+        if field == "age_group":
+            return np.searchsorted(np.asarray(AGE_EDGES), columns.values["age"][row], side="right")
+        if field == "household_size":
+            return columns.values["household_size"][row]
+        return columns.codes[field][row]
+
+    def _set_alive(self, row: int, alive: bool):
+        """Recompute the running totals of a row's entry and cell after masking it in or out."""
+        self.alive[self.position[row]] = alive
+        entry = self.row_key[self.position[row]] // INCOME_BUCKET_WIDTH
+        lo, hi = self.entry_offsets[entry], self.entry_offsets[entry + 1]
+        rows, mask = self.order[lo:hi], self.alive[lo:hi]
+        self.row_count[lo:hi] = np.cumsum(mask)
+        self.row_income_sum[lo:hi] = np.cumsum(np.where(mask, self.row_income[rows], 0))
+        self.row_welfare_sum[lo:hi] = np.cumsum(np.where(mask, self.row_welfare[rows], 0.0))
+        self.row_first[lo:hi] = np.minimum.accumulate(np.where(mask, rows, self.empty))
+
+        cell = self.entry_cell[entry]
+        lo, hi = self.cell_offsets[cell], self.cell_offsets[cell + 1]
+        last = self.entry_offsets[lo + 1:hi + 1] - 1
+        self.cell_count[lo:hi] = np.cumsum(self.row_count[last])
+        self.cell_income_sum[lo:hi] = np.cumsum(self.row_income_sum[last])
+        self.cell_welfare_sum[lo:hi] = np.cumsum(self.row_welfare_sum[last])
+        self.cell_first[lo:hi] = np.minimum.accumulate(self.row_first[last])
+
+    # Queries
+
+    def _matching(self, dimensions: Dict[str, np.ndarray], filters: Sequence[dict]) -> np.ndarray:
+        """Mask over cells (or overlay rows) given by their dimension values."""
+        columns = self._columns
+        mask = np.ones(len(dimensions[DIMENSIONS[0]]), dtype=bool)
+        for leaf in filters:
+            field, op, value = leaf.get("field"), leaf.get("op", "eq"), leaf.get("value")
+            if field in CATEGORICAL_DIMENSIONS and op == "eq":
+                code = columns.code_of(field, value)
+                mask &= dimensions[field] == code if code is not None else False
+            elif field == "household_size" and op in ("eq", "gte", "lte"):
+                values = dimensions[field]
+                mask &= values == value if op == "eq" else values >= value if op == "gte" else values <= value
+            else:
+                raise QueryError(f"The policy cube cannot filter on {field} {op}")
+        return mask
+
+    def _totals_below(self, cells: np.ndarray, bucket: int):
+        """Running-total index of the last entry of each cell below a relative bucket (-1 for none)."""
+        position = np.searchsorted(self.entry_key, cells * self.buckets + min(max(bucket, 0), self.buckets))
+        return position, np.where(position > self.cell_offsets[cells], position - 1, -1)
+
+    def simulate(self, income_threshold: int, filters: Sequence[dict]) -> dict:
+        """The /policy/simulate response for people at or below the threshold matching `filters`."""
+        with self._lock:
+            columns = self._columns
+            if columns is None:
+                raise QueryError("The policy cube has not been built")
+            cells = np.flatnonzero(self._matching(self.cell_dimensions, filters))
+
+            # Whole buckets below the threshold's bucket
+            bucket = income_threshold // INCOME_BUCKET_WIDTH - self.bucket_base
+            position, last = self._totals_below(cells, bucket)
+            full = last >= 0
+            count = np.where(full, self.cell_count[last], 0)
+            income_sum = np.where(full, self.cell_income_sum[last], 0)
+            welfare_sum = np.where(full, self.cell_welfare_sum[last], 0.0)
+            first = np.where(full, self.cell_first[last], self.empty)
+
+            # Exact part of the bucket holding the threshold
+            in_cell = position < self.cell_offsets[cells + 1]
+            boundary = np.flatnonzero(in_cell)
+            boundary = boundary[self.entry_bucket[position[boundary]] == bucket] if bucket >= 0 else boundary[:0]
+            entries = position[boundary]
+            offset = income_threshold - (bucket + self.bucket_base) * INCOME_BUCKET_WIDTH
+            rows = np.searchsorted(self.row_key, entries * INCOME_BUCKET_WIDTH + offset, side="right") - 1
+            inside = rows >= self.entry_offsets[entries]
+            boundary, rows = boundary[inside], rows[inside]
+            count[boundary] += self.row_count[rows]
+            income_sum[boundary] += self.row_income_sum[rows]
+            welfare_sum[boundary] += self.row_welfare_sum[rows]
+            first[boundary] = np.minimum(first[boundary], self.row_first[rows])
+
+            # Rows at or above the threshold's bucket never reach the brackets below it
+            brackets = []
+            for edge in INCOME_EDGES:
+                edge_bucket = edge // INCOME_BUCKET_WIDTH - self.bucket_base
+                if edge <= income_threshold:
+                    _, below = self._totals_below(cells, edge_bucket)
+                    brackets.append(np.where(below >= 0, self.cell_count[below], 0))
+                else:
+                    brackets.append(count)
+
+            dimensions = {field: self.cell_dimensions[field][cells] for field in DIMENSIONS}
+            if self.overlay:
+                overlay_rows = np.fromiter(self.overlay, dtype=np.int64, count=len(self.overlay))
+                versions = list(self.overlay.values())
+                overlay_dimensions = {
+                    field: np.array([v[0][i] for v in versions], dtype=np.int64) for i, field in enumerate(DIMENSIONS)
+                }
+                overlay_income = np.array([v[1] for v in versions], dtype=np.int64)
+                overlay_welfare = np.array([v[2] for v in versions], dtype=np.float64)
+                eligible = self._matching(overlay_dimensions, filters) & (overlay_income <= income_threshold)
+                ones = eligible.astype(np.int64)
+                count = np.concatenate((count, ones))
+                income_sum = np.concatenate((income_sum, np.where(eligible, overlay_income, 0)))
+                welfare_sum = np.concatenate((welfare_sum, np.where(eligible, overlay_welfare, 0.0)))
+                first = np.concatenate((first, np.where(eligible, overlay_rows, self.empty)))
+                brackets = [np.concatenate((b, ones & (overlay_income < e))) for b, e in zip(brackets, INCOME_EDGES)]
+                dimensions = {field: np.concatenate((dimensions[field], overlay_dimensions[field])) for field in DIMENSIONS}
+
+            return self._result(columns, count, income_sum, welfare_sum, first, brackets, dimensions)
+
+    def _result(self, columns, count, income_sum, welfare_sum, first, brackets, dimensions) -> dict:
+        total_population = self.size
+        eligible_population = int(count.sum())
+        income_total = int(income_sum.sum())
+        welfare_total = float(welfare_sum.sum())
+
+        eligible = np.flatnonzero(count)
+        weights, firsts = count[eligible], first[eligible]
+
+        def distribution(field, labels=None):
+            # Dimension values are small non-negative integers: category codes or household sizes
+            values = dimensions[field][eligible]
+            size = int(values.max()) + 1 if len(values) else 0
+            counts = np.bincount(values, weights=weights, minlength=size).astype(np.int64)
+            first_rows = np.full(size, self.empty, dtype=np.int64)
+            np.minimum.at(first_rows, values, firsts)
+            # Keys in order of each value's first eligible row, as in the record loop
+            present = np.flatnonzero(counts)
+            present = present[np.argsort(first_rows[present], kind="stable")]
+            return {labels[code] if labels is not None else str(code): int(counts[code]) for code in present.tolist()}
+
+        below = [int(b.sum()) for b in brackets] + [eligible_population]
+        age_counts = np.bincount(dimensions["age_group"], weights=count, minlength=len(AGE_LABELS))
+
+        return {
+            "total_population": total_population,
+            "eligible_population": eligible_population,
+            "eligibility_percentage": round((eligible_population / total_population) * 100, 2) if total_population > 0 else 0,
+            "avg_income_eligible": round(income_total / eligible_population) if eligible_population > 0 else 0,
+            "avg_welfare_eligible": round(welfare_total / eligible_population, 2) if eligible_population > 0 else 0,
+            **{key: distribution(field, columns.categories[field]) for key, field in DISTRIBUTIONS.items()},
+            "income_brackets": dict(zip(INCOME_LABELS, [below[0]] + [b - a for a, b in zip(below, below[1:])])),
+            "age_groups": dict(zip(AGE_LABELS, age_counts.astype(np.int64).tolist())),
+            "household_size_distribution": distribution("household_size"),
+        }
+
+
+census_cube = PolicyCube()
@@ -0,0 +1,264 @@
+"""
+Income-threshold optimizer for policy simulation.
+
+Given fixed category filters, finds the income threshold that meets a target
+instead of leaving policy makers to probe /policy/simulate by hand:
+
+    beneficiaries   lowest threshold with at least `value` people eligible
+    percentage      lowest threshold with at least `value`% of the population eligible
+    budget          highest threshold whose cost stays within `value`
+
+Budgets cost either a flat `benefit_amount` per beneficiary or, in "top_up"
+mode, the gap between each beneficiary's income and the threshold. Both
+the eligible count and the cost are non-decreasing in the threshold, so the
+answer is a binary search over integer thresholds, each probe being a
+searchsorted on the sorted incomes (see policy_sweep.IncomeCurve).
+
+With `group_by` the optimizer returns one threshold per group instead: it
+binary-searches a common coverage rate r, where each group's threshold is
+the lowest one covering a fraction r of that group, so every state (say)
+reaches the same share of its own filtered population. Groups are
+contiguous segments of one (group, income) sort, so every probe is a few
+array operations over all groups at once, even for thousands of pincodes.
+"""
+
+import math
+from typing import Callable, Optional
+
+import numpy as np
+
+from census_columns import CONTINUOUS_FIELDS, CensusColumns, QueryError
+from policy_sweep import IncomeCurve, _segments
+
+TARGETS = ("beneficiaries", "percentage", "budget")
+BENEFIT_MODES = ("flat", "top_up")
+# Bisection steps over the coverage rate in group mode; 2**-50 is far below one person
+RATE_SEARCH_STEPS = 50
+
+
+class _Probe:
+    """Counts how many thresholds a search evaluated."""
+
+    def __init__(self, function: Callable):
+        self.function = function
+        self.calls = 0
+
+    def __call__(self, value):
+        self.calls += 1
+        return self.function(value)
+
+
+def lowest_integer(lo: int, hi: int, predicate: Callable[[int], bool]) -> Optional[int]:
+    """Smallest t in [lo, hi] where a monotone predicate holds, or None."""
+    if lo > hi or not predicate(hi):
+        return None
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if predicate(mid):
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
+def highest_integer(lo: int, hi: int, predicate: Callable[[int], bool]) -> Optional[int]:
+    """Largest t in [lo, hi] where a predicate that holds up to some point holds, or None."""
+    if lo > hi or not predicate(lo):
+        return None
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if predicate(mid):
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _cost(curve: IncomeCurve, threshold: int, count: int, benefit_mode: str, benefit_amount: float) -> float:
+    if benefit_mode == "flat":
+        return count * benefit_amount
+    return count * threshold - int(curve.income_prefix[count])
+
+
+def _summary(curve: IncomeCurve, threshold: Optional[int], total_population: int, benefit_mode, benefit_amount):
+    count = int(curve.eligible_counts(threshold)) if threshold is not None else 0
+    income_sum = int(curve.income_prefix[count])
+    result = {
+        "income_threshold": threshold,
+        "eligible_population": count,
+        "eligibility_percentage": round((count / total_population) * 100, 2) if total_population > 0 else 0,
+        "avg_income_eligible": round(income_sum / count) if count > 0 else 0,
+    }
+    if benefit_mode is not None and threshold is not None:
+        result["total_cost"] = round(_cost(curve, threshold, count, benefit_mode, benefit_amount), 2)
+    return result
+
+
+def required_count(target: str, value: float, total_population: int) -> int:
+    if target == "beneficiaries":
+        return math.ceil(value)
+    # Percentages are of the whole census, as in /policy/simulate
+    return math.ceil(value / 100 * total_population - 1e-9)
+
+
+def optimize(
+    columns: CensusColumns,
+    rows: np.ndarray,
+    target: str,
+    value: float,
+    benefit_amount: Optional[float] = None,
+    benefit_mode: str = "flat",
+    threshold_max: Optional[int] = None,
+    group_by: Optional[str] = None,
+) -> dict:
+    """Best threshold (or per-group thresholds) for the filtered rows; see the module docstring."""
+    if target not in TARGETS:
+        raise QueryError(f"target must be one of {', '.join(TARGETS)}")
+    if value < 0:
+        raise QueryError("value must not be negative")
+    if target == "budget":
+        if benefit_mode not in BENEFIT_MODES:
+            raise QueryError(f"benefit_mode must be one of {', '.join(BENEFIT_MODES)}")
+        if benefit_mode == "flat" and (benefit_amount is None or benefit_amount <= 0):
+            raise QueryError("budget targets with flat benefits need a positive benefit_amount")
+    else:
+        benefit_mode = None
+
+    incomes = columns.values["income"][rows]
+    welfare = columns.values["welfare_score"][rows]
+    if group_by is not None:
+        if threshold_max is not None:
+            raise QueryError("threshold_max cannot be combined with group_by")
+        return _optimize_groups(columns, rows, incomes, target, value, benefit_amount, benefit_mode, group_by)
+
+    curve = IncomeCurve(incomes, welfare)
+    total_population = columns.size
+    highest_income = int(curve.incomes[-1]) if len(curve) else 0
+    hi = highest_income
+
+    if target == "budget":
+        if benefit_mode == "top_up":
+            # Past the highest income everyone is eligible and the cost grows by len(curve) per unit
+            hi += int(value // max(len(curve), 1)) + 1
+        if threshold_max is not None:
+            hi = min(hi, threshold_max)
+        probe = _Probe(lambda t: _cost(curve, t, int(curve.eligible_counts(t)), benefit_mode, benefit_amount) <= value)
+        threshold = highest_integer(0, hi, probe)
+        feasible = threshold is not None
+    else:
+        if threshold_max is not None:
+            hi = min(hi, threshold_max)
+        needed = required_count(target, value, total_population)
+        probe = _Probe(lambda t: curve.eligible_counts(t) >= needed)
+        threshold = lowest_integer(0, hi, probe)
+        feasible = threshold is not None
+        if not feasible:
+            # Report the closest achievable: everyone the filters (and cap) allow
+            threshold = hi
+
+    return {
+        "target": target,
+        "value": value,
+        "feasible": feasible,
+        "base_population": len(curve),
+        "search_steps": probe.calls,
+        **_summary(curve, threshold, total_population, benefit_mode, benefit_amount),
+    }
+
+
+def _optimize_groups(columns, rows, incomes, target, value, benefit_amount, benefit_mode, group_by):
+    if group_by in CONTINUOUS_FIELDS or (group_by not in columns.codes and group_by not in columns.values):
+        raise QueryError(f"Cannot group by {group_by}")
+    if group_by in columns.codes:
+        codes, labels = columns.codes[group_by][rows], columns.categories[group_by]
+    else:
+        distinct, codes = np.unique(columns.values[group_by][rows], return_inverse=True)
+        labels = [str(v) for v in distinct.tolist()]
+
+    # Rows sorted by group, then income; each group is a contiguous sorted segment
+    order = np.lexsort((incomes, codes))
+    sorted_codes, sorted_incomes = codes[order], incomes[order].astype(np.int64)
+    present, starts, first_seen = _segments(sorted_codes, codes)
+    sizes = np.diff(np.append(starts, len(order)))
+    prefix = np.concatenate(([0], np.cumsum(sorted_incomes)))
+    # One past the last row of each row's (group, income) run: a threshold at a row covers its ties
+    run_last = np.ones(len(order), dtype=bool)
+    run_last[:-1] = (sorted_codes[1:] != sorted_codes[:-1]) | (sorted_incomes[1:] != sorted_incomes[:-1])
+    last_rows = np.flatnonzero(run_last)
+    run_end = last_rows[np.searchsorted(last_rows, np.arange(len(order)))] + 1
+    total_population = columns.size
+
+    def allocate(rate: float):
+        """Per-group thresholds (valid where counts > 0), eligible counts and costs for one coverage rate."""
+        covered = np.minimum(sizes, np.ceil(rate * sizes - 1e-9).astype(np.int64))
+        last = np.maximum(starts + covered - 1, 0)
+        thresholds = sorted_incomes[last]
+        counts = np.where(covered > 0, run_end[last] - starts, 0)
+        if benefit_mode == "flat":
+            costs = counts * benefit_amount
+        elif benefit_mode == "top_up":
+            costs = counts * thresholds - (prefix[starts + counts] - prefix[starts])
+        else:
+            costs = np.zeros(len(sizes))
+        return thresholds, counts, costs
+
+    def total_count(rate: float) -> int:
+        return int(allocate(rate)[1].sum())
+
+    def total_cost(rate: float) -> float:
+        return float(allocate(rate)[2].sum())
+
+    lo, hi = 0.0, 1.0
+    if target == "budget":
+        feasible = True
+        if total_cost(1.0) <= value:
+            lo = 1.0
+        for _ in range(RATE_SEARCH_STEPS if lo < 1.0 else 0):
+            mid = (lo + hi) / 2
+            if total_cost(mid) <= value:
+                lo = mid
+            else:
+                hi = mid
+        rate = lo
+    else:
+        needed = required_count(target, value, total_population)
+        feasible = total_count(1.0) >= needed
+        for _ in range(RATE_SEARCH_STEPS if feasible else 0):
+            mid = (lo + hi) / 2
+            if total_count(mid) >= needed:
+                hi = mid
+            else:
+                lo = mid
+        rate = hi
+
+    thresholds, counts, costs = allocate(rate)
+    income_sums = prefix[starts + counts] - prefix[starts]
+    eligible = int(counts.sum())
+    groups = {}
+    for g in np.argsort(first_seen, kind="stable").tolist():
+        count = int(counts[g])
+        group = {
+            "base_population": int(sizes[g]),
+            "income_threshold": int(thresholds[g]) if count else None,
+            "eligible_population": count,
+            "eligibility_percentage": round((count / total_population) * 100, 2) if total_population > 0 else 0,
+            "avg_income_eligible": round(int(income_sums[g]) / count) if count > 0 else 0,
+        }
+        if benefit_mode is not None and count:
+            group["total_cost"] = round(float(costs[g]), 2)
+        groups[labels[present[g]]] = group
+
+    result = {
+        "target": target,
+        "value": value,
+        "feasible": feasible,
+        "base_population": int(len(rows)),
+        "group_by": group_by,
+        "coverage_rate": round(rate, 6),
+        "eligible_population": eligible,
+        "eligibility_percentage": round((eligible / total_population) * 100, 2) if total_population > 0 else 0,
+        "thresholds": groups,
+    }
+    if benefit_mode is not None:
+        result["total_cost"] = round(float(costs.sum()), 2)
+    return result
@@ -0,0 +1,113 @@
+"""
+Income-threshold sweeps for policy simulation.
+
+A simulation's eligibility is "income <= threshold" ANDed with a fixed set of
+category filters. For a fixed filter set, sorting the matching rows' incomes
+once (with prefix sums of income and welfare score in that order) turns any
+threshold into a binary search: the eligible rows are a prefix of the sorted
+array, so counts and sums at threshold t are read at
+searchsorted(incomes, t, side="right"). Category breakdowns do the same on
+per-group sorted segments.
+"""
+
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from census_columns import CONTINUOUS_FIELDS, CensusColumns, QueryError
+
+
+class IncomeCurve:
+    """Sorted incomes of a set of rows with income and welfare prefix sums."""
+
+    def __init__(self, incomes: np.ndarray, welfare: np.ndarray):
+        order = np.argsort(incomes, kind="stable")
+        self.incomes = incomes[order]
+        self.income_prefix = np.concatenate(([0], np.cumsum(self.incomes, dtype=np.int64)))
+        self.welfare_prefix = np.concatenate(([0.0], np.cumsum(welfare[order], dtype=np.float64)))
+
+    def __len__(self) -> int:
+        return len(self.incomes)
+
+    def eligible_counts(self, thresholds: np.ndarray) -> np.ndarray:
+        return np.searchsorted(self.incomes, thresholds, side="right")
+
+    def income_sums(self, counts: np.ndarray) -> np.ndarray:
+        return self.income_prefix[counts]
+
+    def welfare_sums(self, counts: np.ndarray) -> np.ndarray:
+        return self.welfare_prefix[counts]
+
+
+def default_thresholds(incomes: np.ndarray, threshold_min: int, threshold_max, steps: int) -> List[int]:
+    """`steps` + 1 evenly spaced thresholds from threshold_min to threshold_max (default: highest income)."""
+    if threshold_max is None:
+        threshold_max = int(incomes.max()) if len(incomes) else threshold_min
+    return sorted(set(np.linspace(threshold_min, max(threshold_max, threshold_min), steps + 1).round().astype(int).tolist()))
+
+
+def sweep(
+    columns: CensusColumns,
+    rows: np.ndarray,
+    thresholds: Sequence[int],
+    breakdowns: Sequence[str] = (),
+) -> dict:
+    """
+    Eligibility curve over `thresholds` for the rows matching the category
+    filters. Metrics are lists aligned with `thresholds`; breakdowns map each
+    value of a field (in first-seen order) to its eligible counts.
+    """
+    points = np.asarray(thresholds)
+    incomes = columns.values["income"][rows]
+    curve = IncomeCurve(incomes, columns.values["welfare_score"][rows])
+    counts = curve.eligible_counts(points)
+    income_sums = curve.income_sums(counts)
+    welfare_sums = curve.welfare_sums(counts)
+    total = columns.size
+
+    result = {
+        "total_population": total,
+        "base_population": len(curve),
+        "thresholds": points.tolist(),
+        "eligible_population": counts.tolist(),
+        "eligibility_percentage": [round((c / total) * 100, 2) if total > 0 else 0 for c in counts.tolist()],
+        "avg_income_eligible": [
+            round(s / c) if c > 0 else 0 for s, c in zip(income_sums.tolist(), counts.tolist())
+        ],
+        "avg_welfare_eligible": [
+            round(s / c, 2) if c > 0 else 0 for s, c in zip(welfare_sums.tolist(), counts.tolist())
+        ],
+        "breakdowns": {},
+    }
+    for field in breakdowns:
+        result["breakdowns"][field] = _breakdown(columns, field, rows, incomes, points)
+    return result
+
+
+def _breakdown(columns: CensusColumns, field: str, rows: np.ndarray, incomes: np.ndarray, points: np.ndarray):
+    if field in CONTINUOUS_FIELDS or (field not in columns.codes and field not in columns.values):
+        raise QueryError(f"Cannot break down by {field}")
+    if field in columns.codes:
+        codes, labels = columns.codes[field][rows], columns.categories[field]
+    else:
+        distinct, codes = np.unique(columns.values[field][rows], return_inverse=True)
+        labels = [str(v) for v in distinct.tolist()]
+
+    # Rows sorted by group, then income; each group is a contiguous sorted segment
+    order = np.lexsort((incomes, codes))
+    sorted_codes, sorted_incomes = codes[order], incomes[order]
+    present, starts, first_seen = _segments(sorted_codes, codes)
+    ends = np.append(starts[1:], len(sorted_codes))
+
+    counts: Dict[str, List[int]] = {}
+    for g in np.argsort(first_seen, kind="stable").tolist():
+        segment = sorted_incomes[starts[g]:ends[g]]
+        counts[labels[present[g]]] = np.searchsorted(segment, points, side="right").tolist()
+    return counts
+
+
+def _segments(sorted_codes: np.ndarray, codes: np.ndarray):
+    """Distinct codes, where each starts in sorted_codes, and its first index in codes."""
+    present, starts = np.unique(sorted_codes, return_index=True)
+    _, first_seen = np.unique(codes, return_index=True)
+    return present, starts, first_seen
@@ -0,0 +1,110 @@
+"""
+Response cache for read-heavy analytics endpoints.
+
+Serialized responses are cached per (endpoint, normalized parameters, role)
+and tagged with the dataset version they were computed from. Writes to the
+census data bump the version, which invalidates every cached response at
+once without tracking which entries a write touched. Entries are evicted in
+LRU order once their total size exceeds the memory budget.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+
+@dataclass
+class CachedResponse:
+    version: int
+    body: bytes
+    etag: str
+
+
+def make_etag(body: bytes) -> str:
+    """
+    Weak ETag derived from the uncompressed body. It is weak because the
+    same body goes out as brotli, gzip or identity (see compression), and
+    those representations are not byte-identical.
+    """
+    return 'W/"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison, as required for If-None-Match
+    opaque = etag.removeprefix("W/")
+    return "*" in candidates or any(tag.removeprefix("W/") == opaque for tag in candidates)
+
+
+class ResponseCache:
+    """Version-invalidated LRU cache of serialized responses with a byte budget."""
+
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._size = 0
+        self._version = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "not_modified": 0}
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def bump_version(self) -> int:
+        """Mark the dataset as changed; every cached response becomes stale."""
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+            self._size = 0
+            return self._version
+
+    @staticmethod
+    def make_key(endpoint: str, params: Dict[str, Any], role: str) -> str:
+        # Unset parameters are equivalent to omitted ones
+        normalized = {k: v for k, v in params.items() if v is not None}
+        return f"{endpoint}|{role}|{json.dumps(normalized, sort_keys=True, default=str)}"
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != self._version:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry
+
+    def put(self, key: str, body: bytes, version: int) -> CachedResponse:
+        """
+        Store a response computed from `version`. Responses computed from an
+        older version (a write landed mid-computation) are returned but not kept.
+        """
+        entry = CachedResponse(version=version, body=body, etag=make_etag(body))
+        with self._lock:
+            if version != self._version or len(body) > self.max_bytes:
+                return entry
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old.body)
+            self._entries[key] = entry
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.body)
+                self.stats["evictions"] += 1
+        return entry
+
+    def status(self) -> dict:
+        return {**self.stats, "entries": len(self._entries), "bytes": self._size, "version": self._version}
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,128 @@
+"""
+Hierarchical census rollups: national -> state -> district -> pincode.
+
+Every node keeps population, flag-status tallies, income and welfare sums
+and the scheme leakage count for the records below it. The cube is built in
+one pass when the census data is loaded and kept current by removing a
+record's contribution before it changes and adding it back afterwards, so
+reads at any level are a dictionary walk instead of a scan of every record.
+
+Node stats are rendered in the `/analytics/states` shape: averages are
+derived from the sums at read time and only the normal/review/priority
+tallies are reported, although every flag status is counted internally.
+"""
+
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+LEVELS = ("national", "state", "district", "pincode")
+# Record field that names the child at each level below a node
+LEVEL_FIELDS = ("state", "district", "pin_code")
+REPORTED_FLAGS = ("normal", "review", "priority")
+
+
+class RollupNode:
+    __slots__ = ("population", "flags", "income_sum", "welfare_sum", "leakage_count", "children", "_stats")
+
+    def __init__(self):
+        self.population = 0
+        self.flags: Dict[str, int] = {}
+        self.income_sum = 0
+        self.welfare_sum = 0.0
+        self.leakage_count = 0
+        self.children: Dict[str, "RollupNode"] = {}
+        self._stats: Optional[dict] = None
+
+    def apply(self, record: dict, sign: int):
+        self._stats = None
+        self.population += sign
+        self.income_sum += sign * record["income"]
+        self.welfare_sum += sign * record.get("welfare_score", 0)
+        if record.get("scheme_leakage_flag") == 1:
+            self.leakage_count += sign
+        flag_status = record.get("flag_status", "normal")
+        self.flags[flag_status] = self.flags.get(flag_status, 0) + sign
+
+    def stats(self) -> dict:
+        # Rendered once per change; large drill-downs re-render thousands of nodes
+        if self._stats is not None:
+            return self._stats
+        population = self.population
+        self._stats = {
+            "total_population": population,
+            **{flag: self.flags.get(flag, 0) for flag in REPORTED_FLAGS},
+            "avg_income": round(self.income_sum / population) if population else 0,
+            "avg_welfare_score": round(self.welfare_sum / population, 2) if population else 0,
+            "scheme_leakage_count": self.leakage_count,
+        }
+        return self._stats
+
+
+class RollupCube:
+    """Incrementally maintained state/district/pincode aggregates."""
+
+    def __init__(self):
+        self.root = RollupNode()
+        self._lock = threading.Lock()
+
+    def build(self, records: Iterable[dict]):
+        root = RollupNode()
+        for record in records:
+            self._apply(root, record, 1)
+        with self._lock:
+            self.root = root
+
+    def add(self, record: dict):
+        with self._lock:
+            self._apply(self.root, record, 1)
+
+    def remove(self, record: dict):
+        """Subtract a record's contribution, pruning nodes left empty."""
+        with self._lock:
+            self._apply(self.root, record, -1)
+
+    @staticmethod
+    def _apply(root: RollupNode, record: dict, sign: int):
+        node = root
+        node.apply(record, sign)
+        for field in LEVEL_FIELDS:
+            key = str(record.get(field) or "Unknown")
+            child = node.children.get(key)
+            if child is None:
+                child = node.children[key] = RollupNode()
+            child.apply(record, sign)
+            if child.population == 0:
+                del node.children[key]
+                break
+            node = child
+
+    def states(self) -> Dict[str, dict]:
+        """Per-state stats in the `/analytics/states` response shape."""
+        with self._lock:
+            return {state: dict(node.stats()) for state, node in self.root.children.items()}
+
+    def subtree(self, path: Tuple[str, ...] = (), depth: int = 1) -> Optional[dict]:
+        """
+        Stats for the node at `path` (state, district, pincode prefixes) with
+        `depth` levels of children nested under "children". Returns None if
+        the path does not exist.
+        """
+        with self._lock:
+            node = self.root
+            for key in path:
+                node = node.children.get(key)
+                if node is None:
+                    return None
+            return self._render(node, len(path), depth)
+
+    def _render(self, node: RollupNode, level: int, depth: int) -> dict:
+        result = {"level": LEVELS[level], **node.stats()}
+        if depth > 0 and level < len(LEVEL_FIELDS):
+            result["child_level"] = LEVELS[level + 1]
+            result["children"] = {
+                key: self._render(child, level + 1, depth - 1) for key, child in node.children.items()
+            }
+        return result
+
+
+census_rollups = RollupCube()
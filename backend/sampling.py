@@ -0,0 +1,192 @@
+"""
+Stratified sample of the census for approximate analytics.
+
+Every row gets a fixed random priority when the data is loaded, and within
+each stratum (state x region) rows are ranked by it. A sample of fraction
+f takes the top ceil(f * N_h) rows of every stratum h (at least
+SAMPLE_MIN_PER_STRATUM, or the whole stratum when it is smaller), so the
+samples for increasing fractions are nested and a progressive answer only
+ever adds rows. Membership depends on the stratum alone; the sampled rows'
+values are read from the live column store, so estimates follow reviews.
+
+SampleEstimate computes stratified estimates with normal-approximation
+confidence intervals:
+
+    total   T = sum_h N_h * mean_h,
+            Var = sum_h N_h^2 (1 - n_h / N_h) s_h^2 / n_h
+    ratio   R = T_y / T_x, with the variance of the total of y - R x
+            divided by T_x^2 (linearization)
+
+Counts are totals of indicators and averages are ratios, which covers
+everything /analytics/summary and /policy/simulate report.
+"""
+
+import math
+import os
+import threading
+from statistics import NormalDist
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from census_columns import CensusColumns
+
+SAMPLE_STRATA = ("state", "region")
+# Fractions of the progressive stages before the exact answer; the first is the approx=true answer
+SAMPLE_FRACTIONS = tuple(float(f) for f in os.environ.get('SAMPLE_FRACTIONS', '0.01,0.1').split(','))
+SAMPLE_MIN_PER_STRATUM = int(os.environ.get('SAMPLE_MIN_PER_STRATUM', 20))
+SAMPLE_CONFIDENCE = 0.95
+
+# (estimate, lower, upper)
+Interval = Tuple[float, float, float]
+
+
+class SampleEstimate:
+    """Estimators over one stratified sample."""
+
+    def __init__(self, rows: np.ndarray, strata: np.ndarray, population: np.ndarray, confidence: float):
+        self.rows = rows
+        self.strata = strata
+        self.population = population.astype(np.float64)
+        self.sampled = np.bincount(strata, minlength=len(population)).astype(np.float64)
+        self.confidence = confidence
+        self.z = NormalDist().inv_cdf((1 + confidence) / 2)
+        # Strata with no sampled rows are empty in the population too
+        sampled = self.sampled > 0
+        self._weight = np.where(sampled, self.population / np.maximum(self.sampled, 1), 0.0)
+        finite = np.where(sampled, (1 - self.sampled / np.maximum(self.population, 1)), 0.0)
+        self._variance_factor = np.where(
+            self.sampled > 1, self.population ** 2 * finite / np.maximum(self.sampled, 1), 0.0
+        )
+
+    @property
+    def size(self) -> int:
+        return len(self.rows)
+
+    @property
+    def fraction(self) -> float:
+        total = self.population.sum()
+        return len(self.rows) / total if total else 1.0
+
+    def _total(self, values: np.ndarray) -> Tuple[float, float]:
+        """Estimated population total of a per-sampled-row variable and its variance."""
+        k = len(self.population)
+        sums = np.bincount(self.strata, weights=values, minlength=k)
+        squares = np.bincount(self.strata, weights=values * values, minlength=k)
+        n = np.maximum(self.sampled, 1)
+        means = sums / n
+        spread = np.where(self.sampled > 1, (squares - n * means * means) / np.maximum(self.sampled - 1, 1), 0.0)
+        return float((self._weight * sums).sum()), float((self._variance_factor * np.maximum(spread, 0)).sum())
+
+    def _interval(self, estimate: float, variance: float, low: float = -math.inf, high: float = math.inf) -> Interval:
+        margin = self.z * math.sqrt(variance)
+        return estimate, max(low, estimate - margin), min(high, estimate + margin)
+
+    def total(self, values: np.ndarray) -> Interval:
+        return self._interval(*self._total(values.astype(np.float64)))
+
+    def count(self, mask: np.ndarray) -> Interval:
+        return self._interval(*self._total(mask.astype(np.float64)), 0, float(self.population.sum()))
+
+    def ratio(self, numerator: np.ndarray, denominator: np.ndarray) -> Interval:
+        numerator, denominator = numerator.astype(np.float64), denominator.astype(np.float64)
+        total_numerator, _ = self._total(numerator)
+        total_denominator, _ = self._total(denominator)
+        if total_denominator == 0:
+            return 0.0, 0.0, 0.0
+        estimate = total_numerator / total_denominator
+        _, variance = self._total(numerator - estimate * denominator)
+        return self._interval(estimate, variance / total_denominator ** 2)
+
+    def counts(self, codes: np.ndarray, size: int, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Estimated population count of each code 0..size-1 among the rows in `mask`."""
+        k = len(self.population)
+        strata = self.strata if mask is None else self.strata[mask]
+        codes = codes if mask is None else codes[mask]
+        hits = np.bincount(strata * size + codes, minlength=k * size).reshape(k, size)
+        n = np.maximum(self.sampled, 1)[:, None]
+        share = hits / n
+        spread = np.where(self.sampled[:, None] > 1, share * (1 - share) * n / np.maximum(n - 1, 1), 0.0)
+        estimate = (self._weight[:, None] * hits).sum(axis=0)
+        margin = self.z * np.sqrt((self._variance_factor[:, None] * spread).sum(axis=0))
+        return estimate, np.maximum(estimate - margin, 0), np.minimum(estimate + margin, self.population.sum())
+
+    def distribution(
+        self, codes: np.ndarray, labels: Sequence, mask: Optional[np.ndarray] = None, keep_empty: bool = False
+    ) -> Tuple[dict, dict]:
+        """Estimated count per label and its [lower, upper] bounds, keyed in code order."""
+        estimate, lower, upper = self.counts(codes, len(labels), mask)
+        present = range(len(labels)) if keep_empty else np.flatnonzero(np.round(estimate)).tolist()
+        return (
+            {labels[i]: int(round(estimate[i])) for i in present},
+            {labels[i]: [int(round(lower[i])), int(round(upper[i]))] for i in present},
+        )
+
+
+class StratifiedSample:
+    def __init__(self, seed: int = 0):
+        self.seed = seed
+        self.size = 0
+        self._columns: Optional[CensusColumns] = None
+        self._lock = threading.Lock()
+        self._samples: Dict[float, np.ndarray] = {}
+
+    def build(self, columns: CensusColumns):
+        n = columns.size
+        key = np.zeros(n, dtype=np.int64)
+        for field in SAMPLE_STRATA:
+            key = key * max(len(columns.categories[field]), 1) + columns.codes[field]
+        _, strata = np.unique(key, return_inverse=True)
+        strata = strata.reshape(-1)
+        priority = np.random.default_rng(self.seed).random(n)
+
+        with self._lock:
+            self.size = n
+            self.row_strata = strata
+            self.population = np.bincount(strata) if n else np.zeros(0, dtype=np.int64)
+            # Rows of each stratum by priority: the first rows of a stratum are its sample
+            self.order = np.lexsort((priority, strata))
+            self.offsets = np.concatenate(([0], np.cumsum(self.population))).astype(np.int64)
+            self._strata_codes = {field: columns.codes[field].copy() for field in SAMPLE_STRATA}
+            self._columns = columns
+            self._samples = {}
+
+    def update(self, record: dict):
+        """Re-stratify after a record moved to another state or region."""
+        columns = self._columns
+        row = columns.row_index.get(record["record_id"]) if columns else None
+        if row is None:
+            return
+        if any(columns.codes[field][row] != self._strata_codes[field][row] for field in SAMPLE_STRATA):
+            self.build(columns)
+
+    def rows(self, fraction: float) -> np.ndarray:
+        """Sampled rows for a fraction, in row order."""
+        with self._lock:
+            return self._rows(fraction)
+
+    def _rows(self, fraction: float) -> np.ndarray:
+        rows = self._samples.get(fraction)
+        if rows is None:
+            quota = np.minimum(
+                np.maximum(np.ceil(self.population * fraction), SAMPLE_MIN_PER_STRATUM), self.population
+            ).astype(np.int64)
+            rows = np.sort(np.concatenate(
+                [self.order[start:start + q] for start, q in zip(self.offsets[:-1].tolist(), quota.tolist())]
+                or [np.zeros(0, dtype=np.int64)]
+            ))
+            self._samples[fraction] = rows
+        return rows
+
+    def estimate(self, fraction: float, confidence: float = SAMPLE_CONFIDENCE) -> SampleEstimate:
+        with self._lock:
+            rows = self._rows(fraction)
+            return SampleEstimate(rows, self.row_strata[rows], self.population, confidence)
+
+
+def bounds(interval: Interval, digits: Optional[int] = None) -> list:
+    """[lower, upper] of an interval, rounded like its reported estimate."""
+    return [round(interval[1], digits), round(interval[2], digits)]
+
+
+census_sample = StratifiedSample()
@@ -1,42 +1,79 @@
 from fastapi import FastAPI, APIRouter, HTTPException, Request, Response, Depends
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 import json
+import hashlib
+import hmac
+import itertools
 import random
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Optional, Dict, Any
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone, timedelta
 import httpx
+import numpy as np
+
+from audit_store import AuditStore
+from audit_writer import AuditWriter, mongo_audit_sink
+from response_cache import response_cache, etag_matches
+from json_response import ORJSONResponse, dumps as json_dumps
+from compression import CompressionMiddleware
+from instrumentation import InstrumentationMiddleware, register_gauge, render_metrics, span
+from rollups import census_rollups
+from census_columns import BUCKETS, census_columns, QueryError
+from bitmap_index import census_bitmaps, popcount
+from policy_sweep import default_thresholds, sweep
+from policy_optimizer import optimize
+from households import census_households
+from policy_cube import census_cube
+from sampling import SAMPLE_FRACTIONS, bounds, census_sample
+from sketches import census_sketches, parse_quantiles
+from singleflight import SINGLEFLIGHT_SCOPE, analytics_flights
+from monte_carlo import MonteCarloRun, shutdown as shutdown_monte_carlo
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# Load demo census data from output.json
+# Load demo census data from output.json (or a synthetic dataset, see benchmarks/)
+CENSUS_DATA_FILE = Path(os.environ.get('CENSUS_DATA_FILE', str(ROOT_DIR.parent / 'testdata' / 'output.json')))
+CENSUS_MAX_RECORDS = int(os.environ.get('CENSUS_MAX_RECORDS', 100000))
+
 DEMO_CENSUS_DATA = []
 DEMO_DATA_BY_HOUSEHOLD = {}
 DEMO_DATA_BY_ID = {}
 
+def read_raw_census_records(data_file: Path, max_records: int) -> list:
+    """Read up to max_records raw records from a JSON array or JSON lines file"""
+    if data_file.suffix == '.jsonl':
+        # Streamed, so a capped load never reads the rest of a large file
+        with open(data_file, 'r', encoding='utf-8') as f:
+            lines = (line for line in f if line.strip())
+            if max_records > 0:
+                lines = itertools.islice(lines, max_records)
+            return [json.loads(line) for line in lines]
+    
+    with open(data_file, 'r', encoding='utf-8') as f:
+        raw_data = json.load(f)
+    return raw_data[:max_records] if max_records > 0 else raw_data
+
 def load_demo_census_data():
-    """Load census data from testdata/output.json file"""
+    """Load census data from CENSUS_DATA_FILE (testdata/output.json by default)"""
     global DEMO_CENSUS_DATA, DEMO_DATA_BY_HOUSEHOLD, DEMO_DATA_BY_ID
     
-    data_file = ROOT_DIR.parent / 'testdata' / 'output.json'
+    data_file = CENSUS_DATA_FILE
     if not data_file.exists():
         logging.warning(f"Demo data file not found: {data_file}")
         return []
     
     try:
-        with open(data_file, 'r', encoding='utf-8') as f:
-            raw_data = json.load(f)
-        
-        # Load all 100000 records
-        raw_data = raw_data[:100000]
+        # Load up to CENSUS_MAX_RECORDS records (0 means no limit)
+        raw_data = read_raw_census_records(data_file, CENSUS_MAX_RECORDS)
         
         # Indian first and last names for generating realistic names
         first_names_male = ["Rajesh", "Amit", "Vikram", "Suresh", "Ramesh", "Anil", "Vijay", "Sanjay", "Deepak", "Manoj", "Ravi", "Sunil", "Ashok", "Rakesh", "Pankaj"]
@@ -158,11 +195,30 @@ else:
 in_memory_db = {
     "users": {},
     "user_sessions": {},
-    "census_records": {},
-    "audit_logs": []
+    "census_records": {}
 }
 
-app = FastAPI()
+# Append-only audit log: ring buffer in memory, JSONL segments on disk
+AUDIT_LOG_DIR = os.environ.get('AUDIT_LOG_DIR', str(ROOT_DIR / 'audit_logs'))
+audit_store = AuditStore(AUDIT_LOG_DIR or None)
+
+# Mongo audit writes go through a local WAL and are shipped in batches
+AUDIT_WAL_DIR = os.environ.get('AUDIT_WAL_DIR', str(ROOT_DIR / 'audit_logs' / 'wal'))
+audit_writer = AuditWriter(Path(AUDIT_WAL_DIR), mongo_audit_sink(mongo_db.audit_logs)) if mongo_db is not None else None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if audit_writer is not None:
+        await audit_writer.start()
+    yield
+    if audit_writer is not None:
+        await audit_writer.stop()
+    if mongo_client:
+        mongo_client.close()
+    audit_store.close()
+    shutdown_monte_carlo()
+
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
 api_router = APIRouter(prefix="/api")
 
 EMERGENT_AUTH_URL = "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data"
@@ -231,8 +287,38 @@ class CensusRecord(BaseModel):
 class ReviewUpdate(BaseModel):
     action: str
 
-class PolicySimulation(BaseModel):
-    income_threshold: int
+REVIEW_ACTIONS = {"approve": "approved", "request_verification": "verification_requested"}
+BULK_REVIEW_MAX_RECORDS = int(os.environ.get('BULK_REVIEW_MAX_RECORDS', 5000))
+
+class BulkReviewFilter(BaseModel):
+    flag_status: Optional[str] = None
+    flag_source: Optional[str] = None
+    state: Optional[str] = None
+    district: Optional[str] = None
+    reviewed: Optional[bool] = None
+    risk_score_min: Optional[float] = None
+    risk_score_max: Optional[float] = None
+
+    def matches(self, record: dict) -> bool:
+        for field in ("flag_status", "flag_source", "state", "district"):
+            expected = getattr(self, field)
+            if expected is not None and record.get(field) != expected:
+                return False
+        if self.reviewed is not None and bool(record.get("reviewed")) != self.reviewed:
+            return False
+        risk_score = record.get("exclusion_error_risk_score", 0)
+        if self.risk_score_min is not None and risk_score < self.risk_score_min:
+            return False
+        if self.risk_score_max is not None and risk_score > self.risk_score_max:
+            return False
+        return True
+
+class BulkReviewUpdate(BaseModel):
+    action: str
+    record_ids: Optional[List[str]] = None
+    filter: Optional[BulkReviewFilter] = None
+
+class PolicyFilters(BaseModel):
     caste_filter: Optional[str] = None
     region_filter: Optional[str] = None
     sex_filter: Optional[str] = None
@@ -240,6 +326,113 @@ class PolicySimulation(BaseModel):
     housing_type_filter: Optional[str] = None
     household_size_min: Optional[int] = None
     household_size_max: Optional[int] = None
+    
+    def category_filter(self) -> List[dict]:
+        """The non-income criteria as a bitmap index filter expression (AND of the leaves)"""
+        leaves = []
+        for field, value in (
+            ("caste", self.caste_filter),
+            # region_filter selects a state
+            ("state", self.region_filter),
+            ("sex", self.sex_filter),
+            ("occupation_category", self.occupation_filter),
+            ("housing_type", self.housing_type_filter),
+        ):
+            if value:
+                leaves.append({"field": field, "op": "eq", "value": value})
+        if self.household_size_min:
+            leaves.append({"field": "household_size", "op": "gte", "value": self.household_size_min})
+        if self.household_size_max:
+            leaves.append({"field": "household_size", "op": "lte", "value": self.household_size_max})
+        return leaves
+
+class PolicySimulation(PolicyFilters):
+    income_threshold: int
+    
+    def eligibility_filter(self) -> List[dict]:
+        return [{"field": "income", "op": "lte", "value": self.income_threshold}] + self.category_filter()
+
+class UncertaintySimulation(PolicySimulation):
+    replicates: int = 200
+    # Log standard deviation of the income misreporting noise
+    income_noise: float = 0.1
+    # Multiplier on exclusion_error_risk_score for the chance an eligible person is missed
+    exclusion_scale: float = 1.0
+    confidence: float = 0.95
+    # Echoed in the response, so it must fit a JSON integer
+    seed: Optional[int] = Field(None, ge=0, lt=2 ** 63)
+    # Stream NDJSON: the exact result, then the intervals after every chunk of replicates
+    stream: bool = False
+
+class HouseholdSimulation(PolicyFilters):
+    # Category filters apply to the household head; household_size bounds to the member count
+    income_threshold: int
+    # "total" or "per_capita" household income
+    income_basis: str = "total"
+    dependants_min: Optional[int] = None
+    benefit_per_household: float = 0
+    benefit_per_member: float = 0
+    benefit_per_dependant: float = 0
+
+POLICY_BATCH_MAX_SCENARIOS = int(os.environ.get('POLICY_BATCH_MAX_SCENARIOS', 50))
+
+class NamedPolicySimulation(PolicySimulation):
+    name: Optional[str] = None
+
+class PolicyBatch(BaseModel):
+    scenarios: List[NamedPolicySimulation] = Field(min_length=1, max_length=POLICY_BATCH_MAX_SCENARIOS)
+
+class PolicyOptimization(PolicyFilters):
+    # "beneficiaries", "percentage" or "budget"; see policy_optimizer
+    target: str
+    value: float
+    benefit_amount: Optional[float] = None
+    # "flat" (benefit_amount each) or "top_up" (threshold minus income each)
+    benefit_mode: str = "flat"
+    threshold_max: Optional[int] = None
+    # Per-group thresholds with equal coverage, e.g. "state"
+    group_by: Optional[str] = None
+
+POLICY_SWEEP_MAX_THRESHOLDS = 1000
+
+class PolicySweep(PolicyFilters):
+    # Explicit thresholds, or `steps` + 1 evenly spaced from threshold_min to threshold_max
+    thresholds: Optional[List[int]] = Field(default=None, max_length=POLICY_SWEEP_MAX_THRESHOLDS)
+    threshold_min: int = 0
+    threshold_max: Optional[int] = None
+    steps: int = Field(default=50, ge=1, lt=POLICY_SWEEP_MAX_THRESHOLDS)
+    breakdowns: List[str] = ["caste", "state"]
+
+class EligibilityCountRequest(BaseModel):
+    # Nested {"and"|"or": [...]}, {"not": ...} and {"field", "op", "value"} leaves; see bitmap_index
+    filter: Any = None
+
+ANALYTICS_QUERY_MAX_ROWS = 10000
+
+class QueryDimension(BaseModel):
+    field: str
+    # Bucket edges for numeric fields; continuous fields have default buckets
+    edges: Optional[List[float]] = None
+    name: Optional[str] = None
+
+class QueryMeasure(BaseModel):
+    op: str = "count"
+    field: Optional[str] = None
+    q: Optional[float] = None
+    name: Optional[str] = None
+
+class QueryFilter(BaseModel):
+    field: str
+    op: str = "eq"
+    value: Any = None
+
+class AnalyticsQuery(BaseModel):
+    group_by: List[QueryDimension] = []
+    measures: List[QueryMeasure] = [QueryMeasure()]
+    filters: List[QueryFilter] = []
+    sort_by: Optional[str] = None
+    descending: bool = True
+    limit: int = Field(default=1000, ge=1, le=ANALYTICS_QUERY_MAX_ROWS)
 
 @api_router.get("/")
 async def api_root():
@@ -461,7 +654,7 @@ async def get_census_records(
         all_records = [r for r in all_records if r.get("flag_status") == flag_status]
     
     # Return first 100 records
-    return all_records[:100]
+    return ORJSONResponse(all_records[:100])
 
 @api_router.get("/census/records/{record_id}")
 async def get_census_record(record_id: str, user: dict = Depends(get_current_user)):
@@ -552,7 +745,9 @@ async def review_record(
                         "details": {"record_id": record_id, "action": review.action},
                         "timestamp": datetime.now(timezone.utc).isoformat()
                     }
-                    await mongo_db.audit_logs.insert_one(audit_entry)
+                    await audit_writer.submit(audit_entry)
+                    audit_store.append(audit_entry)
+                    response_cache.bump_version()
                     
                     # Transform and return
                     ai_verification = survey.get('aiVerification', {})
@@ -584,15 +779,8 @@ async def review_record(
     if not record:
         raise HTTPException(status_code=404, detail="Record not found")
     
-    record["reviewed"] = True
-    record["reviewed_by"] = user["user_id"]
-    record["reviewed_at"] = datetime.now(timezone.utc)
-    record["review_action"] = review.action
-    
-    if review.action == "approve":
-        record["flag_status"] = "approved"
-    elif review.action == "request_verification":
-        record["flag_status"] = "verification_requested"
+    apply_review(record, review.action, user, datetime.now(timezone.utc))
+    response_cache.bump_version()
     
     audit_entry = {
         "audit_id": f"audit_{uuid.uuid4().hex[:12]}",
@@ -602,10 +790,121 @@ async def review_record(
         "details": {"record_id": record_id, "action": review.action},
         "timestamp": datetime.now(timezone.utc)
     }
-    in_memory_db["audit_logs"].append(audit_entry)
+    audit_store.append(audit_entry)
     
     return record
 
+def apply_review(record: dict, action: str, user: dict, reviewed_at: datetime):
+    """Mark an in-memory census record as reviewed with the given action"""
+    # Flag status feeds the rollups, so move the record's contribution across
+    census_rollups.remove(record)
+    record["reviewed"] = True
+    record["reviewed_by"] = user["user_id"]
+    record["reviewed_at"] = reviewed_at
+    record["review_action"] = action
+    if action in REVIEW_ACTIONS:
+        record["flag_status"] = REVIEW_ACTIONS[action]
+    census_rollups.add(record)
+    census_columns.update(record)
+    census_bitmaps.update(record)
+    census_households.update(record)
+    census_cube.update(record)
+    census_sample.update(record)
+    census_sketches.update(record)
+
+@api_router.post("/census/records/bulk-review")
+async def bulk_review_records(
+    review: BulkReviewUpdate,
+    user: dict = Depends(get_current_user)
+):
+    """
+    Review many records with one action. Records are selected either by
+    record_ids or by a filter over the in-memory census records. Mobile
+    survey records in MongoDB are updated with a single update_many, and one
+    audit entry covering every reviewed record is written.
+    """
+    if user["role"] not in ["supervisor", "district_admin"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    if review.action not in REVIEW_ACTIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown action: {review.action}")
+    if (review.record_ids is None) == (review.filter is None):
+        raise HTTPException(status_code=400, detail="Provide either record_ids or filter")
+    
+    if not in_memory_db["census_records"]:
+        generate_mock_census_data()
+    
+    if review.record_ids is not None:
+        record_ids = list(dict.fromkeys(review.record_ids))
+    else:
+        record_ids = [r["record_id"] for r in in_memory_db["census_records"].values() if review.filter.matches(r)]
+    
+    if len(record_ids) > BULK_REVIEW_MAX_RECORDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Bulk review is limited to {BULK_REVIEW_MAX_RECORDS} records, {len(record_ids)} selected"
+        )
+    
+    reviewed_at = datetime.now(timezone.utc)
+    outcomes = {}
+    
+    # Mobile survey records live in MongoDB
+    if mongo_db is not None and review.record_ids is not None:
+        try:
+            existing = await mongo_db.citizen_surveys.find(
+                {"id": {"$in": record_ids}}, {"id": 1, "_id": 0}
+            ).to_list(len(record_ids))
+            mongo_ids = [s["id"] for s in existing]
+            if mongo_ids:
+                await mongo_db.citizen_surveys.update_many(
+                    {"id": {"$in": mongo_ids}},
+                    {"$set": {
+                        "reviewed": True,
+                        "reviewed_by": user["user_id"],
+                        "reviewed_at": reviewed_at.isoformat(),
+                        "review_action": review.action
+                    }}
+                )
+            for rid in mongo_ids:
+                outcomes[rid] = {"record_id": rid, "status": "updated", "flag_status": REVIEW_ACTIONS[review.action]}
+        except Exception as e:
+            logger.error(f"Error bulk updating records in MongoDB: {e}")
+    
+    # One pass over the in-memory records
+    for rid in record_ids:
+        if rid in outcomes:
+            continue
+        record = in_memory_db["census_records"].get(rid)
+        if record is None:
+            outcomes[rid] = {"record_id": rid, "status": "not_found"}
+            continue
+        apply_review(record, review.action, user, reviewed_at)
+        outcomes[rid] = {"record_id": rid, "status": "updated", "flag_status": record["flag_status"]}
+    
+    results = [outcomes[rid] for rid in record_ids]
+    updated_ids = [r["record_id"] for r in results if r["status"] == "updated"]
+    
+    if updated_ids:
+        response_cache.bump_version()
+        audit_entry = {
+            "audit_id": f"audit_{uuid.uuid4().hex[:12]}",
+            "user_id": user["user_id"],
+            "user_name": user["name"],
+            "action": f"Bulk reviewed {len(updated_ids)} records",
+            "details": {"record_ids": updated_ids, "action": review.action, "count": len(updated_ids)},
+            "timestamp": reviewed_at.isoformat()
+        }
+        if audit_writer is not None:
+            await audit_writer.submit(audit_entry)
+        audit_store.append(audit_entry)
+    
+    return {
+        "action": review.action,
+        "requested": len(record_ids),
+        "updated": len(updated_ids),
+        "not_found": len(record_ids) - len(updated_ids),
+        "results": results
+    }
+
 @api_router.get("/census/household/{household_id}")
 async def get_household(household_id: str, user: dict = Depends(get_current_user)):
     # First check in_memory_db
@@ -670,15 +969,71 @@ async def get_household(household_id: str, user: dict = Depends(get_current_user
         "pin_code": first_member.get("pin_code", "Unknown")
     }
     
-    return {
+    return ORJSONResponse({
         "household_id": household_id, 
         "members": members, 
         "graph": {"nodes": nodes, "edges": edges},
         "household_info": household_info
+    })
+
+async def cached_json_response(request: Request, user: dict, endpoint: str, params: dict, compute) -> Response:
+    """
+    Serve `compute()` from the response cache, keyed by endpoint, params and
+    role. On a miss `compute` runs once, shared by concurrent identical
+    requests (see singleflight). It stays on the event loop: apply_review
+    changes the derived stores in place there, and most of them have no
+    locks of their own. Clients revalidating with a matching If-None-Match
+    get a 304.
+    """
+    key = response_cache.make_key(endpoint, params, user["role"])
+    entry = response_cache.get(key)
+    if entry is None:
+        version = response_cache.version
+        # Versioned so that requests after a write never join a computation from before it
+        scope = user["role"] if SINGLEFLIGHT_SCOPE == "role" else "*"
+        flight = f"{version}|{response_cache.make_key(endpoint, params, scope)}"
+        body = await analytics_flights.do(flight, lambda: serialized(compute))
+        entry = response_cache.put(key, body, version)
+    
+    headers = {"ETag": entry.etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        response_cache.stats["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+async def serialized(compute) -> bytes:
+    data = compute()
+    with span("serialize"):
+        return json_dumps(data)
+
+def progressive_response(approximate, exact) -> StreamingResponse:
+    """NDJSON: an estimate for every sample stage, then the exact answer"""
+    async def lines():
+        for fraction in SAMPLE_FRACTIONS:
+            yield json_dumps(approximate(fraction)) + b"\n"
+        yield json_dumps({**exact(), "sampling": {"exact": True, "fraction": 1.0}}) + b"\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+def sampling_info(estimate) -> dict:
+    return {
+        "exact": False,
+        "fraction": round(estimate.fraction, 4),
+        "sample_size": estimate.size,
+        "confidence": estimate.confidence,
     }
 
 @api_router.get("/analytics/summary")
-async def get_analytics_summary(user: dict = Depends(get_current_user)):
+async def get_analytics_summary(
+    request: Request,
+    approx: bool = False,
+    progressive: bool = False,
+    user: dict = Depends(get_current_user)
+):
+    """
+    Dashboard summary. With `approx` it is estimated from the stratified
+    sample, with confidence intervals; with `progressive` the response is
+    NDJSON with one estimate per sample stage and the exact summary last.
+    """
     if user["role"] not in ["supervisor", "state_analyst", "policy_maker", "district_admin"]:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     
@@ -686,113 +1041,124 @@ async def get_analytics_summary(user: dict = Depends(get_current_user)):
     if not in_memory_db["census_records"]:
         generate_mock_census_data()
     
-    records = list(in_memory_db["census_records"].values())
+    if progressive:
+        return progressive_response(compute_approximate_summary, compute_analytics_summary)
+    if approx:
+        fraction = SAMPLE_FRACTIONS[0]
+        return await cached_json_response(
+            request, user, "analytics/summary", {"approx": fraction}, lambda: compute_approximate_summary(fraction)
+        )
+    return await cached_json_response(request, user, "analytics/summary", {}, compute_analytics_summary)
+
+# Data quality metrics (simulated based on data completeness)
+DATA_QUALITY = {
+    "completeness": 98.7,  # High since demo data is complete
+    "accuracy": 96.2,
+    "consistency": 99.1
+}
+
+def compute_analytics_summary():
+    with span("load"):
+        records = list(in_memory_db["census_records"].values())
     
     if not records:
         return get_mock_analytics()
     
-    total_records = len(records)
-    regions = {}
-    castes = {}
-    states = {}
-    income_brackets = {"0-50k": 0, "50k-100k": 0, "100k-200k": 0, "200k+": 0}
-    employment_stats = {}
-    ration_card_stats = {}
-    
-    # Counts for dashboard
-    pending_review = 0
-    priority_cases = 0
-    normal_cases = 0
-    scheme_leakage_count = 0
-    total_welfare_score = 0
-    total_income = 0
-    households = set()
-    
-    for record in records:
-        # Region (urban/rural) counts
-        region = record.get("region", "Unknown")
-        regions[region] = regions.get(region, 0) + 1
-        
-        # Caste distribution
-        caste = record.get("caste", "General")
-        castes[caste] = castes.get(caste, 0) + 1
+    with span("aggregate"):
+        total_records = len(records)
+        regions = {}
+        castes = {}
+        states = {}
+        income_brackets = {"0-50k": 0, "50k-100k": 0, "100k-200k": 0, "200k+": 0}
+        employment_stats = {}
+        ration_card_stats = {}
+    
+        # Counts for dashboard
+        pending_review = 0
+        priority_cases = 0
+        normal_cases = 0
+        scheme_leakage_count = 0
+        total_welfare_score = 0
+        total_income = 0
+    
+        for record in records:
+            # Region (urban/rural) counts
+            region = record.get("region", "Unknown")
+            regions[region] = regions.get(region, 0) + 1
         
-        # State distribution
-        state = record.get("state", "Unknown")
-        states[state] = states.get(state, 0) + 1
+            # Caste distribution
+            caste = record.get("caste", "General")
+            castes[caste] = castes.get(caste, 0) + 1
         
-        # Income brackets
-        income = record.get("income", 0)
-        total_income += income
-        if income < 50000:
-            income_brackets["0-50k"] += 1
-        elif income < 100000:
-            income_brackets["50k-100k"] += 1
-        elif income < 200000:
-            income_brackets["100k-200k"] += 1
-        else:
-            income_brackets["200k+"] += 1
+            # State distribution
+            state = record.get("state", "Unknown")
+            states[state] = states.get(state, 0) + 1
         
-        # Employment stats
-        emp_status = record.get("employment_status", "Unknown")
-        employment_stats[emp_status] = employment_stats.get(emp_status, 0) + 1
+            # Income brackets
+            income = record.get("income", 0)
+            total_income += income
+            if income < 50000:
+                income_brackets["0-50k"] += 1
+            elif income < 100000:
+                income_brackets["50k-100k"] += 1
+            elif income < 200000:
+                income_brackets["100k-200k"] += 1
+            else:
+                income_brackets["200k+"] += 1
         
-        # Ration card stats
-        ration = record.get("ration_card_type", "Unknown")
-        ration_card_stats[ration] = ration_card_stats.get(ration, 0) + 1
+            # Employment stats
+            emp_status = record.get("employment_status", "Unknown")
+            employment_stats[emp_status] = employment_stats.get(emp_status, 0) + 1
         
-        # Flag status counts
-        flag_status = record.get("flag_status", "normal")
-        if flag_status == "review":
-            pending_review += 1
-        elif flag_status == "priority":
-            priority_cases += 1
-        else:
-            normal_cases += 1
+            # Ration card stats
+            ration = record.get("ration_card_type", "Unknown")
+            ration_card_stats[ration] = ration_card_stats.get(ration, 0) + 1
         
-        # Scheme leakage
-        if record.get("scheme_leakage_flag", 0) == 1:
-            scheme_leakage_count += 1
+            # Flag status counts
+            flag_status = record.get("flag_status", "normal")
+            if flag_status == "review":
+                pending_review += 1
+            elif flag_status == "priority":
+                priority_cases += 1
+            else:
+                normal_cases += 1
         
-        # Welfare score
-        total_welfare_score += record.get("welfare_score", 0)
+            # Scheme leakage
+            if record.get("scheme_leakage_flag", 0) == 1:
+                scheme_leakage_count += 1
         
-        # Households
-        households.add(record.get("household_id"))
-    
-    # Compute averages and percentages
-    avg_income = round(total_income / total_records) if total_records > 0 else 0
-    avg_welfare_score = round(total_welfare_score / total_records, 2) if total_records > 0 else 0
-    scheme_leakage_rate = round((scheme_leakage_count / total_records) * 100, 2) if total_records > 0 else 0
-    
-    # Data quality metrics (simulated based on data completeness)
-    completeness = 98.7  # High since demo data is complete
-    accuracy = 96.2
-    consistency = 99.1
-    
-    # Welfare indicators (computed from actual data patterns)
-    # Count amenity access
-    toilet_access_count = sum(1 for r in records if r.get("toilet_access", 0) == 1)
-    water_access_count = sum(1 for r in records if r.get("water_source", 0) == 1)
-    internet_access_count = sum(1 for r in records if r.get("internet_access", 0) == 1)
-    employed_count = sum(1 for r in records if r.get("employment_status") == "employed")
-    bpl_count = sum(1 for r in records if r.get("ration_card_type") == "BPL")
-    
-    welfare_indicators = {
-        "scheme_coverage": min(100, round((len([r for r in records if r.get("scheme_enrollment_count", 0) > 0]) / total_records) * 100, 1)) if total_records > 0 else 0,
-        "toilet_access": round((toilet_access_count / total_records) * 100, 1) if total_records > 0 else 0,
-        "water_access": round((water_access_count / total_records) * 100, 1) if total_records > 0 else 0,
-        "employment_rate": round((employed_count / total_records) * 100, 1) if total_records > 0 else 0,
-        "bpl_coverage": round((bpl_count / total_records) * 100, 1) if total_records > 0 else 0,
-        "digital_inclusion": round((internet_access_count / total_records) * 100, 1) if total_records > 0 else 0
-    }
+            # Welfare score
+            total_welfare_score += record.get("welfare_score", 0)
+    
+        # Compute averages and percentages
+        avg_income = round(total_income / total_records) if total_records > 0 else 0
+        avg_welfare_score = round(total_welfare_score / total_records, 2) if total_records > 0 else 0
+        scheme_leakage_rate = round((scheme_leakage_count / total_records) * 100, 2) if total_records > 0 else 0
+    
+        # Welfare indicators (computed from actual data patterns)
+        # Count amenity access
+        toilet_access_count = sum(1 for r in records if r.get("toilet_access", 0) == 1)
+        water_access_count = sum(1 for r in records if r.get("water_source", 0) == 1)
+        internet_access_count = sum(1 for r in records if r.get("internet_access", 0) == 1)
+        employed_count = sum(1 for r in records if r.get("employment_status") == "employed")
+        bpl_count = sum(1 for r in records if r.get("ration_card_type") == "BPL")
+    
+        welfare_indicators = {
+            "scheme_coverage": min(100, round((len([r for r in records if r.get("scheme_enrollment_count", 0) > 0]) / total_records) * 100, 1)) if total_records > 0 else 0,
+            "toilet_access": round((toilet_access_count / total_records) * 100, 1) if total_records > 0 else 0,
+            "water_access": round((water_access_count / total_records) * 100, 1) if total_records > 0 else 0,
+            "employment_rate": round((employed_count / total_records) * 100, 1) if total_records > 0 else 0,
+            "bpl_coverage": round((bpl_count / total_records) * 100, 1) if total_records > 0 else 0,
+            "digital_inclusion": round((internet_access_count / total_records) * 100, 1) if total_records > 0 else 0
+        }
     
     return {
         "total_records": total_records,
         "pending_review": pending_review,
         "priority_cases": priority_cases,
         "verified_records": normal_cases,
-        "total_households": len(households),
+        # Kept current alongside the columns, so no per-request set of household ids
+        "total_households": int(np.count_nonzero(census_households.member_count)),
         "by_region": regions,
         "by_caste": castes,
         "by_state": states,
@@ -803,63 +1169,221 @@ async def get_analytics_summary(user: dict = Depends(get_current_user)):
         "avg_welfare_score": avg_welfare_score,
         "scheme_leakage_count": scheme_leakage_count,
         "scheme_leakage_rate": scheme_leakage_rate,
+        **national_percentiles(),
         "welfare_indicators": welfare_indicators,
-        "data_quality": {
-            "completeness": completeness,
-            "accuracy": accuracy,
-            "consistency": consistency
-        }
+        "data_quality": DATA_QUALITY
+    }
+
+def national_percentiles() -> dict:
+    """Income and welfare percentiles from the national quantile sketch"""
+    node = census_sketches.subtree((), 0)
+    return {"income_percentiles": node["income"], "welfare_percentiles": node["welfare_score"]}
+
+def compute_approximate_summary(fraction: float) -> dict:
+    """The summary estimated from a stratified sample, with [lower, upper] intervals"""
+    with span("aggregate"):
+        estimate = census_sample.estimate(fraction)
+        rows = estimate.rows
+        total_records = census_columns.size
+        intervals = {}
+    
+        def code_mask(field, value):
+            code = census_columns.code_of(field, value)
+            return census_columns.codes[field][rows] == code if code is not None else np.zeros(len(rows), dtype=bool)
+    
+        def distribution(field):
+            # Missing values read "Unknown", as in the record loop
+            labels = ["Unknown" if label is None else label for label in census_columns.categories[field]]
+            return estimate.distribution(census_columns.codes[field][rows], labels)
+    
+        def value_of(field):
+            return census_columns.values[field][rows]
+    
+        def share(mask, digits=1):
+            count = estimate.count(mask)
+            point = round(count[0] / total_records * 100, digits) if total_records > 0 else 0
+            return point, bounds(tuple(v / total_records * 100 for v in count), digits) if total_records > 0 else [0, 0]
+    
+        counts = {}
+        edges, labels = BUCKETS["income"]
+        for key, field in (
+            ("by_region", "region"), ("by_caste", "caste"), ("by_state", "state"), ("by_income", "income"),
+            ("by_employment", "employment_status"), ("by_ration_card", "ration_card_type"),
+        ):
+            if field == "income":
+                counts[key], intervals[key] = estimate.distribution(
+                    np.searchsorted(np.asarray(edges), value_of("income"), side="right"), labels, keep_empty=True
+                )
+            else:
+                counts[key], intervals[key] = distribution(field)
+    
+        review, priority = code_mask("flag_status", "review"), code_mask("flag_status", "priority")
+        flags = {}
+        for key, mask in (("pending_review", review), ("priority_cases", priority), ("verified_records", ~(review | priority))):
+            count = estimate.count(mask)
+            flags[key], intervals[key] = int(round(count[0])), bounds(count)
+    
+        ones = np.ones(len(rows))
+        avg_income = estimate.ratio(value_of("income"), ones)
+        avg_welfare = estimate.ratio(value_of("welfare_score"), ones)
+        intervals["avg_income"], intervals["avg_welfare_score"] = bounds(avg_income), bounds(avg_welfare, 2)
+        leakage = estimate.count(value_of("scheme_leakage_flag") == 1)
+        intervals["scheme_leakage_count"] = bounds(leakage)
+        leakage_rate, intervals["scheme_leakage_rate"] = share(value_of("scheme_leakage_flag") == 1, 2)
+    
+        welfare_indicators, intervals["welfare_indicators"] = {}, {}
+        for key, mask in (
+            ("scheme_coverage", value_of("scheme_enrollment_count") > 0),
+            ("toilet_access", value_of("toilet_access") == 1),
+            ("water_access", value_of("water_source") == 1),
+            ("employment_rate", code_mask("employment_status", "employed")),
+            ("bpl_coverage", code_mask("ration_card_type", "BPL")),
+            ("digital_inclusion", value_of("internet_access") == 1),
+        ):
+            welfare_indicators[key], intervals["welfare_indicators"][key] = share(mask)
+        welfare_indicators["scheme_coverage"] = min(100, welfare_indicators["scheme_coverage"])
+    
+    return {
+        "total_records": total_records,
+        **flags,
+        # Household count is exact: the household table is maintained alongside the columns
+        "total_households": int(np.count_nonzero(census_households.member_count)),
+        **counts,
+        "avg_income": round(avg_income[0]),
+        "avg_welfare_score": round(avg_welfare[0], 2),
+        "scheme_leakage_count": int(round(leakage[0])),
+        "scheme_leakage_rate": leakage_rate,
+        **national_percentiles(),
+        "welfare_indicators": welfare_indicators,
+        "data_quality": DATA_QUALITY,
+        "intervals": intervals,
+        "sampling": sampling_info(estimate),
     }
 
 @api_router.get("/analytics/states")
-async def get_state_analytics(user: dict = Depends(get_current_user)):
+async def get_state_analytics(request: Request, user: dict = Depends(get_current_user)):
     if user["role"] not in ["supervisor", "state_analyst", "policy_maker", "district_admin"]:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     
-    records = list(in_memory_db["census_records"].values())
-    
-    if not records:
+    return await cached_json_response(request, user, "analytics/states", {}, compute_state_analytics)
+
+def compute_state_analytics():
+    if not in_memory_db["census_records"]:
         return get_mock_state_analytics()
     
-    state_data = {}
-    for record in records:
-        state = record["state"]
-        if state not in state_data:
-            state_data[state] = {
-                "total_population": 0,
-                "normal": 0,
-                "review": 0,
-                "priority": 0,
-                "avg_income": 0,
-                "income_sum": 0,
-                "avg_welfare_score": 0,
-                "welfare_sum": 0,
-                "scheme_leakage_count": 0
-            }
-        
-        state_data[state]["total_population"] += 1
-        state_data[state]["income_sum"] += record["income"]
-        state_data[state]["welfare_sum"] += record.get("welfare_score", 0)
-        
-        if record.get("scheme_leakage_flag") == 1:
-            state_data[state]["scheme_leakage_count"] += 1
-        
-        flag_status = record.get("flag_status", "normal")
-        if flag_status in state_data[state]:
-            state_data[state][flag_status] += 1
+    # Kept current by generate_mock_census_data and apply_review
+    with span("aggregate"):
+        return census_rollups.states()
+
+@api_router.get("/analytics/drilldown")
+async def get_analytics_drilldown(
+    request: Request,
+    state: Optional[str] = None,
+    district: Optional[str] = None,
+    pin_code: Optional[str] = None,
+    depth: int = 1,
+    user: dict = Depends(get_current_user)
+):
+    """
+    Rollup stats for the nation, a state, a district or a pincode, with
+    `depth` levels of children (0-3) for map drill-down.
+    """
+    if user["role"] not in ["supervisor", "state_analyst", "policy_maker", "district_admin"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    if (district and not state) or (pin_code and not district):
+        raise HTTPException(status_code=400, detail="district requires state and pin_code requires district")
+    if not 0 <= depth <= 3:
+        raise HTTPException(status_code=400, detail="depth must be between 0 and 3")
     
-    for state in state_data:
-        if state_data[state]["total_population"] > 0:
-            state_data[state]["avg_income"] = round(
-                state_data[state]["income_sum"] / state_data[state]["total_population"]
-            )
-            state_data[state]["avg_welfare_score"] = round(
-                state_data[state]["welfare_sum"] / state_data[state]["total_population"], 2
-            )
-        del state_data[state]["income_sum"]
-        del state_data[state]["welfare_sum"]
+    if not in_memory_db["census_records"]:
+        generate_mock_census_data()
     
-    return state_data
+    path = tuple(p for p in (state, district, pin_code) if p)
+    params = {"path": list(path), "depth": depth}
+    
+    def compute():
+        with span("aggregate"):
+            node = census_rollups.subtree(path, depth)
+        if node is None:
+            raise HTTPException(status_code=404, detail=f"No records under {'/'.join(path)}")
+        return {"path": dict(zip(("state", "district", "pin_code"), path)), **node}
+    
+    return await cached_json_response(request, user, "analytics/drilldown", params, compute)
+
+@api_router.get("/analytics/quantiles")
+async def get_analytics_quantiles(
+    request: Request,
+    state: Optional[str] = None,
+    district: Optional[str] = None,
+    pin_code: Optional[str] = None,
+    depth: int = 1,
+    q: Optional[str] = None,
+    user: dict = Depends(get_current_user)
+):
+    """
+    Distinct households and income/welfare percentiles (comma-separated `q`,
+    default 0.25,0.5,0.75,0.9) for a node of the state/district/pincode
+    hierarchy and `depth` levels of its children, from mergeable sketches.
+    Household counts are exact for small areas and within a few percent
+    above that; percentiles are within about 1% in rank.
+    """
+    if user["role"] not in ["supervisor", "state_analyst", "policy_maker", "district_admin"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    if (district and not state) or (pin_code and not district):
+        raise HTTPException(status_code=400, detail="district requires state and pin_code requires district")
+    if not 0 <= depth <= 3:
+        raise HTTPException(status_code=400, detail="depth must be between 0 and 3")
+    try:
+        quantiles = parse_quantiles(q)
+    except QueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if not in_memory_db["census_records"]:
+        generate_mock_census_data()
+    
+    path = tuple(p for p in (state, district, pin_code) if p)
+    params = {"path": list(path), "depth": depth, "q": list(quantiles)}
+    
+    def compute():
+        with span("aggregate"):
+            node = census_sketches.subtree(path, depth, quantiles)
+        if node is None:
+            raise HTTPException(status_code=404, detail=f"No records under {'/'.join(path)}")
+        return {"path": dict(zip(("state", "district", "pin_code"), path)), **node}
+    
+    return await cached_json_response(request, user, "analytics/quantiles", params, compute)
+
+@api_router.post("/analytics/query")
+async def query_analytics(request: Request, query: AnalyticsQuery, user: dict = Depends(get_current_user)):
+    """
+    Ad-hoc cross-tab over the census records, e.g. population and median
+    income by caste x housing type x state. Runs on the columnar copy of the
+    data; see census_columns.aggregate for the query semantics.
+    """
+    if user["role"] not in ["supervisor", "state_analyst", "policy_maker", "district_admin"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    if not in_memory_db["census_records"]:
+        generate_mock_census_data()
+    
+    params = query.model_dump()
+    
+    def compute():
+        try:
+            with span("aggregate"):
+                result = census_columns.aggregate(
+                    group_by=params["group_by"],
+                    measures=params["measures"],
+                    filters=params["filters"],
+                    sort_by=params["sort_by"],
+                    descending=params["descending"],
+                    limit=params["limit"],
+                )
+        except QueryError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"group_by": [d["name"] or d["field"] for d in params["group_by"]], **result}
+    
+    return await cached_json_response(request, user, "analytics/query", params, compute)
 
 # State center coordinates for generating approximate pincode locations
 STATE_COORDS = {
@@ -872,6 +1396,7 @@ STATE_COORDS = {
 
 @api_router.get("/analytics/pincode-points")
 async def get_pincode_points(
+    request: Request,
     limit: int = 5000,
     state_filter: Optional[str] = None,
     income_threshold: int = 50000,
@@ -890,201 +1415,232 @@ async def get_pincode_points(
     if user["role"] not in ["state_analyst", "policy_maker", "supervisor"]:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     
-    records = list(in_memory_db["census_records"].values())
-    
-    if not records:
+    params = {
+        "limit": limit,
+        "state_filter": state_filter,
+        "income_threshold": income_threshold,
+        "caste_filter": caste_filter,
+        "sex_filter": sex_filter,
+        "occupation_filter": occupation_filter,
+        "housing_type_filter": housing_type_filter,
+        "household_size_min": household_size_min,
+        "household_size_max": household_size_max,
+    }
+    return await cached_json_response(
+        request, user, "analytics/pincode-points", params, lambda: compute_pincode_points(**params)
+    )
+
+def compute_pincode_points(
+    limit: int,
+    state_filter: Optional[str],
+    income_threshold: int,
+    caste_filter: Optional[str],
+    sex_filter: Optional[str],
+    occupation_filter: Optional[str],
+    housing_type_filter: Optional[str],
+    household_size_min: Optional[int],
+    household_size_max: Optional[int]
+):
+    if not in_memory_db["census_records"]:
         return {"points": [], "total_records": 0}
     
-    # Filter by state if specified
-    if state_filter and state_filter != 'all':
-        records = [r for r in records if r.get("state") == state_filter]
-    
-    # Aggregate by pincode
-    pincode_data = {}
-    for record in records:
-        pincode = str(record.get("pin_code", "000000"))
-        state = record.get("state", "Bihar")
+    # Filter by state if specified, then evaluate eligibility on ALL filters as bitmaps
+    with span("filter"):
+        scope = [{"field": "state", "op": "eq", "value": state_filter}] if state_filter and state_filter != 'all' else []
+        criteria = [{"field": "income", "op": "lte", "value": income_threshold}]
+        for field, value in (
+            ("caste", caste_filter),
+            ("sex", sex_filter),
+            ("occupation_category", occupation_filter),
+            ("housing_type", housing_type_filter),
+        ):
+            if value and value != 'all':
+                criteria.append({"field": field, "op": "eq", "value": value})
+        if household_size_min:
+            criteria.append({"field": "household_size", "op": "gte", "value": household_size_min})
+        if household_size_max:
+            criteria.append({"field": "household_size", "op": "lte", "value": household_size_max})
+        
+        in_scope = census_bitmaps.evaluate(scope)
+        rows = census_bitmaps.rows(in_scope)
+        eligible = np.zeros(census_columns.size, dtype=bool)
+        eligible[census_bitmaps.rows(in_scope & census_bitmaps.evaluate(criteria))] = True
+        eligible = eligible[rows]
+    
+    with span("aggregate"):
+        # Aggregate by pincode; groups are numbered in order of first appearance
+        pincodes = census_columns.codes["pin_code"][rows]
+        present, first, inverse, counts = np.unique(pincodes, return_index=True, return_inverse=True, return_counts=True)
+        # bincount adds weights in row order, so the sums match a per-record loop exactly
+        welfare_sums = np.bincount(inverse, weights=census_columns.values["welfare_score"][rows], minlength=len(present))
+        income_sums = np.bincount(inverse, weights=census_columns.values["income"][rows], minlength=len(present))
+        eligible_counts = np.bincount(inverse, weights=eligible, minlength=len(present)).astype(np.int64)
+        priority_code = census_columns.categories["flag_status"].index("priority") \
+            if "priority" in census_columns.categories["flag_status"] else -1
+        priority_counts = np.bincount(
+            inverse, weights=census_columns.codes["flag_status"][rows] == priority_code, minlength=len(present)
+        ).astype(np.int64)
+        leakage_counts = np.bincount(
+            inverse, weights=census_columns.values["scheme_leakage_flag"][rows] == 1, minlength=len(present)
+        ).astype(np.int64)
+        first_states = census_columns.codes["state"][rows][first]
+        
+        # Sort by count (ties in first-seen order) and limit
+        seen_order = np.argsort(first, kind="stable")
+        order = seen_order[np.argsort(-counts[seen_order], kind="stable")][:limit]
         
-        if pincode not in pincode_data:
+        points = []
+        for g in order.tolist():
+            pincode = str(census_columns.categories["pin_code"][present[g]])
+            state = census_columns.categories["state"][first_states[g]]
+            count = int(counts[g])
             # Generate approximate coordinates based on state + pincode hash for consistency
             state_info = STATE_COORDS.get(state, STATE_COORDS["Bihar"])
             # Use pincode as seed for consistent random offset
-            import hashlib
             hash_val = int(hashlib.md5(pincode.encode()).hexdigest()[:8], 16)
             lat_offset = ((hash_val % 1000) / 1000 - 0.5) * state_info["spread"]
             lon_offset = (((hash_val >> 10) % 1000) / 1000 - 0.5) * state_info["spread"]
-            
-            pincode_data[pincode] = {
+            points.append({
                 "pincode": pincode,
                 "state": state,
-                "lat": state_info["lat"] + lat_offset,
-                "lon": state_info["lon"] + lon_offset,
-                "count": 0,
-                "welfare_sum": 0,
-                "income_sum": 0,
-                "eligible_count": 0,
-                "priority_count": 0,
-                "scheme_leakage_count": 0
-            }
-        
-        pincode_data[pincode]["count"] += 1
-        pincode_data[pincode]["welfare_sum"] += record.get("welfare_score", 0)
-        pincode_data[pincode]["income_sum"] += record.get("income", 0)
-        
-        # Check eligibility based on ALL filters
-        is_eligible = True
-        if record.get("income", 0) > income_threshold:
-            is_eligible = False
-        if caste_filter and caste_filter != 'all' and record.get("caste") != caste_filter:
-            is_eligible = False
-        if sex_filter and sex_filter != 'all' and record.get("sex") != sex_filter:
-            is_eligible = False
-        if occupation_filter and occupation_filter != 'all' and record.get("occupation_category") != occupation_filter:
-            is_eligible = False
-        if housing_type_filter and housing_type_filter != 'all' and record.get("housing_type") != housing_type_filter:
-            is_eligible = False
-        if household_size_min and record.get("household_size", 0) < household_size_min:
-            is_eligible = False
-        if household_size_max and record.get("household_size", 0) > household_size_max:
-            is_eligible = False
-            
-        if is_eligible:
-            pincode_data[pincode]["eligible_count"] += 1
-            
-        if record.get("flag_status") == "priority":
-            pincode_data[pincode]["priority_count"] += 1
-        if record.get("scheme_leakage_flag") == 1:
-            pincode_data[pincode]["scheme_leakage_count"] += 1
-    
-    # Convert to list and calculate averages
-    points = []
-    for pincode, data in pincode_data.items():
-        if data["count"] > 0:
-            points.append({
-                "pincode": data["pincode"],
-                "state": data["state"],
-                "lat": round(data["lat"], 4),
-                "lon": round(data["lon"], 4),
-                "count": data["count"],
-                "avg_welfare": round(data["welfare_sum"] / data["count"], 2),
-                "avg_income": round(data["income_sum"] / data["count"]),
-                "eligible_count": data["eligible_count"],
-                "eligible_pct": round((data["eligible_count"] / data["count"]) * 100, 1),
-                "priority_count": data["priority_count"],
-                "leakage_count": data["scheme_leakage_count"]
+                "lat": round(state_info["lat"] + lat_offset, 4),
+                "lon": round(state_info["lon"] + lon_offset, 4),
+                "count": count,
+                "avg_welfare": round(float(welfare_sums[g]) / count, 2),
+                "avg_income": round(float(income_sums[g]) / count),
+                "eligible_count": int(eligible_counts[g]),
+                "eligible_pct": round((int(eligible_counts[g]) / count) * 100, 1),
+                "priority_count": int(priority_counts[g]),
+                "leakage_count": int(leakage_counts[g])
             })
     
-    # Sort by count and limit
-    points.sort(key=lambda x: x["count"], reverse=True)
-    points = points[:limit]
-    
     return {
         "points": points,
-        "total_pincodes": len(pincode_data),
-        "total_records": len(records)
+        "total_pincodes": len(present),
+        "total_records": len(rows)
     }
 
 @api_router.post("/policy/simulate")
 async def simulate_policy(
     simulation: PolicySimulation,
+    approx: bool = False,
+    progressive: bool = False,
     user: dict = Depends(get_current_user)
 ):
+    """
+    Eligible population for a policy. `approx` and `progressive` work as on
+    /analytics/summary: a sample estimate with intervals, or NDJSON stages
+    ending with the exact result.
+    """
     if user["role"] != "policy_maker":
         raise HTTPException(status_code=403, detail="Only policy makers can run simulations")
     
-    records = list(in_memory_db["census_records"].values())
+    if not in_memory_db["census_records"]:
+        generate_mock_census_data()
     
-    if not records:
-        records = generate_mock_census_data()
-    
-    # Apply all filters
-    eligible = [r for r in records if r["income"] <= simulation.income_threshold]
-    
-    if simulation.caste_filter:
-        eligible = [r for r in eligible if r["caste"] == simulation.caste_filter]
-    if simulation.region_filter:
-        eligible = [r for r in eligible if r["state"] == simulation.region_filter]
-    if simulation.sex_filter:
-        eligible = [r for r in eligible if r.get("sex") == simulation.sex_filter]
-    if simulation.occupation_filter:
-        eligible = [r for r in eligible if r.get("occupation_category") == simulation.occupation_filter]
-    if simulation.housing_type_filter:
-        eligible = [r for r in eligible if r.get("housing_type") == simulation.housing_type_filter]
-    if simulation.household_size_min:
-        eligible = [r for r in eligible if r.get("household_size", 1) >= simulation.household_size_min]
-    if simulation.household_size_max:
-        eligible = [r for r in eligible if r.get("household_size", 1) <= simulation.household_size_max]
-    
-    total_population = len(records)
-    eligible_population = len(eligible)
-    
-    # State distribution
-    state_distribution = {}
-    for record in eligible:
-        state = record.get("state", "Unknown")
-        state_distribution[state] = state_distribution.get(state, 0) + 1
-    
-    # Caste distribution
-    caste_distribution = {}
-    for record in eligible:
-        caste = record.get("caste", "General")
-        caste_distribution[caste] = caste_distribution.get(caste, 0) + 1
-    
-    # Sex distribution
-    sex_distribution = {}
-    for record in eligible:
-        sex = record.get("sex", "Unknown")
-        sex_distribution[sex] = sex_distribution.get(sex, 0) + 1
-    
-    # Occupation distribution
-    occupation_distribution = {}
-    for record in eligible:
-        occupation = record.get("occupation_category", "Unknown")
-        occupation_distribution[occupation] = occupation_distribution.get(occupation, 0) + 1
-    
-    # Housing type distribution
-    housing_distribution = {}
-    for record in eligible:
-        housing = record.get("housing_type", "Unknown")
-        housing_distribution[housing] = housing_distribution.get(housing, 0) + 1
-    
-    # Income brackets
-    income_brackets = {"0-25k": 0, "25k-50k": 0, "50k-100k": 0, "100k+": 0}
-    for record in eligible:
-        income = record.get("income", 0)
-        if income < 25000:
-            income_brackets["0-25k"] += 1
-        elif income < 50000:
-            income_brackets["25k-50k"] += 1
-        elif income < 100000:
-            income_brackets["50k-100k"] += 1
-        else:
-            income_brackets["100k+"] += 1
-    
-    # Age group distribution
-    age_groups = {"0-18": 0, "18-35": 0, "35-50": 0, "50-65": 0, "65+": 0}
-    for record in eligible:
-        age = record.get("age", 0)
-        if age < 18:
-            age_groups["0-18"] += 1
-        elif age < 35:
-            age_groups["18-35"] += 1
-        elif age < 50:
-            age_groups["35-50"] += 1
-        elif age < 65:
-            age_groups["50-65"] += 1
-        else:
-            age_groups["65+"] += 1
+    if progressive:
+        return progressive_response(
+            lambda fraction: approximate_simulation(simulation, fraction), lambda: exact_simulation(simulation)
+        )
+    if approx:
+        return approximate_simulation(simulation, SAMPLE_FRACTIONS[0])
+    return exact_simulation(simulation)
+
+def exact_simulation(simulation: PolicySimulation) -> dict:
+    # Every criterion but income is a cube dimension, so a large census sums matching cells
+    if census_cube.compact:
+        with span("aggregate"):
+            return census_cube.simulate(simulation.income_threshold, simulation.category_filter())
+    
+    # Filters are ANDed bitmaps; income, which has no index, is compared on the column store
+    with span("filter"):
+        rows = census_bitmaps.rows(census_bitmaps.evaluate(simulation.eligibility_filter()))
     
-    # Household size distribution
-    household_size_dist = {}
-    for record in eligible:
-        size = str(record.get("household_size", 1))
-        household_size_dist[size] = household_size_dist.get(size, 0) + 1
+    return simulation_result(rows)
+
+def approximate_simulation(simulation: PolicySimulation, fraction: float) -> dict:
+    """The simulation estimated from a stratified sample, with [lower, upper] intervals"""
+    estimate = census_sample.estimate(fraction)
+    rows = estimate.rows
+    with span("filter"):
+        eligible = census_columns.filter_mask(simulation.eligibility_filter(), rows)
+    
+    with span("aggregate"):
+        total_population = census_columns.size
+        intervals = {}
+        count = estimate.count(eligible)
+        income = estimate.ratio(census_columns.values["income"][rows] * eligible, eligible)
+        welfare = estimate.ratio(census_columns.values["welfare_score"][rows] * eligible, eligible)
+        intervals["eligible_population"] = bounds(count)
+        intervals["eligibility_percentage"] = bounds(
+            tuple(v / total_population * 100 for v in count), 2
+        ) if total_population > 0 else [0, 0]
+        intervals["avg_income_eligible"] = bounds(income)
+        intervals["avg_welfare_eligible"] = bounds(welfare, 2)
+    
+        # Distribution keys follow first appearance in the whole census rather than among the eligible
+        distributions = {}
+        for key, field in (
+            ("region_distribution", "state"), ("caste_distribution", "caste"), ("sex_distribution", "sex"),
+            ("occupation_distribution", "occupation_category"), ("housing_distribution", "housing_type"),
+        ):
+            distributions[key], intervals[key] = estimate.distribution(
+                census_columns.codes[field][rows], census_columns.categories[field], eligible
+            )
+        for key, field, edges, labels in (
+            ("income_brackets", "income", (25000, 50000, 100000), ("0-25k", "25k-50k", "50k-100k", "100k+")),
+            ("age_groups", "age") + BUCKETS["age"],
+        ):
+            codes = np.searchsorted(np.asarray(edges), census_columns.values[field][rows], side="right")
+            distributions[key], intervals[key] = estimate.distribution(codes, labels, eligible, keep_empty=True)
+        sizes = census_columns.values["household_size"][rows].astype(np.int64)
+        labels = [str(size) for size in range(int(sizes.max()) + 1)] if len(sizes) else []
+        distributions["household_size_distribution"], intervals["household_size_distribution"] = (
+            estimate.distribution(sizes, labels, eligible)
+        )
+    
+    eligible_population = int(round(count[0]))
+    return {
+        "total_population": total_population,
+        "eligible_population": eligible_population,
+        "eligibility_percentage": round((count[0] / total_population) * 100, 2) if total_population > 0 else 0,
+        "avg_income_eligible": round(income[0]) if eligible_population > 0 else 0,
+        "avg_welfare_eligible": round(welfare[0], 2) if eligible_population > 0 else 0,
+        **distributions,
+        "intervals": intervals,
+        "sampling": sampling_info(estimate),
+    }
+
+def simulation_result(rows: np.ndarray) -> dict:
+    """Simulation response for the eligible census rows"""
+    with span("aggregate"):
+        total_population = census_columns.size
+        eligible_population = len(rows)
+    
+        # Distributions keep the first-seen key order of the record loops they replace
+        state_distribution = census_columns.value_counts("state", rows)
+        caste_distribution = census_columns.value_counts("caste", rows)
+        sex_distribution = census_columns.value_counts("sex", rows)
+        occupation_distribution = census_columns.value_counts("occupation_category", rows)
+        housing_distribution = census_columns.value_counts("housing_type", rows)
+    
+        income_brackets = census_columns.bucket_counts(
+            "income", rows, (25000, 50000, 100000), ("0-25k", "25k-50k", "50k-100k", "100k+")
+        )
+        age_groups = census_columns.bucket_counts(
+            "age", rows, (18, 35, 50, 65), ("0-18", "18-35", "35-50", "50-65", "65+")
+        )
+    
+        household_size_dist = {
+            str(size): count for size, count in census_columns.value_counts("household_size", rows).items()
+        }
     
-    # Compute average income and welfare score of eligible
-    avg_income_eligible = round(sum(r.get("income", 0) for r in eligible) / eligible_population) if eligible_population > 0 else 0
-    avg_welfare_eligible = round(sum(r.get("welfare_score", 0) for r in eligible) / eligible_population, 2) if eligible_population > 0 else 0
+        # Compute average income and welfare score of eligible
+        income_sum = int(census_columns.values["income"][rows].sum())
+        # Summed in record order so the rounded average matches the per-record loop exactly
+        welfare_sum = sum(census_columns.values["welfare_score"][rows].tolist())
+        avg_income_eligible = round(income_sum / eligible_population) if eligible_population > 0 else 0
+        avg_welfare_eligible = round(welfare_sum / eligible_population, 2) if eligible_population > 0 else 0
     
     return {
         "total_population": total_population,
@@ -1102,17 +1658,260 @@ async def simulate_policy(
         "household_size_distribution": household_size_dist
     }
 
+@api_router.post("/policy/simulate/batch")
+async def simulate_policy_batch(
+    batch: PolicyBatch,
+    user: dict = Depends(get_current_user)
+):
+    """
+    Run several scenarios in one request. Criteria shared between scenarios
+    are evaluated once, each scenario's result is exactly what
+    /policy/simulate returns for it, and every pair of scenarios gets the
+    differences in headline metrics (b - a) plus how many people are
+    eligible under both, only a or only b.
+    """
+    if user["role"] != "policy_maker":
+        raise HTTPException(status_code=403, detail="Only policy makers can run simulations")
+    
+    if not in_memory_db["census_records"]:
+        generate_mock_census_data()
+    
+    with span("filter"):
+        bitmaps = census_bitmaps.evaluate_many([s.eligibility_filter() for s in batch.scenarios])
+    
+    names = [s.name or f"scenario_{i + 1}" for i, s in enumerate(batch.scenarios)]
+    results = [
+        {"name": name, **simulation_result(census_bitmaps.rows(bitmap))}
+        for name, bitmap in zip(names, bitmaps)
+    ]
+    
+    deltas = []
+    with span("compare"):
+        for a, b in itertools.combinations(range(len(results)), 2):
+            overlap = popcount(bitmaps[a] & bitmaps[b])
+            delta = {"a": a, "b": b, "a_name": names[a], "b_name": names[b]}
+            for metric in ("eligible_population", "eligibility_percentage", "avg_income_eligible", "avg_welfare_eligible"):
+                delta[metric] = round(results[b][metric] - results[a][metric], 2)
+            delta["eligible_in_both"] = overlap
+            delta["eligible_only_a"] = results[a]["eligible_population"] - overlap
+            delta["eligible_only_b"] = results[b]["eligible_population"] - overlap
+            deltas.append(delta)
+    
+    return {"scenarios": results, "deltas": deltas}
+
+@api_router.post("/policy/simulate/uncertainty")
+async def simulate_policy_uncertainty(
+    simulation: UncertaintySimulation,
+    user: dict = Depends(get_current_user)
+):
+    """
+    Monte Carlo uncertainty for a simulation: replicates perturb incomes
+    and drop eligible people by their exclusion risk, and every headline
+    figure and distribution gets a confidence interval next to the exact
+    result. With `stream` the response is NDJSON whose first line is the
+    exact result and whose later lines are the intervals so far.
+    """
+    if user["role"] != "policy_maker":
+        raise HTTPException(status_code=403, detail="Only policy makers can run simulations")
+    
+    if not in_memory_db["census_records"]:
+        generate_mock_census_data()
+    
+    with span("filter"):
+        exact_rows = census_bitmaps.rows(census_bitmaps.evaluate(simulation.eligibility_filter()))
+        # Replicates move people across the threshold, so they start from the category filters alone
+        candidate_rows = census_bitmaps.rows(census_bitmaps.evaluate(simulation.category_filter()))
+    exact = simulation_result(exact_rows)
+    
+    try:
+        run = MonteCarloRun(
+            census_columns,
+            candidate_rows,
+            simulation.income_threshold,
+            replicates=simulation.replicates,
+            income_noise=simulation.income_noise,
+            exclusion_scale=simulation.exclusion_scale,
+            confidence=simulation.confidence,
+            seed=simulation.seed,
+        )
+    except QueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if simulation.stream:
+        async def lines():
+            yield json_dumps({"exact": exact}) + b"\n"
+            async for summary in run.progress():
+                yield json_dumps(summary) + b"\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+    
+    with span("replicates"):
+        summary = await run.run()
+    return {"exact": exact, **summary}
+
+@api_router.post("/policy/simulate/household")
+async def simulate_household_policy(
+    simulation: HouseholdSimulation,
+    user: dict = Depends(get_current_user)
+):
+    """
+    Household-level simulation: households qualify on total or per-capita
+    household income, head attributes, member count and dependants (under
+    18 or 60 and over), and the benefit outlay combines per-household,
+    per-member and per-dependant amounts.
+    """
+    if user["role"] != "policy_maker":
+        raise HTTPException(status_code=403, detail="Only policy makers can run simulations")
+    
+    if not in_memory_db["census_records"]:
+        generate_mock_census_data()
+    
+    try:
+        with span("aggregate"):
+            return census_households.simulate(
+                simulation.income_threshold,
+                income_basis=simulation.income_basis,
+                head_filters={
+                    "caste": simulation.caste_filter,
+                    "state": simulation.region_filter,
+                    "sex": simulation.sex_filter,
+                    "occupation_category": simulation.occupation_filter,
+                    "housing_type": simulation.housing_type_filter,
+                },
+                members_min=simulation.household_size_min,
+                members_max=simulation.household_size_max,
+                dependants_min=simulation.dependants_min,
+                benefit_per_household=simulation.benefit_per_household,
+                benefit_per_member=simulation.benefit_per_member,
+                benefit_per_dependant=simulation.benefit_per_dependant,
+            )
+    except QueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.post("/policy/sweep")
+async def sweep_policy(
+    simulation: PolicySweep,
+    user: dict = Depends(get_current_user)
+):
+    """
+    Eligibility curve for one filter set across many income thresholds: the
+    eligible count, percentage, average income and welfare and per-category
+    eligible counts at each threshold, so an income slider can be rendered
+    from a single response. Each metric is a list aligned with `thresholds`.
+    """
+    if user["role"] != "policy_maker":
+        raise HTTPException(status_code=403, detail="Only policy makers can run simulations")
+    
+    if not in_memory_db["census_records"]:
+        generate_mock_census_data()
+    
+    with span("filter"):
+        rows = census_bitmaps.rows(census_bitmaps.evaluate(simulation.category_filter()))
+    
+    thresholds = simulation.thresholds
+    if thresholds is None:
+        thresholds = default_thresholds(
+            census_columns.values["income"], simulation.threshold_min, simulation.threshold_max, simulation.steps
+        )
+    
+    try:
+        with span("aggregate"):
+            return sweep(census_columns, rows, thresholds, simulation.breakdowns)
+    except QueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.post("/policy/optimize")
+async def optimize_policy(
+    optimization: PolicyOptimization,
+    user: dict = Depends(get_current_user)
+):
+    """
+    Find the income threshold that meets a coverage target (beneficiary
+    count or percentage) or spends at most a budget, for fixed filters.
+    Binary search over the sorted incomes of the filtered population.
+    """
+    if user["role"] != "policy_maker":
+        raise HTTPException(status_code=403, detail="Only policy makers can run simulations")
+    
+    if not in_memory_db["census_records"]:
+        generate_mock_census_data()
+    
+    with span("filter"):
+        rows = census_bitmaps.rows(census_bitmaps.evaluate(optimization.category_filter()))
+    
+    try:
+        with span("aggregate"):
+            return optimize(
+                census_columns,
+                rows,
+                optimization.target,
+                optimization.value,
+                benefit_amount=optimization.benefit_amount,
+                benefit_mode=optimization.benefit_mode,
+                threshold_max=optimization.threshold_max,
+                group_by=optimization.group_by,
+            )
+    except QueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.post("/policy/eligibility-count")
+async def count_eligible(criteria: EligibilityCountRequest, user: dict = Depends(get_current_user)):
+    """
+    Number of census records matching an arbitrary AND/OR/NOT combination of
+    criteria, e.g. {"or": [{"field": "caste", "value": "SC"}, {"field":
+    "household_size", "op": "gte", "value": 6}]}. Answered from the bitmap
+    indexes with a popcount.
+    """
+    if user["role"] not in ["policy_maker", "state_analyst"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    if not in_memory_db["census_records"]:
+        generate_mock_census_data()
+    
+    try:
+        with span("filter"):
+            eligible_population = census_bitmaps.count(criteria.filter)
+    except QueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    total_population = census_columns.size
+    return {
+        "total_population": total_population,
+        "eligible_population": eligible_population,
+        "eligibility_percentage": round((eligible_population / total_population) * 100, 2) if total_population > 0 else 0
+    }
+
 @api_router.get("/audit/logs")
-async def get_audit_logs(user: dict = Depends(get_current_user)):
+async def get_audit_logs(
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    user_id: Optional[str] = None,
+    action: Optional[str] = None,
+    record_id: Optional[str] = None,
+    user: dict = Depends(get_current_user)
+):
+    """
+    Newest-first audit log page. Pass the X-Next-Cursor response header back
+    as `cursor` to fetch the next (older) page.
+    """
     if user["role"] not in ["state_analyst", "district_admin"]:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     
-    logs = in_memory_db["audit_logs"]
-    
-    if not logs:
+    if len(audit_store) == 0:
         return get_mock_audit_logs()
     
-    return sorted(logs, key=lambda x: x["timestamp"], reverse=True)[:100]
+    try:
+        logs, next_cursor = audit_store.query(
+            limit=max(1, min(limit, 500)),
+            cursor=cursor,
+            user_id=user_id,
+            action=action,
+            record_id=record_id
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return ORJSONResponse(logs, headers=headers)
 
 @api_router.get("/integrity/status/{record_id}")
 async def get_integrity_status(record_id: str, user: dict = Depends(get_current_user)):
@@ -1142,6 +1941,14 @@ def generate_mock_census_data():
     # Also populate in_memory_db for consistency
     for record in DEMO_CENSUS_DATA:
         in_memory_db["census_records"][record["record_id"]] = record
+    census_rollups.build(in_memory_db["census_records"].values())
+    census_columns.build(list(in_memory_db["census_records"].values()))
+    census_bitmaps.build(census_columns)
+    census_households.build(census_columns)
+    census_cube.build(census_columns)
+    census_sample.build(census_columns)
+    census_sketches.build(census_columns)
+    response_cache.bump_version()
     
     return DEMO_CENSUS_DATA
 
@@ -1241,19 +2048,23 @@ def get_mock_audit_logs():
             "user_name": "System Admin",
             "action": f"Record reviewed: REC{str(i).zfill(6)}",
             "details": {"action": "approve"},
-            "timestamp": datetime.now(timezone.utc) - timedelta(hours=i)
+            "timestamp": (datetime.now(timezone.utc) - timedelta(hours=i)).isoformat()
         }
         for i in range(10)
     ]
 
 app.include_router(api_router)
 
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(InstrumentationMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["http://localhost:3000", "http://127.0.0.1:3000"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 logging.basicConfig(
@@ -1262,7 +2073,29 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    if mongo_client:
-        mongo_client.close()
+# Bearer token for Prometheus scrapers; without it /metrics needs a district admin session
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """Prometheus text exposition of request/span histograms and cache/audit gauges"""
+    token = get_session_token(request)
+    if not (METRICS_TOKEN and token and hmac.compare_digest(token, METRICS_TOKEN)):
+        user = await get_current_user(request)
+        if user["role"] != "district_admin":
+            raise HTTPException(status_code=403, detail="Insufficient permissions")
+    return Response(content=render_metrics(), media_type="text/plain; version=0.0.4")
+
+register_gauge(
+    "response_cache_events", "Analytics response cache counters",
+    lambda: {(("event", k),): v for k, v in response_cache.status().items()}
+)
+register_gauge(
+    "analytics_singleflight", "Analytics computations led, requests coalesced onto them, errors and in flight",
+    lambda: {(("event", k),): v for k, v in analytics_flights.status().items()}
+)
+register_gauge(
+    "audit_writer_status", "Audit WAL writer counters and queue depths",
+    lambda: {(("field", k),): v for k, v in audit_writer.status().items()} if audit_writer is not None else {}
+)
+
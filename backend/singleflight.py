@@ -0,0 +1,58 @@
+"""
+Single-flight coalescing of identical in-flight computations.
+
+When many identical analytics requests arrive together (a district's
+officials opening the dashboard at the same time), the response cache is
+empty until the first of them finishes, so each would run the full
+aggregation. SingleFlight runs the first request's computation (the
+leader) as a task and has identical requests arriving while it is in
+flight (followers) await the same task. The result, or the exception,
+goes to every waiter. A waiter that disconnects does not cancel the
+shared computation, since others may still be waiting on it.
+
+Keys are built by the caller; SINGLEFLIGHT_SCOPE says whether requests
+from different roles may share a computation ("global") or not ("role").
+"""
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict
+
+SINGLEFLIGHT_SCOPES = ("role", "global")
+SINGLEFLIGHT_SCOPE = os.environ.get('SINGLEFLIGHT_SCOPE', 'role')
+
+if SINGLEFLIGHT_SCOPE not in SINGLEFLIGHT_SCOPES:
+    raise ValueError(f"SINGLEFLIGHT_SCOPE must be one of {', '.join(SINGLEFLIGHT_SCOPES)}")
+
+
+class SingleFlight:
+    """Per-key in-flight tasks shared by concurrent callers on one event loop."""
+
+    def __init__(self):
+        self._flights: Dict[str, asyncio.Task] = {}
+        self.stats = {"leaders": 0, "coalesced": 0, "errors": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Await `fn()`, or the identical computation already in flight for `key`."""
+        task = self._flights.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._flights[key] = task
+            self.stats["leaders"] += 1
+            task.add_done_callback(lambda done: self._land(key, done))
+        else:
+            self.stats["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def _land(self, key: str, task: asyncio.Task):
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        # Retrieving the exception also keeps asyncio from logging it when every waiter has gone
+        if not task.cancelled() and task.exception() is not None:
+            self.stats["errors"] += 1
+
+    def status(self) -> dict:
+        return {**self.stats, "in_flight": len(self._flights)}
+
+
+analytics_flights = SingleFlight()
@@ -0,0 +1,360 @@
+"""
+Mergeable sketches per state, district and pincode.
+
+Distinct households and income/welfare quantiles do not add up the way
+counts and sums do, so the rollups cannot answer them. Instead every
+pincode keeps:
+
+    HyperLogLog   distinct household_ids. Small sets are kept as exact
+                  sorted 64-bit hashes and switch to 2**p registers once
+                  that would take more memory; merging is a union or a
+                  register-wise max.
+    KLL           income and welfare quantiles, with rank error around
+                  1.7 / k. Levels of sorted items weigh 2**level; a full
+                  level keeps every other item and promotes the rest, and
+                  merging concatenates levels and compacts.
+
+District, state and national sketches are merges of their children, made
+when the data is loaded. A record whose household, income or welfare
+changes rebuilds its pincode from the column store and re-merges the
+ancestors; a record moving to another pincode rebuilds everything.
+"""
+
+import hashlib
+import math
+import os
+import random
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from census_columns import CensusColumns, QueryError
+
+HLL_PRECISION = int(os.environ.get('SKETCH_HLL_PRECISION', 12))
+KLL_K = int(os.environ.get('SKETCH_KLL_K', 200))
+KLL_MIN_CAPACITY = 8
+LEVEL_FIELDS = ("state", "district", "pin_code")
+LEVELS = ("national", "state", "district", "pincode")
+DEFAULT_QUANTILES = (0.25, 0.5, 0.75, 0.9)
+
+_EMPTY = np.zeros(0)
+_NO_HASHES = np.zeros(0, dtype=np.uint64)
+for _array in (_EMPTY, _NO_HASHES):
+    # Shared by every empty sketch; sketches only ever replace their arrays
+    _array.setflags(write=False)
+
+# Coin flips for KLL compaction; seeded so rebuilding the same data gives the same sketches
+_coin = random.Random(0)
+
+
+def hash64(values: Sequence) -> np.ndarray:
+    """Stable 64-bit hashes of values' string forms."""
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(str(v).encode(), digest_size=8).digest(), "little") for v in values),
+        dtype=np.uint64,
+        count=len(values),
+    )
+
+
+def _bit_length(x: np.ndarray) -> np.ndarray:
+    length = np.zeros(len(x), dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = x >= np.uint64(1 << shift)
+        length += np.uint8(shift) * high
+        x = np.where(high, x >> np.uint64(shift), x)
+    return length + (x > 0)
+
+
+class HyperLogLog:
+    __slots__ = ("p", "hashes", "registers")
+
+    def __init__(self, p: int = HLL_PRECISION):
+        self.p = p
+        # Exact while small: sorted distinct hashes; None once dense
+        self.hashes: Optional[np.ndarray] = _NO_HASHES
+        self.registers: Optional[np.ndarray] = None
+
+    @property
+    def _sparse_limit(self) -> int:
+        # Past this many 8-byte hashes the 1-byte registers are smaller
+        return (1 << self.p) // 8
+
+    def add_hashes(self, hashes: np.ndarray):
+        if self.registers is None:
+            self.hashes = np.unique(np.concatenate((self.hashes, hashes)))
+            if len(self.hashes) > self._sparse_limit:
+                self._densify()
+        else:
+            self._add_registers(hashes)
+
+    def _densify(self):
+        self.registers = np.zeros(1 << self.p, dtype=np.uint8)
+        self._add_registers(self.hashes)
+        self.hashes = None
+
+    def _add_registers(self, hashes: np.ndarray):
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.intp)
+        rest = hashes << np.uint64(self.p)
+        rank = np.minimum(64 - _bit_length(rest).astype(np.int64) + 1, 64 - self.p + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: "HyperLogLog"):
+        if other.registers is None:
+            self.add_hashes(other.hashes)
+            return
+        if self.registers is None:
+            self._densify()
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    @classmethod
+    def union(cls, sketches: Sequence["HyperLogLog"], p: int = HLL_PRECISION) -> "HyperLogLog":
+        """One sketch of the union of several, merged in bulk."""
+        result = cls(p)
+        dense = [s.registers for s in sketches if s.registers is not None]
+        if dense:
+            result._densify()
+            np.maximum.reduce(dense + [result.registers], out=result.registers)
+        sparse = [s.hashes for s in sketches if s.registers is None]
+        if sparse:
+            result.add_hashes(np.concatenate(sparse))
+        return result
+
+    def estimate(self) -> int:
+        if self.registers is None:
+            return len(self.hashes)
+        m = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / np.ldexp(1.0, -self.registers.astype(np.int64)).sum()
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate while many registers are empty
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class KLLSketch:
+    __slots__ = ("k", "n", "levels", "_ranks")
+
+    def __init__(self, k: int = KLL_K):
+        self.k = k
+        self.n = 0
+        self.levels = [_EMPTY]
+        # (sorted items, cumulative weights), computed on the first query after a change
+        self._ranks: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    def update_many(self, values: np.ndarray):
+        self.levels[0] = np.concatenate((self.levels[0], np.asarray(values, dtype=np.float64)))
+        self.n += len(values)
+        self._compact()
+
+    def merge(self, other: "KLLSketch"):
+        self._absorb([other])
+
+    @classmethod
+    def union(cls, sketches: Sequence["KLLSketch"], k: int = KLL_K) -> "KLLSketch":
+        """One sketch of the union of several, merged in bulk."""
+        result = cls(k)
+        result._absorb(sketches)
+        return result
+
+    def _absorb(self, sketches: Sequence["KLLSketch"]):
+        depth = max([len(self.levels)] + [len(s.levels) for s in sketches])
+        self.levels = [
+            np.concatenate([self.levels[level] if level < len(self.levels) else _EMPTY]
+                           + [s.levels[level] for s in sketches if level < len(s.levels)])
+            for level in range(depth)
+        ]
+        self.n += sum(s.n for s in sketches)
+        self._compact()
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - 1 - level
+        return max(KLL_MIN_CAPACITY, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compact(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(_EMPTY)
+                items = np.sort(items)
+                # An odd item out stays behind at full weight
+                kept, pairs = items[:len(items) % 2], items[len(items) % 2:]
+                self.levels[level] = kept
+                self.levels[level + 1] = np.concatenate((self.levels[level + 1], pairs[_coin.getrandbits(1)::2]))
+            level += 1
+        self._ranks = None
+
+    def quantiles(self, qs: Sequence[float]) -> list:
+        """Nearest-rank quantiles: the smallest item whose weighted rank reaches q * n."""
+        if self.n == 0:
+            return [None] * len(qs)
+        if self._ranks is None:
+            if len(self.levels) == 1:
+                items = np.sort(self.levels[0])
+                ranks = np.arange(1, len(items) + 1)
+            else:
+                items = np.concatenate(self.levels)
+                weights = np.concatenate([np.full(len(level), 1 << i, dtype=np.int64) for i, level in enumerate(self.levels)])
+                order = np.argsort(items, kind="stable")
+                items, ranks = items[order], np.cumsum(weights[order])
+            self._ranks = items, ranks
+        items, ranks = self._ranks
+        positions = np.searchsorted(ranks, np.asarray(qs) * ranks[-1], side="left")
+        return items[np.minimum(positions, len(items) - 1)].tolist()
+
+
+class SketchNode:
+    __slots__ = ("population", "households", "income", "welfare", "children")
+
+    def __init__(self):
+        self.population = 0
+        self.households = HyperLogLog()
+        self.income = KLLSketch()
+        self.welfare = KLLSketch()
+        self.children: Dict[str, "SketchNode"] = {}
+
+    def merge_children(self):
+        children = list(self.children.values())
+        self.population = sum(child.population for child in children)
+        self.households = HyperLogLog.union([child.households for child in children])
+        self.income = KLLSketch.union([child.income for child in children])
+        self.welfare = KLLSketch.union([child.welfare for child in children])
+
+    def stats(self, qs: Sequence[float]) -> dict:
+        labels = [quantile_label(q) for q in qs]
+        return {
+            "population": self.population,
+            "households": self.households.estimate(),
+            "income": dict(zip(labels, [round(v) if v is not None else None for v in self.income.quantiles(qs)])),
+            "welfare_score": dict(zip(labels, [round(v, 2) if v is not None else None for v in self.welfare.quantiles(qs)])),
+        }
+
+
+def quantile_label(q: float) -> str:
+    return f"p{q * 100:g}"
+
+
+def parse_quantiles(text: Optional[str]) -> Tuple[float, ...]:
+    if not text:
+        return DEFAULT_QUANTILES
+    try:
+        qs = tuple(float(part) for part in text.split(","))
+    except ValueError:
+        raise QueryError("quantiles must be comma-separated numbers")
+    if not qs or any(not 0 <= q <= 1 for q in qs):
+        raise QueryError("quantiles must be between 0 and 1")
+    return qs
+
+
+class SketchCube:
+    """Sketches for every node of the state/district/pincode hierarchy."""
+
+    def __init__(self):
+        self.root = SketchNode()
+        self._columns: Optional[CensusColumns] = None
+        self._lock = threading.Lock()
+
+    def build(self, columns: CensusColumns):
+        with self._lock:
+            self._build(columns)
+
+    def _build(self, columns: CensusColumns):
+        n = columns.size
+        # Pincodes: rows grouped by their (state, district, pin_code) codes
+        key = np.zeros(n, dtype=np.int64)
+        for field in LEVEL_FIELDS:
+            key = key * max(len(columns.categories[field]), 1) + columns.codes[field]
+        _, first, leaf_of_row = np.unique(key, return_index=True, return_inverse=True)
+        leaf_of_row = leaf_of_row.reshape(-1)
+        order = np.argsort(leaf_of_row, kind="stable")
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(leaf_of_row, minlength=len(first)))))
+        household_hashes = hash64(columns.categories["household_id"])
+
+        root = SketchNode()
+        paths = []
+        for leaf, row in enumerate(first.tolist()):
+            path = tuple(str(columns.categories[field][columns.codes[field][row]] or "Unknown") for field in LEVEL_FIELDS)
+            node = root
+            for name in path:
+                node = node.children.setdefault(name, SketchNode())
+            self._fill(node, columns, household_hashes, order[offsets[leaf]:offsets[leaf + 1]])
+            paths.append(path)
+        self._merge_up(root, len(LEVEL_FIELDS))
+
+        self.root = root
+        self._columns = columns
+        self._household_hashes = household_hashes
+        self._leaf_rows = (order, offsets)
+        self._leaf_of_row = leaf_of_row
+        self._leaf_paths = paths
+        self._snapshot = {
+            field: (columns.codes if field in columns.codes else columns.values)[field].copy()
+            for field in LEVEL_FIELDS + ("household_id", "income", "welfare_score")
+        }
+
+    @staticmethod
+    def _fill(node: SketchNode, columns: CensusColumns, household_hashes: np.ndarray, rows: np.ndarray):
+        node.population = len(rows)
+        node.households = HyperLogLog()
+        node.households.add_hashes(household_hashes[columns.codes["household_id"][rows]])
+        node.income, node.welfare = KLLSketch(), KLLSketch()
+        node.income.update_many(columns.values["income"][rows])
+        node.welfare.update_many(columns.values["welfare_score"][rows])
+
+    def _merge_up(self, node: SketchNode, levels: int):
+        if levels == 0:
+            return
+        for child in node.children.values():
+            self._merge_up(child, levels - 1)
+        node.merge_children()
+
+    def update(self, record: dict):
+        """Refresh the sketches of a record's pincode and its ancestors if it changed."""
+        with self._lock:
+            columns = self._columns
+            row = columns.row_index.get(record["record_id"]) if columns else None
+            if row is None:
+                return
+            source = lambda field: columns.codes if field in columns.codes else columns.values  # noqa: E731
+            if any(source(f)[f][row] != self._snapshot[f][row] for f in LEVEL_FIELDS):
+                self._build(columns)
+                return
+            changed = [f for f in ("household_id", "income", "welfare_score") if source(f)[f][row] != self._snapshot[f][row]]
+            if not changed:
+                return
+            for field in changed:
+                self._snapshot[field][row] = source(field)[field][row]
+            if len(columns.categories["household_id"]) > len(self._household_hashes):
+                self._household_hashes = hash64(columns.categories["household_id"])
+
+            leaf = self._leaf_of_row[row]
+            order, offsets = self._leaf_rows
+            path = self._leaf_paths[leaf]
+            ancestors = [self.root]
+            for name in path:
+                ancestors.append(ancestors[-1].children[name])
+            self._fill(ancestors[-1], columns, self._household_hashes, order[offsets[leaf]:offsets[leaf + 1]])
+            for node in reversed(ancestors[:-1]):
+                node.merge_children()
+
+    def subtree(self, path: Tuple[str, ...] = (), depth: int = 1, qs: Sequence[float] = DEFAULT_QUANTILES) -> Optional[dict]:
+        """Sketch stats for the node at `path` with `depth` levels of children, or None if it does not exist."""
+        with self._lock:
+            node = self.root
+            for name in path:
+                node = node.children.get(name)
+                if node is None:
+                    return None
+            return self._render(node, len(path), depth, qs)
+
+    def _render(self, node: SketchNode, level: int, depth: int, qs: Sequence[float]) -> dict:
+        result = {"level": LEVELS[level], **node.stats(qs)}
+        if depth > 0 and level < len(LEVEL_FIELDS):
+            result["child_level"] = LEVELS[level + 1]
+            result["children"] = {name: self._render(child, level + 1, depth - 1, qs) for name, child in node.children.items()}
+        return result
+
+
+census_sketches = SketchCube()
@@ -3,12 +3,25 @@ Chat Logic Module
 Orchestrates RAG retrieval and LLM generation with role-aware constraints
 """
 
-from typing import Optional
+from typing import Iterator, List, Optional, Tuple
 from rag import retrieve_texts
-from llm import generate_answer
+from llm import generate_answer, stream_answer
 from fallback_qa import get_fallback_response
 
 
+# Phrases that mark an LLM answer as unhelpful (replaced by the fallback Q&A)
+UNHELPFUL_PHRASES = [
+    "i don't have sufficient information",
+    "i don't have enough information",
+    "please consult your administrator",
+    "i cannot answer",
+    "insufficient information",
+    "i'm not able to"
+]
+
+NO_INFORMATION_RESPONSE = "I don't have enough information to answer that question. Please contact your administrator or refer to the platform documentation."
+
+
 # Role-specific permission constraints
 ROLE_CONSTRAINTS = {
     "supervisor": """
@@ -161,31 +174,13 @@ def generate_chatbot_response(
             # If no fallback either, return generic message
             print(f"[DEBUG] No fallback match, using generic")
             return {
-                "response": "I don't have enough information to answer that question. Please contact your administrator or refer to the platform documentation.",
+                "response": NO_INFORMATION_RESPONSE,
                 "sources_used": 0,
                 "error": None
             }
         
-        # Step 2: Build context from retrieved documents
-        context_sections = []
-        for i, doc in enumerate(retrieved_docs, 1):
-            context_sections.append(f"[Source {i}]: {doc['text']}")
-        
-        retrieved_context = "\n\n".join(context_sections)
-        
-        # Step 3: Build full prompt
-        system_prompt = build_system_prompt(user_role, page)
-        
-        full_prompt = f"""{system_prompt}
-
----
-RETRIEVED KNOWLEDGE:
-{retrieved_context}
----
-
-USER QUESTION: {user_message}
-
-YOUR RESPONSE (Provide a complete, professional explanation in 2-5 sentences. Base your answer ONLY on the retrieved knowledge above. Always complete your sentences fully):"""
+        # Steps 2-3: Build context and full prompt
+        full_prompt = build_full_prompt(user_message, user_role, page, retrieved_docs)
         
         # Step 4: Generate response using LLM (increased tokens for complete answers)
         try:
@@ -194,22 +189,13 @@ YOUR RESPONSE (Provide a complete, professional explanation in 2-5 sentences. Ba
             print(f"[DEBUG] LLM response: {response_text[:100]}...")
             
             # Check if LLM gave an unhelpful/generic response
-            unhelpful_phrases = [
-                "i don't have sufficient information",
-                "i don't have enough information",
-                "please consult your administrator",
-                "i cannot answer",
-                "insufficient information",
-                "i'm not able to"
-            ]
-            
             response_lower = response_text.lower()
-            is_unhelpful = any(phrase in response_lower for phrase in unhelpful_phrases)
+            is_unhelpful = any(phrase in response_lower for phrase in UNHELPFUL_PHRASES)
             
             if is_unhelpful:
                 print(f"[DEBUG] LLM gave unhelpful response, trying fallback...")
                 fallback_response = get_fallback_response(user_message, user_role, page)
-                if fallback_response and not any(phrase in fallback_response.lower() for phrase in unhelpful_phrases):
+                if fallback_response and not any(phrase in fallback_response.lower() for phrase in UNHELPFUL_PHRASES):
                     print(f"[DEBUG] Using fallback instead of unhelpful LLM response")
                     response_text = fallback_response
             
@@ -247,6 +233,157 @@ YOUR RESPONSE (Provide a complete, professional explanation in 2-5 sentences. Ba
             }
 
 
+def build_full_prompt(user_message: str, user_role: str, page: Optional[str], retrieved_docs: List[dict]) -> str:
+    """
+    Build the complete LLM prompt from the system prompt, retrieved
+    knowledge and the user's question.
+    """
+    context_sections = []
+    for i, doc in enumerate(retrieved_docs, 1):
+        context_sections.append(f"[Source {i}]: {doc['text']}")
+    
+    retrieved_context = "\n\n".join(context_sections)
+    system_prompt = build_system_prompt(user_role, page)
+    
+    return f"""{system_prompt}
+
+---
+RETRIEVED KNOWLEDGE:
+{retrieved_context}
+---
+
+USER QUESTION: {user_message}
+
+YOUR RESPONSE (Provide a complete, professional explanation in 2-5 sentences. Base your answer ONLY on the retrieved knowledge above. Always complete your sentences fully):"""
+
+
+class UnhelpfulDetector:
+    """
+    Incremental version of the unhelpful-phrase check for streamed answers.
+    
+    feed() returns the part of the text that is safe to forward: everything
+    except a trailing fragment that could still grow into an unhelpful
+    phrase. Once a phrase is seen, `unhelpful` is set and nothing more is
+    released.
+    """
+    
+    def __init__(self, phrases: List[str] = UNHELPFUL_PHRASES):
+        self.phrases = phrases
+        self.max_length = max(len(p) for p in phrases)
+        self.text = ""
+        self.released = 0
+        self.unhelpful = False
+    
+    def _held_back(self) -> int:
+        tail = self.text[-(self.max_length - 1):].lower()
+        for size in range(len(tail), 0, -1):
+            fragment = tail[-size:]
+            if any(p.startswith(fragment) for p in self.phrases):
+                return size
+        return 0
+    
+    def feed(self, chunk: str) -> str:
+        if self.unhelpful:
+            return ""
+        self.text += chunk
+        # Only the newly added text (plus a phrase-length overlap) needs checking
+        window = self.text[max(0, self.released - self.max_length):].lower()
+        if any(phrase in window for phrase in self.phrases):
+            self.unhelpful = True
+            return ""
+        safe_end = len(self.text) - self._held_back()
+        released, self.released = self.text[self.released:safe_end], max(self.released, safe_end)
+        return released
+    
+    def flush(self) -> str:
+        """Release whatever was held back once the stream has ended."""
+        if self.unhelpful:
+            return ""
+        released, self.released = self.text[self.released:], len(self.text)
+        return released
+
+
+def stream_chatbot_response(
+    user_message: str,
+    user_role: str,
+    page: Optional[str] = None
+) -> Iterator[Tuple[str, dict]]:
+    """
+    Streaming variant of generate_chatbot_response.
+    
+    Yields (event, data) pairs:
+        ("meta", {"sources_used": n})         - once, before any text
+        ("token", {"text": chunk})            - answer text as it arrives
+        ("replace", {"text": full_text})      - discard streamed text, show this instead
+        ("done", {"response": text, "sources_used": n, "error": None})
+    """
+    
+    if not user_message or not user_message.strip():
+        text = "Please ask a question about the census platform."
+        yield "meta", {"sources_used": 0}
+        yield "replace", {"text": text}
+        yield "done", {"response": text, "sources_used": 0, "error": None}
+        return
+    
+    try:
+        retrieved_docs = retrieve_texts(
+            query=user_message,
+            n_results=5,
+            role=user_role.lower(),
+            page=page.lower() if page else None
+        )
+    except Exception as e:
+        print(f"Error retrieving knowledge for stream: {e}")
+        retrieved_docs = []
+    
+    sources_used = len(retrieved_docs)
+    yield "meta", {"sources_used": sources_used}
+    
+    if not retrieved_docs:
+        fallback_response = get_fallback_response(user_message, user_role, page)
+        text = fallback_response if fallback_response and "I don't have" not in fallback_response else NO_INFORMATION_RESPONSE
+        yield "replace", {"text": text}
+        yield "done", {"response": text, "sources_used": 0, "error": None}
+        return
+    
+    full_prompt = build_full_prompt(user_message, user_role, page, retrieved_docs)
+    detector = UnhelpfulDetector()
+    
+    try:
+        for chunk in stream_answer(full_prompt, max_tokens=800):
+            released = detector.feed(chunk)
+            if released:
+                yield "token", {"text": released}
+            if detector.unhelpful:
+                print(f"[DEBUG] Streamed LLM answer is unhelpful, switching to fallback")
+                break
+        tail = detector.flush()
+        if tail:
+            yield "token", {"text": tail}
+    except Exception as llm_error:
+        print(f"[DEBUG] LLM stream failed, using fallback: {llm_error}")
+        text = get_fallback_response(user_message, user_role, page)
+        yield "replace", {"text": text}
+        yield "done", {"response": text, "sources_used": sources_used, "error": None}
+        return
+    
+    response_text = detector.text
+    if detector.unhelpful:
+        fallback_response = get_fallback_response(user_message, user_role, page)
+        if fallback_response and not any(phrase in fallback_response.lower() for phrase in UNHELPFUL_PHRASES):
+            response_text = fallback_response
+        yield "replace", {"text": response_text}
+    elif not response_text.strip():
+        response_text = "I apologize, but I couldn't generate a response. Please try rephrasing your question."
+        yield "replace", {"text": response_text}
+    elif response_text.rstrip()[-1] not in '.!?':
+        # Same incomplete-answer marker as the non-streaming path
+        yield "token", {"text": "..."}
+        response_text = response_text.rstrip() + "..."
+    
+    yield "done", {"response": response_text.strip(), "sources_used": sources_used, "error": None}
+
+
 def get_quick_help(role: str, page: Optional[str] = None) -> str:
     """
     Provide quick help based on current context.
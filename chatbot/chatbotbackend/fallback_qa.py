@@ -3,6 +3,11 @@ Fallback Q&A Database for Demo Purposes
 Used when Gemini API is unavailable or rate-limited
 """
 
+import math
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
 # Comprehensive Q&A database organized by role and page context
 FALLBACK_QA = {
     # SUPERVISOR QUESTIONS
@@ -148,53 +153,150 @@ FALLBACK_QA = {
 }
 
 
+# Matching parameters for the fallback index
+MATCH_SCORE_THRESHOLD = 2.5   # Minimum BM25 score for a candidate to be used
+ROLE_BUCKET_BOOST = 1.2       # Prefer role/page answers over general ones
+QUESTION_WEIGHT = 3           # Question terms count this many times more than answer terms
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "do", "does", "did",
+    "i", "me", "my", "we", "our", "you", "your", "it", "its", "this", "that", "these",
+    "those", "to", "of", "in", "on", "for", "at", "by", "with", "and", "or", "can",
+    "could", "would", "should", "will", "what", "how", "why", "which", "who", "when",
+    "where", "there", "here", "please", "tell", "about", "any", "some", "get"
+}
+
+SUFFIXES = [
+    ("ification", "ify"), ("ations", "at"), ("ation", "at"), ("ings", ""), ("ing", ""),
+    ("ies", "y"), ("ed", ""), ("es", ""), ("s", "")
+]
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _clean(text: str) -> str:
+    return text.lower().strip().replace('?', '').replace('!', '').replace('.', '')
+
+
+def _stem(token: str) -> str:
+    """Very light suffix stripping so "simulations"/"simulate" and "flagged"/"flag" meet."""
+    for suffix, replacement in SUFFIXES:
+        if len(token) - len(suffix) >= 3 and token.endswith(suffix) and not (suffix == "s" and token.endswith("ss")):
+            token = token[:-len(suffix)] + replacement
+            break
+    # "flagg" -> "flag", "simulate" -> "simulat" (as "simulation" -> "simulat")
+    if len(token) > 3 and token[-1] == token[-2] and token[-1] not in "aeiouls":
+        return token[:-1]
+    if len(token) > 3 and token.endswith("e"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [_stem(t) for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class FallbackMatcher:
+    """
+    BM25 inverted index over the fallback Q&A table.
+    
+    Built once at import. Each entry is indexed with its question terms
+    weighted above its answer terms; a query only scores the postings of its
+    own terms, so lookup cost depends on the query, not on the table size.
+    """
+    
+    def __init__(self, qa_table: Dict):
+        self.entries: List[Dict] = []
+        self.exact: Dict[Tuple[str, Optional[str], str], int] = {}
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        
+        for role, pages in qa_table.items():
+            if role == "general":
+                for question, answer in pages.items():
+                    self._add(role, None, question, answer)
+            else:
+                for page, page_qa in pages.items():
+                    for question, answer in page_qa.items():
+                        self._add(role, page, question, answer)
+        
+        doc_count = len(self.entries)
+        self.avg_length = sum(e["length"] for e in self.entries) / doc_count if doc_count else 0
+        self.idf = {
+            term: math.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+    
+    def _add(self, role: str, page: Optional[str], question: str, answer: str):
+        index = len(self.entries)
+        term_freqs: Dict[str, int] = defaultdict(int)
+        for term in tokenize(question):
+            term_freqs[term] += QUESTION_WEIGHT
+        for term in tokenize(answer):
+            term_freqs[term] += 1
+        
+        self.entries.append({
+            "role": role,
+            "page": page,
+            "question": question,
+            "answer": answer,
+            "length": sum(term_freqs.values())
+        })
+        self.exact[(role, page, _clean(question))] = index
+        for term, freq in term_freqs.items():
+            self.postings[term].append((index, freq))
+    
+    def search(self, user_message: str, role: str, page: Optional[str], top_k: int = 3) -> List[Tuple[float, Dict]]:
+        """
+        Return up to top_k (score, entry) candidates for the user's role/page
+        bucket and the general bucket, best first.
+        """
+        message_clean = _clean(user_message)
+        
+        # Exact question match wins outright
+        for key in ((role, page, message_clean), ("general", None, message_clean)):
+            if key in self.exact:
+                return [(math.inf, self.entries[self.exact[key]])]
+        
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(message_clean)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for index, freq in self.postings[term]:
+                entry = self.entries[index]
+                if entry["role"] != "general" and (entry["role"] != role or entry["page"] != page):
+                    continue
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * entry["length"] / self.avg_length)
+                scores[index] += idf * freq * (BM25_K1 + 1) / (freq + norm)
+        
+        ranked = []
+        for index, score in scores.items():
+            if self.entries[index]["role"] != "general":
+                score *= ROLE_BUCKET_BOOST
+            ranked.append((score, self.entries[index]))
+        ranked.sort(key=lambda item: item[0], reverse=True)
+        return ranked[:top_k]
+
+
+# Precompiled matcher over the Q&A table
+FALLBACK_MATCHER = FallbackMatcher(FALLBACK_QA)
+
+
 def get_fallback_response(user_message: str, role: str, page: str) -> str:
     """
     Get fallback response when Gemini API is unavailable.
-    Uses fuzzy matching to find relevant pre-generated answers.
+    Uses the BM25 fallback index to find the best pre-generated answer.
     """
-    user_message_lower = user_message.lower().strip()
-    # Remove punctuation for better matching
-    user_message_clean = user_message_lower.replace('?', '').replace('!', '').replace('.', '')
-    
-    print(f"[FALLBACK] Checking message: '{user_message_clean}'")
+    print(f"[FALLBACK] Checking message: '{_clean(user_message)}'")
     print(f"[FALLBACK] Role: {role}, Page: {page}")
     
-    # Check role-specific questions first
-    if role in FALLBACK_QA and page in FALLBACK_QA[role]:
-        page_qa = FALLBACK_QA[role][page]
-        for question, answer in page_qa.items():
-            question_clean = question.replace('?', '').replace('!', '').replace('.', '')
-            # Check exact match or if most words match
-            if question_clean in user_message_clean or user_message_clean in question_clean:
-                print(f"[FALLBACK] Matched role-specific question: {question}")
-                return answer
-            # Check if key words match (at least 3 words)
-            question_words = set(question_clean.split())
-            message_words = set(user_message_clean.split())
-            common_words = question_words & message_words
-            if len(common_words) >= 3 and len(question_words) > 0:
-                match_ratio = len(common_words) / len(question_words)
-                if match_ratio >= 0.6:
-                    print(f"[FALLBACK] Fuzzy matched role-specific: {question} (ratio: {match_ratio})")
-                    return answer
-    
-    # Check general questions with improved matching
-    for question, answer in FALLBACK_QA["general"].items():
-        question_clean = question.replace('?', '').replace('!', '').replace('.', '')
-        # Check exact match or substring
-        if question_clean in user_message_clean or user_message_clean in question_clean:
-            print(f"[FALLBACK] Matched general question: {question}")
-            return answer
-        # Check fuzzy match with key words
-        question_words = set(question_clean.split())
-        message_words = set(user_message_clean.split())
-        common_words = question_words & message_words
-        if len(common_words) >= 3 and len(question_words) > 0:
-            match_ratio = len(common_words) / len(question_words)
-            if match_ratio >= 0.6:
-                print(f"[FALLBACK] Fuzzy matched general: {question} (ratio: {match_ratio})")
-                return answer
+    candidates = FALLBACK_MATCHER.search(user_message, role, page)
+    if candidates and candidates[0][0] >= MATCH_SCORE_THRESHOLD:
+        score, entry = candidates[0]
+        print(f"[FALLBACK] Matched {entry['role']} question: {entry['question']} (score: {score:.2f})")
+        return entry["answer"]
     
     print(f"[FALLBACK] No match found")
     
@@ -0,0 +1,116 @@
+"""
+Health Module
+Cached provider and knowledge base status for health probes
+
+Liveness and readiness probes must not call Gemini: they read the status
+recorded by real chat traffic (through the LLM circuit breaker) and by a
+background probe that only calls the provider when traffic has been quiet
+for a full probe interval.
+"""
+
+import asyncio
+import os
+import time
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+import llm
+
+# Seconds between background provider probes (0 disables them)
+HEALTH_PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", 300))
+# Provider status older than this is reported as "unknown"
+HEALTH_STALE_AFTER = float(os.getenv("HEALTH_STALE_AFTER", 900))
+# How long the knowledge base document count is cached
+HEALTH_DOC_COUNT_TTL = float(os.getenv("HEALTH_DOC_COUNT_TTL", 60))
+
+
+class HealthMonitor:
+    """Keeps the latest provider outcome and knowledge base size for probes."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.last_probe_at: Optional[float] = None
+        self.last_probe_ok: Optional[bool] = None
+        self._doc_count = 0
+        self._doc_count_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    # Knowledge base
+
+    def doc_count(self, refresh: bool = False) -> int:
+        if refresh or time.time() - self._doc_count_at > HEALTH_DOC_COUNT_TTL:
+            from rag import collection
+            try:
+                self._doc_count = collection.count()
+            except Exception as e:
+                # An unreachable store counts as empty, so readiness fails with it
+                print(f"⚠️ Knowledge base count failed: {e}")
+                self._doc_count = 0
+            self._doc_count_at = time.time()
+        return self._doc_count
+
+    # Provider
+
+    def _latest_outcome(self):
+        """Most recent (timestamp, ok) from real traffic or the background probe."""
+        breaker = llm.circuit_breaker
+        outcomes = [
+            (breaker.last_success_at, True),
+            (breaker.last_failure_at, False),
+            (self.last_probe_at, self.last_probe_ok),
+        ]
+        outcomes = [o for o in outcomes if o[0] is not None]
+        return max(outcomes, key=lambda o: o[0]) if outcomes else (None, None)
+
+    def provider_status(self) -> dict:
+        breaker = llm.circuit_breaker
+        checked_at, ok = self._latest_outcome()
+
+        if breaker.state == breaker.OPEN:
+            status = "unavailable"
+        elif checked_at is None or time.time() - checked_at > HEALTH_STALE_AFTER:
+            status = "unknown"
+        else:
+            status = "ok" if ok else "degraded"
+
+        return {
+            "status": status,
+            "breaker_state": breaker.state,
+            "last_checked_at": checked_at,
+            "last_error": breaker.last_error,
+        }
+
+    def llm_connected(self) -> bool:
+        return self.provider_status()["status"] == "ok"
+
+    async def probe(self) -> bool:
+        """Make one real provider call (in the threadpool) and record its outcome."""
+        ok = await run_in_threadpool(llm.test_connection)
+        self.last_probe_at = time.time()
+        self.last_probe_ok = ok
+        return ok
+
+    async def _probe_loop(self):
+        while True:
+            await asyncio.sleep(HEALTH_PROBE_INTERVAL)
+            checked_at, _ = self._latest_outcome()
+            # Real traffic already told us how the provider is doing
+            if checked_at is not None and time.time() - checked_at < HEALTH_PROBE_INTERVAL:
+                continue
+            try:
+                await self.probe()
+            except Exception as e:
+                print(f"⚠️ Background LLM probe failed: {e}")
+
+    def start(self):
+        if HEALTH_PROBE_INTERVAL > 0 and self._task is None:
+            self._task = asyncio.get_event_loop().create_task(self._probe_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+health_monitor = HealthMonitor()
@@ -1,11 +1,21 @@
 """
 LLM Integration Module
 Handles Google Gemini API for generating chatbot responses
+
+Requests go through three layers before reaching Gemini:
+- a token-bucket scheduler that paces calls to the configured quota,
+- a circuit breaker that short-circuits to the fallback Q&A while the
+  provider is failing or out of quota,
+- a reusable model client pool with exponential-backoff retries.
 """
 
 import os
+import random
+import threading
+import time
 from dotenv import load_dotenv
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
 
 # Load environment variables
 load_dotenv()
@@ -15,134 +25,390 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if not GEMINI_API_KEY:
     raise ValueError("GEMINI_API_KEY not found in environment variables. Please set it in .env file")
 
-genai.configure(api_key=GEMINI_API_KEY)
+# Optional alternative endpoint (regional proxy, or a local fake server in tests)
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+if GEMINI_API_ENDPOINT:
+    genai.configure(
+        api_key=GEMINI_API_KEY,
+        transport="rest",
+        client_options={"api_endpoint": GEMINI_API_ENDPOINT}
+    )
+else:
+    genai.configure(api_key=GEMINI_API_KEY)
 
 # Use gemini-2.5-flash-lite as alternative with good quota limits
 PRIMARY_MODEL = 'gemini-2.5-flash-lite'
 FALLBACK_MODEL = 'gemini-3-flash-preview'
 
+# Scheduler, retry and circuit breaker settings (tune to the project's quota)
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", 15))
+LLM_BURST = int(os.getenv("LLM_BURST", 5))
+LLM_MAX_QUEUE_WAIT = float(os.getenv("LLM_MAX_QUEUE_WAIT", 3.0))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 0.5))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", 4.0))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", 5))
+BREAKER_RESET_TIMEOUT = float(os.getenv("LLM_BREAKER_RESET_TIMEOUT", 30))
+
+SAFETY_SETTINGS = {
+    'HARM_CATEGORY_HARASSMENT': 'BLOCK_NONE',
+    'HARM_CATEGORY_HATE_SPEECH': 'BLOCK_NONE',
+    'HARM_CATEGORY_SEXUALLY_EXPLICIT': 'BLOCK_NONE',
+    'HARM_CATEGORY_DANGEROUS_CONTENT': 'BLOCK_NONE',
+}
+
+# Transient errors worth retrying. Quota errors are not retried: they trip
+# the breaker instead so we stop spending requests on calls that will fail.
+RETRYABLE_ERRORS = (
+    google_exceptions.InternalServerError,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+    ConnectionError,
+    TimeoutError,
+)
+QUOTA_ERRORS = (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)
+
 print("✓ Gemini API configured successfully")
 
 
+class LLMUnavailableError(Exception):
+    """Raised when the LLM cannot be called (breaker open, quota, or queue timeout)."""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket that paces outgoing LLM requests.
+
+    Callers block in acquire() until a token is available or their wait
+    budget runs out; the number of blocked callers is the queue depth.
+    """
+
+    def __init__(self, rate_per_second: float, capacity: int):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.waiting = 0
+        self.max_waiting = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self, timeout: float) -> bool:
+        """Take one token, waiting up to `timeout` seconds. Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return True
+                    wait = (1 - self.tokens) / self.rate if self.rate > 0 else timeout
+                if now + wait > deadline:
+                    return False
+                time.sleep(wait)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker around the Gemini provider.
+
+    closed    -> calls flow; consecutive failures are counted
+    open      -> calls short-circuit until reset_timeout has passed
+    half_open -> a single trial call decides between closed and open
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.last_error = None
+        self.last_success_at = None
+        self.last_failure_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self._trial_in_flight:
+                    return False
+                self._trial_in_flight = True
+            return True
+
+    def release_trial(self):
+        """Give back a half-open trial slot that never reached the provider."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+            self.last_success_at = time.time()
+
+    def record_failure(self, error: Exception, trip: bool = False):
+        """Count a failed call; `trip` opens the breaker immediately (e.g. quota exhausted)."""
+        with self._lock:
+            self.consecutive_failures += 1
+            self.last_error = f"{type(error).__name__}: {str(error)[:200]}"
+            self.last_failure_at = time.time()
+            self._trial_in_flight = False
+            if trip or self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class ModelPool:
+    """Reusable GenerativeModel clients, one per model name."""
+
+    def __init__(self):
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_name: str) -> genai.GenerativeModel:
+        with self._lock:
+            model = self._models.get(model_name)
+            if model is None:
+                model = genai.GenerativeModel(model_name, safety_settings=SAFETY_SETTINGS)
+                self._models[model_name] = model
+            return model
+
+
+scheduler = TokenBucket(LLM_REQUESTS_PER_MINUTE / 60.0, LLM_BURST)
+circuit_breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+model_pool = ModelPool()
+
+_metrics_lock = threading.Lock()
+_metrics = {
+    "requests": 0,
+    "successes": 0,
+    "failures": 0,
+    "retries": 0,
+    "short_circuited": 0,
+    "queue_timeouts": 0,
+    "quota_errors": 0,
+}
+
+
+def _count(name: str, amount: int = 1):
+    with _metrics_lock:
+        _metrics[name] += amount
+
+
+def get_llm_metrics() -> dict:
+    """Snapshot of scheduler, breaker and request counters."""
+    with _metrics_lock:
+        counters = dict(_metrics)
+    return {
+        **counters,
+        "queue_depth": scheduler.waiting,
+        "max_queue_depth": scheduler.max_waiting,
+        "tokens_available": round(scheduler.tokens, 2),
+        "breaker_state": circuit_breaker.state,
+        "consecutive_failures": circuit_breaker.consecutive_failures,
+        "last_error": circuit_breaker.last_error,
+    }
+
+
+def _extract_text(response) -> str:
+    """Extract text from a Gemini response, handling different response formats."""
+    if response and response.candidates:
+        # Access the first candidate's content
+        candidate = response.candidates[0]
+        if candidate.content and candidate.content.parts:
+            text_parts = []
+            for part in candidate.content.parts:
+                if hasattr(part, 'text') and part.text:
+                    text_parts.append(part.text)
+            if text_parts:
+                return ' '.join(text_parts).strip()
+
+    # Fallback: try direct text access
+    try:
+        return response.text.strip()
+    except Exception:
+        return ""
+
+
+def _call_model(prompt: str, generation_config, stream: bool = False):
+    """One provider call on the primary model, switching to the fallback model on 404."""
+    try:
+        return model_pool.get(PRIMARY_MODEL).generate_content(
+            prompt, generation_config=generation_config, stream=stream
+        )
+    except google_exceptions.NotFound as model_error:
+        print(f"⚠️ Primary model failed, switching to fallback: {FALLBACK_MODEL} ({model_error})")
+        return model_pool.get(FALLBACK_MODEL).generate_content(
+            prompt, generation_config=generation_config, stream=stream
+        )
+
+
+def call_with_resilience(func, *args, **kwargs):
+    """
+    Run a provider call through the breaker, the scheduler and the retry loop.
+
+    Raises:
+        LLMUnavailableError: breaker open, scheduler queue timeout, quota
+            exhausted, or retries exhausted
+    """
+    _count("requests")
+
+    if not circuit_breaker.allow_request():
+        _count("short_circuited")
+        raise LLMUnavailableError(f"LLM circuit open: {circuit_breaker.last_error}")
+
+    attempt = 0
+    while True:
+        if not scheduler.acquire(LLM_MAX_QUEUE_WAIT):
+            _count("queue_timeouts")
+            circuit_breaker.release_trial()
+            raise LLMUnavailableError("LLM request queue is saturated")
+
+        try:
+            result = func(*args, **kwargs)
+            circuit_breaker.record_success()
+            _count("successes")
+            return result
+        except QUOTA_ERRORS as e:
+            _count("quota_errors")
+            _count("failures")
+            circuit_breaker.record_failure(e, trip=True)
+            raise LLMUnavailableError(f"LLM quota exhausted: {e}") from e
+        except RETRYABLE_ERRORS as e:
+            if attempt >= LLM_MAX_RETRIES:
+                _count("failures")
+                circuit_breaker.record_failure(e)
+                raise LLMUnavailableError(f"LLM unavailable after {attempt + 1} attempts: {e}") from e
+            _count("retries")
+            # Exponential backoff with full jitter
+            time.sleep(random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt))))
+            attempt += 1
+        except Exception as e:
+            _count("failures")
+            circuit_breaker.record_failure(e)
+            raise
+
+
 def generate_answer(prompt: str, max_tokens: int = 2048) -> str:
     """
     Generate an answer using Google Gemini with automatic fallback.
-    
+
     Args:
         prompt: Full prompt including system instructions and user query
         max_tokens: Maximum response length (default 2048 for complete responses)
-    
+
     Returns:
         Generated text response
+
+    Raises:
+        LLMUnavailableError: When the provider is unhealthy, out of quota, or
+            the request could not be scheduled in time; callers should fall
+            back to pre-generated answers
     """
-    
+
+    # Configure generation parameters for concise, professional responses
+    generation_config = genai.types.GenerationConfig(
+        max_output_tokens=max_tokens,
+        temperature=0.3,  # Lower temperature for factual, consistent responses
+        top_p=0.8,
+        top_k=40
+    )
+
     try:
-        # Configure generation parameters for concise, professional responses
-        generation_config = genai.types.GenerationConfig(
-            max_output_tokens=max_tokens,
-            temperature=0.3,  # Lower temperature for factual, consistent responses
-            top_p=0.8,
-            top_k=40
-        )
-        
-        # Try primary model first
-        try:
-            model = genai.GenerativeModel(PRIMARY_MODEL)
-            response = model.generate_content(
-                prompt,
-                generation_config=generation_config,
-                safety_settings={
-                    'HARM_CATEGORY_HARASSMENT': 'BLOCK_NONE',
-                    'HARM_CATEGORY_HATE_SPEECH': 'BLOCK_NONE',
-                    'HARM_CATEGORY_SEXUALLY_EXPLICIT': 'BLOCK_NONE',
-                    'HARM_CATEGORY_DANGEROUS_CONTENT': 'BLOCK_NONE',
-                }
-            )
-        except Exception as model_error:
-            # If primary model fails, try fallback
-            if "404" in str(model_error) or "not found" in str(model_error).lower():
-                print(f"⚠️ Primary model failed, switching to fallback: {FALLBACK_MODEL}")
-                model = genai.GenerativeModel(FALLBACK_MODEL)
-                response = model.generate_content(
-                    prompt,
-                    generation_config=generation_config,
-                    safety_settings={
-                        'HARM_CATEGORY_HARASSMENT': 'BLOCK_NONE',
-                        'HARM_CATEGORY_HATE_SPEECH': 'BLOCK_NONE',
-                        'HARM_CATEGORY_SEXUALLY_EXPLICIT': 'BLOCK_NONE',
-                        'HARM_CATEGORY_DANGEROUS_CONTENT': 'BLOCK_NONE',
-                    }
-                )
-            else:
-                raise model_error
-        
-        # Extract text from response - handle different response formats
-        if response and response.candidates:
-            # Access the first candidate's content
-            candidate = response.candidates[0]
-            if candidate.content and candidate.content.parts:
-                text_parts = []
-                for part in candidate.content.parts:
-                    if hasattr(part, 'text') and part.text:
-                        text_parts.append(part.text)
-                if text_parts:
-                    return ' '.join(text_parts).strip()
-        
-        # Fallback: try direct text access
-        try:
-            return response.text.strip()
-        except:
-            pass
-        
-        return "I apologize, but I couldn't generate a response. Please try rephrasing your question."
-    
+        response = call_with_resilience(_call_model, prompt, generation_config)
+    except LLMUnavailableError as e:
+        print(f"⚠️ LLM unavailable: {e}")
+        raise
     except Exception as e:
         print(f"Error generating response: {e}")
         return "An error occurred while processing your request. Please try again."
 
+    text = _extract_text(response)
+    if text:
+        return text
+
+    return "I apologize, but I couldn't generate a response. Please try rephrasing your question."
+
+
+def stream_answer(prompt: str, max_tokens: int = 2048):
+    """
+    Stream an answer from Google Gemini as text chunks arrive.
+
+    Args:
+        prompt: Full prompt including system instructions and user query
+        max_tokens: Maximum response length
+
+    Yields:
+        Text chunks in generation order (not stripped, so they concatenate)
+
+    Raises:
+        LLMUnavailableError: When the provider cannot be used or the stream
+            breaks off before completing
+    """
+
+    generation_config = genai.types.GenerationConfig(
+        max_output_tokens=max_tokens,
+        temperature=0.3,
+        top_p=0.8,
+        top_k=40
+    )
+
+    response = call_with_resilience(_call_model, prompt, generation_config, stream=True)
+
+    try:
+        for chunk in response:
+            text_parts = []
+            for candidate in chunk.candidates[:1]:
+                if candidate.content and candidate.content.parts:
+                    text_parts.extend(part.text for part in candidate.content.parts if getattr(part, 'text', None))
+            if text_parts:
+                yield ''.join(text_parts)
+    except QUOTA_ERRORS as e:
+        circuit_breaker.record_failure(e, trip=True)
+        raise LLMUnavailableError(f"LLM quota exhausted mid-stream: {e}") from e
+    except Exception as e:
+        circuit_breaker.record_failure(e)
+        raise LLMUnavailableError(f"LLM stream interrupted: {e}") from e
+
 
 def test_connection() -> bool:
     """
     Test if Gemini API is working correctly.
-    
+
     Returns:
         True if connection successful, False otherwise
     """
-    
+
     try:
-        # Simple direct test without going through generate_answer
-        test_model = genai.GenerativeModel(PRIMARY_MODEL)
-        response = test_model.generate_content(
+        response = call_with_resilience(
+            _call_model,
             "Say 'OK'",
-            generation_config=genai.types.GenerationConfig(
-                max_output_tokens=10,
-                temperature=0.1
-            )
+            genai.types.GenerationConfig(max_output_tokens=10, temperature=0.1)
         )
-        
-        # Try to extract text
-        if response and response.candidates:
-            candidate = response.candidates[0]
-            if candidate.content and candidate.content.parts:
-                for part in candidate.content.parts:
-                    if hasattr(part, 'text') and part.text:
-                        return True
-        
-        # Try direct text access
-        try:
-            if response.text:
-                return True
-        except:
-            pass
-        
-        return False
-        
+        return bool(_extract_text(response))
     except Exception as e:
         print(f"Gemini API test failed: {e}")
-        # Try fallback model
-        try:
-            fallback_model = genai.GenerativeModel(FALLBACK_MODEL)
-            response = fallback_model.generate_content("Say 'OK'")
-            return True
-        except:
-            return False
+        return False
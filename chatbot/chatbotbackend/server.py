@@ -3,25 +3,62 @@ FastAPI Server for Census Chatbot
 Provides REST API endpoints for chatbot interactions
 """
 
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Optional
 import uvicorn
+import json
 import os
 from dotenv import load_dotenv
 
-from chat_logic import generate_chatbot_response, get_quick_help
-from llm import test_connection
+from chat_logic import generate_chatbot_response, stream_chatbot_response, get_quick_help
+from llm import get_llm_metrics
+from health import health_monitor
 
 # Load environment variables
 load_dotenv()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Check connections and start background health probes; stop them on shutdown"""
+    print("\n" + "="*60)
+    print("🤖 Census Chatbot Server Starting...")
+    print("="*60)
+    
+    # Test connections
+    print(f"✓ Knowledge base loaded: {health_monitor.doc_count(refresh=True)} documents")
+    
+    # One LLM probe to seed the cached health status - don't fail on startup
+    try:
+        if await health_monitor.probe():
+            print("✓ Gemini LLM connected")
+        else:
+            print("✓ Gemini API configured (connection test failed)")
+    except Exception as e:
+        print(f"✓ Gemini API configured (test skipped: {str(e)[:50]}...)")
+    
+    health_monitor.start()
+    
+    print("="*60)
+    print("Server ready at http://localhost:8001")
+    print("API docs at http://localhost:8001/docs")
+    print("="*60 + "\n")
+    yield
+    await health_monitor.stop()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Census Chatbot API",
     description="AI Governance Assistant for Census Management Platform",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS for frontend integration
@@ -72,6 +109,7 @@ class HealthResponse(BaseModel):
     status: str
     llm_connected: bool
     knowledge_base_docs: int
+    llm_status: Optional[dict] = None
 
 
 # API Endpoints
@@ -83,27 +121,73 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "chat": "POST /chat - Send a message to the chatbot",
+            "chat_stream": "POST /chat/stream - Stream the chatbot's answer as Server-Sent Events",
             "quick_help": "GET /quick-help - Get contextual help",
-            "health": "GET /health - Check system health"
+            "health": "GET /health - Check system health (cached, no LLM call)",
+            "liveness": "GET /health/live - Liveness probe",
+            "readiness": "GET /health/ready - Readiness probe",
+            "deep_health": "GET /health/deep - Live LLM and knowledge base check",
+            "llm_metrics": "GET /llm/metrics - LLM scheduler and circuit breaker metrics"
         }
     }
 
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
-    """Health check endpoint to verify system status"""
-    from rag import collection
+    """
+    Health check endpoint to verify system status.
     
-    # Test LLM connection
-    llm_status = test_connection()
+    Served from cached status (recent chat outcomes and background probes);
+    it never calls Gemini itself. Use /health/deep for a live check.
+    """
+    doc_count = health_monitor.doc_count()
+    llm_status = health_monitor.provider_status()
+    llm_connected = llm_status["status"] == "ok"
+    
+    return {
+        "status": "healthy" if llm_connected and doc_count > 0 else "degraded",
+        "llm_connected": llm_connected,
+        "knowledge_base_docs": doc_count,
+        "llm_status": llm_status
+    }
+
+
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readiness(response: Response):
+    """
+    Readiness probe: the knowledge base is loaded.
     
-    # Get knowledge base document count
-    doc_count = collection.count()
+    An unavailable LLM does not make the service unready, since chats are
+    still answered from the fallback Q&A.
+    """
+    doc_count = health_monitor.doc_count()
+    ready = doc_count > 0
+    if not ready:
+        response.status_code = 503
+    return {
+        "status": "ready" if ready else "not_ready",
+        "knowledge_base_docs": doc_count,
+        "llm_status": health_monitor.provider_status()["status"]
+    }
+
+
+@app.get("/health/deep", response_model=HealthResponse)
+async def deep_health_check():
+    """Deep check: live Gemini call and fresh knowledge base count (uses LLM quota)"""
+    llm_connected = await health_monitor.probe()
+    doc_count = health_monitor.doc_count(refresh=True)
     
     return {
-        "status": "healthy" if llm_status and doc_count > 0 else "degraded",
-        "llm_connected": llm_status,
-        "knowledge_base_docs": doc_count
+        "status": "healthy" if llm_connected and doc_count > 0 else "degraded",
+        "llm_connected": llm_connected,
+        "knowledge_base_docs": doc_count,
+        "llm_status": health_monitor.provider_status()
     }
 
 
@@ -127,8 +211,10 @@ async def chat(request: ChatRequest):
             detail=f"Invalid role. Must be one of: {', '.join(valid_roles)}"
         )
     
-    # Generate response
-    result = generate_chatbot_response(
+    # Generate response in the threadpool so concurrent chats queue in the
+    # LLM scheduler instead of blocking the event loop
+    result = await run_in_threadpool(
+        generate_chatbot_response,
         user_message=request.message,
         user_role=request.role,
         page=request.page
@@ -145,6 +231,46 @@ async def chat(request: ChatRequest):
     )
 
 
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Streaming chat endpoint (Server-Sent Events).
+    
+    Emits a `meta` event with the retrieved source count first, then `token`
+    events as Gemini generates text. A `replace` event tells the client to
+    swap the streamed text for a fallback answer, and `done` carries the
+    final response.
+    """
+    
+    valid_roles = ["supervisor", "district_admin", "state_analyst", "policy_maker"]
+    if request.role.lower() not in valid_roles:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid role. Must be one of: {', '.join(valid_roles)}"
+        )
+    
+    def event_stream():
+        # Sync generator: Starlette iterates it in the threadpool
+        for event, data in stream_chatbot_response(
+            user_message=request.message,
+            user_role=request.role,
+            page=request.page
+        ):
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/llm/metrics")
+async def llm_metrics():
+    """Scheduler queue depth, circuit breaker state and LLM request counters"""
+    return get_llm_metrics()
+
+
 @app.get("/quick-help")
 async def quick_help(role: str, page: Optional[str] = None):
     """
@@ -174,35 +300,6 @@ async def quick_help(role: str, page: Optional[str] = None):
     }
 
 
-# Startup event
-@app.on_event("startup")
-async def startup_event():
-    """Run on server startup"""
-    print("\n" + "="*60)
-    print("🤖 Census Chatbot Server Starting...")
-    print("="*60)
-    
-    # Test connections
-    from rag import collection
-    print(f"✓ Knowledge base loaded: {collection.count()} documents")
-    
-    # Simple LLM test - don't fail on startup
-    try:
-        from llm import generate_answer
-        test_response = generate_answer("Say OK", max_tokens=5)
-        if test_response:
-            print("✓ Gemini LLM connected")
-        else:
-            print("✓ Gemini API configured (connection not tested)")
-    except Exception as e:
-        print(f"✓ Gemini API configured (test skipped: {str(e)[:50]}...)")
-    
-    print("="*60)
-    print("Server ready at http://localhost:8001")
-    print("API docs at http://localhost:8001/docs")
-    print("="*60 + "\n")
-
-
 # Run server
 if __name__ == "__main__":
     HOST = os.getenv("HOST", "0.0.0.0")
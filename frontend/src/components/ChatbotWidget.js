@@ -66,7 +66,7 @@ const ChatbotWidget = ({ userRole }) => {
     setIsTyping(true);
 
     try {
-      const response = await fetch(`${CHATBOT_API_URL}/chat`, {
+      const response = await fetch(`${CHATBOT_API_URL}/chat/stream`, {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
@@ -78,19 +78,66 @@ const ChatbotWidget = ({ userRole }) => {
         }),
       });
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         throw new Error(`API error: ${response.status}`);
       }
 
-      const data = await response.json();
-
-      const assistantMessage = {
-        role: "assistant",
-        content: data.response || data.answer || "I couldn't generate a response.",
-        time: getCurrentTime(),
+      // Add an empty assistant message and grow it as tokens arrive
+      let content = "";
+      let started = false;
+      const updateAssistant = (text) => {
+        content = text;
+        if (!started) {
+          started = true;
+          setIsTyping(false);
+          setMessages((prev) => [
+            ...prev,
+            { role: "assistant", content, time: getCurrentTime() },
+          ]);
+          return;
+        }
+        setMessages((prev) => [
+          ...prev.slice(0, -1),
+          { ...prev[prev.length - 1], content },
+        ]);
       };
 
-      setMessages((prev) => [...prev, assistantMessage]);
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Server-Sent Events are separated by a blank line
+        let boundary = buffer.indexOf("\n\n");
+        while (boundary !== -1) {
+          const rawEvent = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+          boundary = buffer.indexOf("\n\n");
+
+          const eventLine = rawEvent.split("\n").find((l) => l.startsWith("event: "));
+          const dataLine = rawEvent.split("\n").find((l) => l.startsWith("data: "));
+          if (!eventLine || !dataLine) continue;
+
+          const event = eventLine.slice(7);
+          const data = JSON.parse(dataLine.slice(6));
+
+          if (event === "token") {
+            updateAssistant(content + data.text);
+          } else if (event === "replace") {
+            updateAssistant(data.text);
+          } else if (event === "done") {
+            updateAssistant(data.response || content || "I couldn't generate a response.");
+          }
+        }
+      }
+
+      if (!started) {
+        updateAssistant("I couldn't generate a response.");
+      }
     } catch (error) {
       console.error("Chat API error:", error);
       const errorMessage = {
@@ -0,0 +1,91 @@
+"""
+Shared fixtures
+"""
+
+import asyncio
+import random
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend" / "benchmarks"))
+
+from census_columns import CensusColumns  # noqa: E402
+
+API_ROLES = ("supervisor", "district_admin", "state_analyst", "policy_maker")
+
+
+class ApiClient:
+    """In-process client for the server app with one session per role."""
+
+    def __init__(self, server):
+        self.server = server
+        self.tokens = {}
+        for role in API_ROLES:
+            response = self.request("POST", "/api/auth/dev-login", json={"email": f"{role}@example.com", "role": role})
+            self.tokens[role] = response.json()["session_token"]
+
+    def request(self, method: str, path: str, role: str = None, **kwargs) -> httpx.Response:
+        headers = kwargs.pop("headers", {})
+        if role is not None:
+            headers["Authorization"] = f"Bearer {self.tokens[role]}"
+
+        async def go():
+            transport = httpx.ASGITransport(app=self.server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.request(method, path, headers=headers, **kwargs)
+        return asyncio.run(go())
+
+    def get(self, path: str, role: str = "supervisor", **kwargs) -> httpx.Response:
+        return self.request("GET", path, role, **kwargs)
+
+    def post(self, path: str, role: str = "supervisor", **kwargs) -> httpx.Response:
+        return self.request("POST", path, role, **kwargs)
+
+
+def random_census(n: int, seed: int = 0, **fields):
+    """
+    `n` random records R0.. and their column store. Each keyword is a field,
+    drawn in keyword order: a list is chosen from, a callable gets (rng,
+    record so far), anything else is stored as is.
+    """
+    rng = random.Random(seed)
+    records = []
+    for i in range(n):
+        record = {"record_id": f"R{i}"}
+        for field, spec in fields.items():
+            if callable(spec):
+                record[field] = spec(rng, record)
+            elif isinstance(spec, list):
+                record[field] = rng.choice(spec)
+            else:
+                record[field] = spec
+        records.append(record)
+    columns = CensusColumns()
+    columns.build(records)
+    return columns, records
+
+
+@pytest.fixture
+def census():
+    """Factory for random census records and their column store; see random_census."""
+    return random_census
+
+
+@pytest.fixture(scope="session")
+def api(tmp_path_factory):
+    """The server app over a small synthetic census, without MongoDB or audit files on disk."""
+    from synthetic_census import write_dataset
+
+    data_file = write_dataset(tmp_path_factory.mktemp("census") / "census.jsonl", 3000, seed=11)
+    with pytest.MonkeyPatch.context() as patch:
+        # Read at import; set ahead of backend/.env, which load_dotenv does not override
+        patch.setenv("MONGO_URL", "")
+        patch.setenv("AUDIT_LOG_DIR", "")
+        patch.setenv("CENSUS_DATA_FILE", str(data_file))
+        import server
+    server.generate_mock_census_data()
+    return ApiClient(server)
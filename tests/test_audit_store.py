@@ -0,0 +1,112 @@
+"""
+Tests for the append-only audit log store
+"""
+
+import asyncio
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from audit_store import AuditStore, normalize_timestamp  # noqa: E402
+
+
+def make_entry(i, user_id="user_a", action="approve", record_id=None):
+    return {
+        "audit_id": f"audit_{i}",
+        "user_id": user_id,
+        "user_name": "Tester",
+        "action": f"Reviewed record {record_id or i}",
+        "details": {"record_id": record_id or f"REC{i}", "action": action},
+        "timestamp": datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=i),
+    }
+
+
+def test_timestamps_are_normalized_to_utc_strings():
+    assert normalize_timestamp(datetime(2025, 1, 1, 5, 30)) == "2025-01-01T05:30:00+00:00"
+    assert normalize_timestamp("2025-01-01T11:00:00+05:30") == "2025-01-01T05:30:00+00:00"
+    assert normalize_timestamp("2025-01-01T05:30:00Z") == "2025-01-01T05:30:00+00:00"
+
+
+def test_cursor_pagination_is_newest_first_and_complete(tmp_path):
+    store = AuditStore(tmp_path, ring_size=8, segment_max_entries=5)
+    store.append_many(make_entry(i) for i in range(23))
+
+    seen = []
+    cursor = None
+    while True:
+        page, cursor = store.query(limit=4, cursor=cursor)
+        seen.extend(e["audit_id"] for e in page)
+        if cursor is None:
+            break
+
+    # Older pages come from disk segments once they fall out of the ring
+    assert seen == [f"audit_{i}" for i in range(22, -1, -1)]
+
+
+def test_secondary_index_filters(tmp_path):
+    store = AuditStore(tmp_path, ring_size=4)
+    for i in range(12):
+        store.append(make_entry(
+            i,
+            user_id="user_a" if i % 2 else "user_b",
+            action="approve" if i % 3 else "request_verification",
+            record_id="REC_X" if i in (3, 9) else None,
+        ))
+
+    page, _ = store.query(user_id="user_a", action="approve")
+    assert [e["audit_id"] for e in page] == ["audit_11", "audit_7", "audit_5", "audit_1"]
+
+    page, _ = store.query(record_id="REC_X")
+    assert [e["audit_id"] for e in page] == ["audit_9", "audit_3"]
+
+    page, cursor = store.query(user_id="user_b", limit=2)
+    assert [e["audit_id"] for e in page] == ["audit_10", "audit_8"]
+    page, _ = store.query(user_id="user_b", limit=2, cursor=cursor)
+    assert [e["audit_id"] for e in page] == ["audit_6", "audit_4"]
+
+
+def test_store_reloads_from_segments(tmp_path):
+    store = AuditStore(tmp_path, segment_max_entries=3)
+    store.append_many(make_entry(i, user_id=f"user_{i % 2}") for i in range(7))
+    store.close()
+
+    reopened = AuditStore(tmp_path, segment_max_entries=3)
+    assert len(reopened) == 7
+    page, _ = reopened.query(user_id="user_1")
+    assert [e["audit_id"] for e in page] == ["audit_5", "audit_3", "audit_1"]
+
+    reopened.append(make_entry(7))
+    assert reopened.query(limit=1)[0][0]["seq"] == 7
+
+
+def test_invalid_cursor_raises(tmp_path):
+    store = AuditStore(tmp_path)
+    with pytest.raises(ValueError):
+        store.query(cursor="not-a-cursor")
+
+
+def test_app_lifespan_starts_and_closes_the_audit_pipeline(api, monkeypatch):
+    events = []
+
+    class Writer:
+        async def start(self):
+            events.append("writer started")
+
+        async def stop(self):
+            events.append("writer stopped")
+
+    monkeypatch.setattr(api.server, "audit_writer", Writer())
+    monkeypatch.setattr(api.server.audit_store, "close", lambda: events.append("store closed"))
+    monkeypatch.setattr(api.server, "shutdown_monte_carlo", lambda: events.append("pool shut down"))
+
+    async def serve():
+        async with api.server.lifespan(api.server.app):
+            events.append("serving")
+
+    asyncio.run(serve())
+
+    assert events == ["writer started", "serving", "writer stopped", "store closed", "pool shut down"]
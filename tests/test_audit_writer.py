@@ -0,0 +1,153 @@
+"""
+Tests for the write-ahead, batched audit writer
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from audit_writer import AuditWriter  # noqa: E402
+
+
+class FakeSink:
+    def __init__(self, fail_times=0, delay=0.0):
+        self.batches = []
+        self.fail_times = fail_times
+        self.delay = delay
+
+    async def __call__(self, entries):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail_times:
+            self.fail_times -= 1
+            raise ConnectionError("mongo down")
+        self.batches.append(list(entries))
+
+    @property
+    def shipped(self):
+        return [entry["audit_id"] for batch in self.batches for entry in batch]
+
+
+def make_entry(i):
+    return {"audit_id": f"audit_{i}", "user_id": "user_a", "details": {"record_id": f"REC{i}"}}
+
+
+def test_entries_are_shipped_in_batches(tmp_path):
+    sink = FakeSink()
+
+    async def scenario():
+        writer = AuditWriter(tmp_path, sink, batch_size=10, flush_interval=0.05)
+        await writer.start()
+        await writer.submit_many([make_entry(i) for i in range(25)])
+        await writer.stop()
+        return writer
+
+    writer = asyncio.run(scenario())
+
+    assert sink.shipped == [f"audit_{i}" for i in range(25)]
+    assert max(len(batch) for batch in sink.batches) == 10
+    assert writer.status()["checkpoint_lsn"] == 25
+
+
+def test_unshipped_entries_are_recovered_from_wal(tmp_path):
+    async def crash_before_ship():
+        writer = AuditWriter(tmp_path, FakeSink(fail_times=1000), batch_size=10, flush_interval=0.05)
+        await writer.start()
+        await writer.submit_many([make_entry(i) for i in range(5)])
+        # Simulate a crash: tasks die without a successful flush
+        for task in writer._tasks:
+            task.cancel()
+        writer._wal_file.close()
+
+    asyncio.run(crash_before_ship())
+    # A torn final line from the crash is discarded
+    wal_path = next(tmp_path.glob("wal-*.jsonl"))
+    with open(wal_path, "a") as f:
+        f.write('{"lsn": 6, "entry": {"audit')
+
+    sink = FakeSink()
+
+    async def restart():
+        writer = AuditWriter(tmp_path, sink, batch_size=10, flush_interval=0.05)
+        await writer.start()
+        await writer.submit(make_entry(5))
+        await writer.stop()
+        return writer
+
+    writer = asyncio.run(restart())
+
+    assert writer.stats["recovered"] == 5
+    assert sink.shipped == [f"audit_{i}" for i in range(6)]
+
+
+def test_sink_failures_are_retried(tmp_path):
+    sink = FakeSink(fail_times=2)
+
+    async def scenario():
+        writer = AuditWriter(tmp_path, sink, batch_size=100, flush_interval=0.01)
+        await writer.start()
+        await writer.submit_many([make_entry(i) for i in range(3)])
+        while writer.status()["pending"]:
+            await asyncio.sleep(0.01)
+        await writer.stop()
+        return writer
+
+    writer = asyncio.run(scenario())
+
+    assert sink.shipped == ["audit_0", "audit_1", "audit_2"]
+    assert writer.stats["sink_failures"] == 2
+
+
+def test_submit_waits_when_sink_falls_behind(tmp_path):
+    sink = FakeSink(delay=0.05)
+
+    async def scenario():
+        writer = AuditWriter(tmp_path, sink, batch_size=5, flush_interval=0.01, max_pending=10)
+        await writer.start()
+        max_seen = 0
+
+        async def producer():
+            nonlocal max_seen
+            for i in range(40):
+                await writer.submit(make_entry(i))
+                status = writer.status()
+                max_seen = max(max_seen, status["pending"] + status["awaiting_fsync"])
+
+        await producer()
+        await writer.stop()
+        return max_seen
+
+    max_seen = asyncio.run(scenario())
+
+    assert max_seen <= 10
+    assert len(sink.shipped) == 40
+
+
+def test_stop_ships_a_group_still_being_fsynced(tmp_path):
+    sink = FakeSink()
+
+    async def scenario():
+        writer = AuditWriter(tmp_path, sink, batch_size=10, flush_interval=0.01)
+        await writer.start()
+        append = writer._append_to_wal
+
+        def slow_append(records):
+            time.sleep(0.1)
+            append(records)
+
+        writer._append_to_wal = slow_append
+        submitted = asyncio.ensure_future(writer.submit_many([make_entry(i) for i in range(3)]))
+        # Let the WAL loop take the group, then stop while its fsync is running
+        await asyncio.sleep(0.03)
+        assert writer.status()["awaiting_fsync"] == 0 and writer.status()["pending"] == 0
+        await writer.stop()
+        await submitted
+        return writer
+
+    writer = asyncio.run(scenario())
+
+    assert sink.shipped == ["audit_0", "audit_1", "audit_2"]
+    assert writer.status()["checkpoint_lsn"] == 3
@@ -0,0 +1,119 @@
+"""
+Tests for the bitmap indexes over the census column store
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from bitmap_index import BitmapIndex  # noqa: E402
+from census_columns import QueryError  # noqa: E402
+
+
+def build(columns):
+    index = BitmapIndex()
+    index.build(columns)
+    return index
+
+
+@pytest.fixture
+def indexed(census):
+    # 300 rows leave 20 padding bits in the last word
+    columns, records = census(
+        300, seed=5,
+        state=["Bihar", "Jharkhand", "West Bengal"],
+        caste=["SC", "ST", "OBC", "General"],
+        sex=["Male", "Female"],
+        income=lambda rng, r: rng.randrange(0, 200000),
+        household_size=lambda rng, r: rng.randint(1, 8),
+    )
+    return build(columns), records
+
+
+def test_nested_expression_matches_brute_force(indexed):
+    index, records = indexed
+    expression = {"or": [
+        {"and": [{"field": "caste", "op": "in", "value": ["SC", "ST"]}, {"field": "income", "op": "lte", "value": 50000}]},
+        {"and": [{"field": "household_size", "op": "between", "value": [5, 6]}, {"not": {"field": "sex", "value": "Male"}}]},
+    ]}
+
+    expected = [
+        i for i, r in enumerate(records)
+        if (r["caste"] in ("SC", "ST") and r["income"] <= 50000)
+        or (5 <= r["household_size"] <= 6 and r["sex"] != "Male")
+    ]
+
+    assert index.count(expression) == len(expected)
+    assert index.rows(index.evaluate(expression)).tolist() == expected
+
+
+def test_not_and_empty_expressions_stay_within_row_count(indexed):
+    index, _ = indexed
+
+    assert index.count(None) == 300
+    assert index.count({"not": {"field": "caste", "value": "nobody"}}) == 300
+    assert index.count({"field": "caste", "op": "ne", "value": "nobody"}) == 300
+    assert index.count({"field": "state", "value": "Kerala"}) == 0
+
+
+def test_update_moves_record_between_value_bitmaps(census):
+    columns, records = census(100, flag_status="normal")
+    index = build(columns)
+
+    records[70]["flag_status"] = "approved"
+    index.update(records[70])
+
+    assert index.count({"field": "flag_status", "value": "approved"}) == 1
+    assert index.count({"field": "flag_status", "value": "normal"}) == 99
+
+
+def test_malformed_expressions_raise_query_error(census):
+    columns, _ = census(
+        10,
+        caste=["SC", "ST"],
+        income=lambda rng, r: rng.randrange(0, 200000),
+        household_size=lambda rng, r: rng.randint(1, 8),
+    )
+    index = build(columns)
+
+    with pytest.raises(QueryError):
+        index.count({"and": "caste"})
+    with pytest.raises(QueryError):
+        index.count({"field": "unknown", "value": 1})
+    with pytest.raises(QueryError):
+        index.count({"field": "caste", "op": "gt", "value": "SC"})
+    for bad in (
+        {"field": "caste", "op": "in", "value": 5},
+        {"field": "caste", "value": ["SC"]},
+        {"and": 5},
+        {"or": {"field": "caste", "value": "SC"}},
+        {"field": "income", "op": "gt", "value": "abc"},
+        {"field": "household_size", "op": "gt", "value": "x"},
+        {"field": "household_size", "op": "between", "value": [1]},
+    ):
+        with pytest.raises(QueryError):
+            index.count(bad)
+
+
+def test_eligibility_count_endpoint_rejects_malformed_filters(api):
+    for bad in ({"and": 5}, {"field": "caste", "value": ["SC"]}, {"field": "household_size", "op": "gt", "value": "x"}):
+        response = api.post("/api/policy/eligibility-count", "policy_maker", json={"filter": bad})
+        assert response.status_code == 400
+
+
+def test_evaluate_many_matches_individual_evaluation(indexed):
+    index, _ = indexed
+    shared = {"field": "caste", "value": "SC"}
+    expressions = [
+        [shared, {"field": "income", "op": "lte", "value": threshold}] for threshold in (25000, 50000, 100000)
+    ] + [shared, {"not": shared}]
+
+    bitmaps = index.evaluate_many(expressions)
+
+    assert [index.count(e) for e in expressions] == [int(np.bitwise_count(b).sum()) for b in bitmaps]
+    # Each expression gets its own array even where the result is a shared leaf
+    assert len({id(b) for b in bitmaps}) == len(bitmaps)
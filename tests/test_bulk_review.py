@@ -0,0 +1,66 @@
+"""
+Tests for reviewing many census records in one request
+"""
+
+
+def bulk_review(api, **body):
+    return api.post("/api/census/records/bulk-review", "supervisor", json=body)
+
+
+def bulk_audit_entries(api):
+    entries, _ = api.server.audit_store.query(limit=1000)
+    return [e for e in entries if e["action"].startswith("Bulk reviewed")]
+
+
+def approved_count(api):
+    return api.server.census_bitmaps.count({"field": "flag_status", "value": "approved"})
+
+
+def test_record_ids_mode_reports_missing_ids_and_writes_one_audit_entry(api):
+    records = api.server.in_memory_db["census_records"]
+    ids = [rid for rid, r in records.items() if r["flag_status"] in ("review", "priority")][:3]
+    approved, audited = approved_count(api), len(bulk_audit_entries(api))
+
+    response = bulk_review(api, action="approve", record_ids=ids + ["missing-record", ids[0]])
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["requested"], body["updated"], body["not_found"]) == (4, 3, 1)
+    assert body["results"][3] == {"record_id": "missing-record", "status": "not_found"}
+    assert all(records[rid]["flag_status"] == "approved" and records[rid]["reviewed"] for rid in ids)
+
+    # The derived stores see the change
+    assert approved_count(api) == approved + 3
+    entries = bulk_audit_entries(api)
+    assert len(entries) == audited + 1
+    assert entries[0]["details"] == {"record_ids": ids, "action": "approve", "count": 3}
+
+
+def test_filter_mode_reviews_every_matching_record(api):
+    records = api.server.in_memory_db["census_records"].values()
+    state = next(r["state"] for r in records if r["flag_status"] == "review")
+    matching = [r["record_id"] for r in records if r["state"] == state and r["flag_status"] == "review"]
+    review_filter = {"field": "flag_status", "value": "review"}
+
+    response = bulk_review(api, action="request_verification", filter={"state": state, "flag_status": "review"})
+
+    assert response.json()["updated"] == len(matching)
+    assert [r["record_id"] for r in response.json()["results"]] == matching
+    assert api.server.census_bitmaps.count([review_filter, {"field": "state", "value": state}]) == 0
+    drilldown = api.get("/api/analytics/drilldown", "state_analyst", params={"state": state, "depth": 0}).json()
+    assert drilldown["review"] == 0
+
+
+def test_selection_limit_and_either_or_validation(api, monkeypatch):
+    ids = list(api.server.in_memory_db["census_records"])[:3]
+    audited = len(bulk_audit_entries(api))
+
+    monkeypatch.setattr(api.server, "BULK_REVIEW_MAX_RECORDS", 2)
+    assert bulk_review(api, action="approve", record_ids=ids).status_code == 400
+    monkeypatch.undo()
+
+    assert bulk_review(api, action="approve").status_code == 400
+    assert bulk_review(api, action="approve", record_ids=ids, filter={"state": "Bihar"}).status_code == 400
+    assert bulk_review(api, action="delete", record_ids=ids).status_code == 400
+    assert api.post("/api/census/records/bulk-review", "state_analyst", json={"action": "approve", "record_ids": ids}).status_code == 403
+    assert len(bulk_audit_entries(api)) == audited
@@ -0,0 +1,105 @@
+"""
+Tests for the columnar census store and its group-by engine
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from census_columns import QueryError  # noqa: E402
+
+
+def test_cross_tab_matches_python_loop(census):
+    # Incomes reach every default income bracket
+    columns, records = census(
+        500, seed=3,
+        state=["Bihar", "Jharkhand", "Maharashtra"],
+        caste=["SC", "ST", "OBC", "General"],
+        housing_type=["pucca", "kutcha"],
+        income=lambda rng, r: rng.randrange(0, 300000),
+        age=lambda rng, r: rng.randrange(0, 90),
+        welfare_score=lambda rng, r: round(rng.uniform(0, 100), 2),
+    )
+    result = columns.aggregate(
+        group_by=[{"field": "caste"}, {"field": "state"}, {"field": "income"}],
+        measures=[{"op": "count"}, {"op": "mean", "field": "welfare_score"},
+                  {"op": "quantile", "field": "income", "q": 0.9}, {"op": "min", "field": "age"}],
+        filters=[{"field": "housing_type", "value": "pucca"}, {"field": "age", "op": "gte", "value": 18}],
+    )
+
+    expected = {}
+    for r in records:
+        if r["housing_type"] != "pucca" or r["age"] < 18:
+            continue
+        bracket = "0-50k" if r["income"] < 50000 else "50k-100k" if r["income"] < 100000 else \
+            "100k-200k" if r["income"] < 200000 else "200k+"
+        expected.setdefault((r["caste"], r["state"], bracket), []).append(r)
+
+    assert result["total_groups"] == len(expected)
+    for row in result["rows"]:
+        members = expected[(row["caste"], row["state"], row["income"])]
+        assert row["count"] == len(members)
+        assert row["mean_welfare_score"] == pytest.approx(np.mean([m["welfare_score"] for m in members]), abs=1e-4)
+        assert row["p90_income"] == pytest.approx(np.quantile([m["income"] for m in members], 0.9), abs=1e-4)
+        assert row["min_age"] == min(m["age"] for m in members)
+
+
+def test_custom_edges_discrete_groups_and_sorting(census):
+    columns, _ = census(
+        500, seed=3,
+        age=lambda rng, r: rng.randrange(0, 90),
+        household_size=lambda rng, r: rng.randint(1, 5),
+    )
+
+    buckets = columns.aggregate(group_by=[{"field": "age", "edges": [60, 18]}])
+    assert [row["age"] for row in buckets["rows"]] == ["<18", "18-60", "60+"]
+
+    sizes = columns.aggregate(group_by=[{"field": "household_size"}], sort_by="count", descending=False, limit=2)
+    counts = [row["count"] for row in sizes["rows"]]
+    assert sizes["total_groups"] == 5 and len(counts) == 2 and counts == sorted(counts)
+
+
+def test_update_reencodes_changed_record(census):
+    columns, records = census(50, flag_status="normal")
+
+    records[7]["flag_status"] = "approved"
+    columns.update(records[7])
+
+    result = columns.aggregate(filters=[{"field": "flag_status", "op": "in", "value": ["approved"]}])
+    assert result["rows"] == [{"count": 1}]
+
+
+def test_invalid_queries_raise_query_error(census):
+    columns, _ = census(
+        10,
+        state=["Bihar", "Jharkhand"],
+        caste=["SC", "ST"],
+        income=lambda rng, r: rng.randrange(0, 300000),
+        household_size=lambda rng, r: rng.randint(1, 5),
+    )
+
+    with pytest.raises(QueryError):
+        columns.aggregate(group_by=[{"field": "missing"}])
+    with pytest.raises(QueryError):
+        columns.aggregate(measures=[{"op": "quantile", "field": "income", "q": 2}])
+    with pytest.raises(QueryError):
+        columns.aggregate(filters=[{"field": "state", "op": "gt", "value": "B"}])
+    for bad in (
+        {"field": "income", "op": "gt", "value": "abc"},
+        {"field": "income", "op": "between", "value": [0, "x"]},
+        {"field": "caste", "op": "in", "value": 5},
+        {"field": "caste", "value": ["SC"]},
+        {"field": "household_size", "op": "lte", "value": None},
+    ):
+        with pytest.raises(QueryError):
+            columns.aggregate(filters=[bad])
+
+
+def test_query_endpoint_rejects_mistyped_filter_values(api):
+    for bad in ({"field": "income", "op": "gt", "value": "abc"}, {"field": "caste", "op": "in", "value": 5}):
+        response = api.post("/api/analytics/query", "state_analyst", json={"filters": [bad]})
+        assert response.status_code == 400
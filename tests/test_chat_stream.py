@@ -0,0 +1,86 @@
+"""
+Tests for streamed chatbot answers and the incremental unhelpful-phrase check
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# chat_logic imports the RAG store and the Gemini client at module level
+pytest.importorskip("chromadb")
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("google.generativeai")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "chatbot" / "chatbotbackend"))
+
+FALLBACK = "Supervisors review flagged records and approve or reject them."
+
+
+@pytest.fixture(scope="module")
+def chat_logic():
+    # llm refuses to import without a key; no request reaches Gemini here
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("GEMINI_API_KEY", "test-key")
+        import chat_logic as chat_logic_module
+
+        yield chat_logic_module
+    # test_llm imports llm against its own fake endpoint
+    for name in ("chat_logic", "llm"):
+        sys.modules.pop(name, None)
+
+
+def test_phrase_split_across_chunks_is_detected(chat_logic):
+    detector = chat_logic.UnhelpfulDetector()
+
+    released = [
+        detector.feed(chunk)
+        for chunk in ("The census covers every household. I don't ha", "ve enough info", "rmation to say more.")
+    ]
+
+    # The start of the phrase is held back until it is known to be harmless
+    assert released == ["The census covers every household. ", "", ""]
+    assert detector.unhelpful
+    assert detector.feed("More text.") == "" and detector.flush() == ""
+
+
+def test_held_back_text_is_flushed_when_the_stream_ends(chat_logic):
+    detector = chat_logic.UnhelpfulDetector()
+
+    released = detector.feed("Every review is logged. I cannot")
+
+    assert released == "Every review is logged. "
+    assert detector.flush() == "I cannot"
+    assert not detector.unhelpful and detector.flush() == ""
+
+
+@pytest.fixture
+def stream(chat_logic, monkeypatch):
+    """Runs stream_chatbot_response over a scripted LLM stream and returns its events."""
+    monkeypatch.setattr(chat_logic, "retrieve_texts", lambda **kwargs: [{"text": "Supervisors review flagged records."}])
+    monkeypatch.setattr(chat_logic, "get_fallback_response", lambda *args: FALLBACK)
+
+    def run(chunks):
+        monkeypatch.setattr(chat_logic, "stream_answer", lambda prompt, max_tokens: iter(chunks))
+        return list(chat_logic.stream_chatbot_response("Who reviews flagged records?", "supervisor"))
+    return run
+
+
+def test_fallback_replaces_an_unhelpful_streamed_answer(stream):
+    events = stream(["Records are reviewed. ", "I cannot ", "answer that."])
+
+    assert events == [
+        ("meta", {"sources_used": 1}),
+        ("token", {"text": "Records are reviewed. "}),
+        ("replace", {"text": FALLBACK}),
+        ("done", {"response": FALLBACK, "sources_used": 1, "error": None}),
+    ]
+
+
+def test_helpful_answer_streams_tokens_that_add_up_to_the_response(stream):
+    events = stream(["Supervisors review ", "flagged records. I", " approve them too"])
+
+    assert [event for event, _ in events] == ["meta", "token", "token", "token", "token", "done"]
+    tokens = "".join(data["text"] for event, data in events if event == "token")
+    assert tokens == "Supervisors review flagged records. I approve them too..."
+    assert events[-1][1]["response"] == tokens
@@ -0,0 +1,121 @@
+"""
+Tests for response compression and orjson serialization
+"""
+
+import asyncio
+import gzip
+import sys
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+pytest.importorskip("orjson")
+
+from starlette.applications import Starlette  # noqa: E402
+from starlette.responses import PlainTextResponse, StreamingResponse  # noqa: E402
+from starlette.routing import Route  # noqa: E402
+
+import compression  # noqa: E402
+from compression import CompressionMiddleware, choose_encoding  # noqa: E402
+from json_response import ORJSONResponse, dumps  # noqa: E402
+
+LARGE = "census " * 1000
+
+
+async def large(request):
+    return PlainTextResponse(LARGE)
+
+
+async def tagged(request):
+    return PlainTextResponse(LARGE, headers={"ETag": '"census-v1"'})
+
+
+async def small(request):
+    return PlainTextResponse("ok")
+
+
+async def stream(request):
+    async def chunks():
+        for i in range(3):
+            yield f"chunk {i}\n" * 200
+    return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+
+app = CompressionMiddleware(
+    Starlette(routes=[Route("/large", large), Route("/small", small), Route("/stream", stream), Route("/tagged", tagged)]),
+    minimum_size=100,
+)
+
+
+def fetch(path, accept_encoding):
+    async def go():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get(path, headers={"Accept-Encoding": accept_encoding})
+            return response.headers, await response.aread()
+    return asyncio.run(go())
+
+
+def test_gzip_applied_above_threshold():
+    headers, body = fetch("/large", "gzip")
+
+    assert headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in headers["vary"].lower()
+    assert body.decode() == LARGE
+
+
+def test_compressed_responses_get_a_weak_etag():
+    headers, _ = fetch("/tagged", "gzip")
+    assert headers["etag"] == 'W/"census-v1"'
+
+    headers, _ = fetch("/tagged", "identity")
+    assert headers["etag"] == '"census-v1"'
+
+
+def test_small_responses_are_not_compressed():
+    headers, body = fetch("/small", "gzip, br")
+
+    assert "content-encoding" not in headers
+    assert body == b"ok"
+
+
+def test_streaming_responses_decompress_to_full_body():
+    headers, body = fetch("/stream", "gzip")
+
+    assert headers["content-encoding"] == "gzip"
+    assert body.decode() == "".join(f"chunk {i}\n" * 200 for i in range(3))
+
+
+def test_gzip_streaming_chunks_are_individually_flushed():
+    encoder = compression._GzipEncoder(6)
+    first = encoder.compress(b"first chunk") + encoder.flush()
+
+    # A sync-flushed prefix is decodable before the stream ends
+    assert zlib.decompressobj(31).decompress(first) == b"first chunk"
+    assert gzip.decompress(first + encoder.finish()) == b"first chunk"
+
+
+def test_encoding_negotiation():
+    assert choose_encoding("gzip;q=0, identity") is None
+    assert choose_encoding("deflate, gzip") == "gzip"
+    if compression.brotli is not None:
+        assert choose_encoding("gzip, br") == "br"
+        headers, body = fetch("/large", "br")
+        assert headers["content-encoding"] == "br"
+        assert body.decode() == LARGE
+
+
+def test_orjson_response_serializes_datetimes_and_models():
+    from pydantic import BaseModel
+
+    class Item(BaseModel):
+        name: str
+
+    payload = {"at": datetime(2025, 1, 1, 5, 30, tzinfo=timezone.utc), "item": Item(name="x"), 1: {"a"}}
+
+    assert dumps(payload) == b'{"at":"2025-01-01T05:30:00+00:00","item":{"name":"x"},"1":["a"]}'
+    assert ORJSONResponse(payload).body == dumps(payload)
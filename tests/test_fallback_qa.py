@@ -0,0 +1,51 @@
+"""
+Tests for the indexed fallback Q&A matcher
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "chatbot" / "chatbotbackend"))
+
+from fallback_qa import FALLBACK_QA, FALLBACK_MATCHER, FallbackMatcher, get_fallback_response, tokenize  # noqa: E402
+
+
+def test_exact_question_returns_its_answer():
+    answer = get_fallback_response("What can I do on this dashboard?", "supervisor", "dashboard")
+    assert answer == FALLBACK_QA["supervisor"]["dashboard"]["what can i do on this dashboard"]
+
+
+def test_paraphrase_matches_role_specific_question():
+    answer = get_fallback_response("Why do records get flagged?", "supervisor", "review")
+    assert answer == FALLBACK_QA["supervisor"]["review"]["why are records flagged for review"]
+
+
+def test_paraphrase_matches_general_question():
+    answer = get_fallback_response("what happens with rejected records", "state_analyst", None)
+    assert answer == FALLBACK_QA["general"]["what happens to rejected records"]
+
+
+def test_other_roles_answers_are_not_returned():
+    candidates = FALLBACK_MATCHER.search("can i override supervisor decisions", "supervisor", "review")
+    assert all(entry["role"] in ("supervisor", "general") for _, entry in candidates)
+
+
+def test_unrelated_question_gets_default_help():
+    answer = get_fallback_response("what is the capital of france", "policy_maker", "analytics")
+    assert answer.startswith("I'm having trouble finding specific information")
+
+
+def test_large_table_search_is_top_k_ranked():
+    table = {"general": {f"question number {i} about topic{i}": f"answer {i}" for i in range(5000)}}
+    table["general"]["how is the budget calculated"] = "budget answer"
+    matcher = FallbackMatcher(table)
+
+    results = matcher.search("budget calculation", "policy_maker", None, top_k=2)
+
+    assert results[0][1]["answer"] == "budget answer"
+    assert len(results) <= 2
+
+
+def test_word_forms_share_a_stem():
+    for words in (("simulations", "simulate", "simulated"), ("flagged", "flag", "flags"), ("approve", "approved")):
+        assert len({tokenize(word)[0] for word in words}) == 1
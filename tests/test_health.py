@@ -0,0 +1,151 @@
+"""
+Tests for the cached provider status behind the chatbot health probes
+"""
+
+import asyncio
+import importlib.util
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+
+pytest.importorskip("google.generativeai")
+
+CHATBOT_DIR = Path(__file__).resolve().parents[1] / "chatbot" / "chatbotbackend"
+sys.path.insert(0, str(CHATBOT_DIR))
+
+
+@pytest.fixture(scope="module")
+def health_module():
+    # llm refuses to import without a key; no request reaches Gemini here
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("GEMINI_API_KEY", "test-key")
+        import health
+
+        yield health
+    # test_llm imports llm against its own fake endpoint
+    for name in ("health", "llm"):
+        sys.modules.pop(name, None)
+
+
+@pytest.fixture
+def health(health_module, monkeypatch):
+    """The health module with a fresh monitor over a fresh breaker."""
+    llm = health_module.llm
+    monkeypatch.setattr(llm, "circuit_breaker", llm.CircuitBreaker(failure_threshold=2, reset_timeout=60))
+    monkeypatch.setattr(health_module, "health_monitor", health_module.HealthMonitor())
+    return health_module
+
+
+@pytest.fixture
+def provider_calls(health, monkeypatch):
+    """Times of every live provider check."""
+    calls = []
+
+    def test_connection():
+        calls.append(time.time())
+        return True
+
+    monkeypatch.setattr(health.llm, "test_connection", test_connection)
+    return calls
+
+
+def test_provider_status_goes_stale_after_its_ttl(health, monkeypatch):
+    breaker, monitor = health.llm.circuit_breaker, health.health_monitor
+    assert monitor.provider_status()["status"] == "unknown"
+
+    breaker.last_success_at = time.time() - 10
+    assert monitor.provider_status()["status"] == "ok" and monitor.llm_connected()
+
+    monkeypatch.setattr(health, "HEALTH_STALE_AFTER", 5)
+    assert monitor.provider_status()["status"] == "unknown" and not monitor.llm_connected()
+
+    # The newest outcome wins, whether it came from traffic or a probe
+    breaker.last_failure_at = time.time()
+    assert monitor.provider_status()["status"] == "degraded"
+    breaker.state = breaker.OPEN
+    assert monitor.provider_status()["status"] == "unavailable"
+
+
+def test_background_probe_skips_while_traffic_reports_status(health, provider_calls, monkeypatch):
+    monkeypatch.setattr(health, "HEALTH_PROBE_INTERVAL", 0.05)
+    breaker, monitor = health.llm.circuit_breaker, health.health_monitor
+
+    async def main():
+        monitor.start()
+        # Chat traffic keeps succeeding for four probe intervals
+        for _ in range(20):
+            breaker.last_success_at = time.time()
+            await asyncio.sleep(0.01)
+        during_traffic = len(provider_calls)
+        # Then goes quiet, so a later probe tick calls the provider
+        await asyncio.sleep(0.15)
+        await monitor.stop()
+        return during_traffic
+
+    assert asyncio.run(main()) == 0
+    assert provider_calls and monitor.last_probe_ok
+
+
+class FakeCollection:
+    def __init__(self, count):
+        self._count = count
+
+    def count(self):
+        if isinstance(self._count, Exception):
+            raise self._count
+        return self._count
+
+
+@pytest.fixture
+def chatbot(health, provider_calls, monkeypatch):
+    """GET a path from the chatbot app over a fake knowledge base collection."""
+    pytest.importorskip("chromadb")
+    pytest.importorskip("sentence_transformers")
+    import rag
+
+    # Loaded under its own name; `server` is the census backend in this test run
+    spec = importlib.util.spec_from_file_location("chatbot_server", CHATBOT_DIR / "server.py")
+    server = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(server)
+    monkeypatch.setattr(server, "health_monitor", health.health_monitor)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("health probes must not call the LLM")
+
+    for name in ("generate_answer", "stream_answer"):
+        monkeypatch.setattr(health.llm, name, fail)
+
+    def get(path, docs=21):
+        monkeypatch.setattr(rag, "collection", FakeCollection(docs))
+        health.health_monitor.doc_count(refresh=True)
+
+        async def go():
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.get(path)
+        return asyncio.run(go())
+    return get
+
+
+def test_liveness_and_cached_health_never_call_the_llm(chatbot, provider_calls):
+    assert chatbot("/health/live").json() == {"status": "alive"}
+    assert chatbot("/health").json()["llm_status"]["status"] == "unknown"
+    assert provider_calls == []
+
+
+def test_readiness_fails_when_the_knowledge_base_is_down(chatbot, health, provider_calls):
+    ready = chatbot("/health/ready")
+    assert ready.status_code == 200 and ready.json()["status"] == "ready"
+
+    assert chatbot("/health/ready", docs=0).status_code == 503
+    unreachable = chatbot("/health/ready", docs=ConnectionError("chroma is down"))
+    assert unreachable.status_code == 503 and unreachable.json()["knowledge_base_docs"] == 0
+
+    # Chats fall back to the built-in Q&A, so an open breaker leaves the service ready
+    health.llm.circuit_breaker.state = "open"
+    ready = chatbot("/health/ready")
+    assert ready.status_code == 200 and ready.json()["llm_status"] == "unavailable"
+    assert provider_calls == []
@@ -0,0 +1,83 @@
+"""
+Tests for household aggregates and household-level simulation
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from census_columns import CensusColumns, QueryError  # noqa: E402
+from households import HouseholdTable  # noqa: E402
+
+
+def member(record_id, household_id, relation, age, income, caste="SC", state="Bihar"):
+    return {
+        "record_id": record_id, "household_id": household_id, "relation": relation, "age": age,
+        "income": income, "caste": caste, "state": state, "welfare_score": 50.0,
+    }
+
+
+RECORDS = [
+    # Head listed second; the child's caste must not count as the household's
+    member("A1", "HH-A", "son", 10, 0, caste="ST"),
+    member("A2", "HH-A", "head", 40, 30000),
+    member("A3", "HH-A", "parent", 70, 5000),
+    member("B1", "HH-B", "head", 35, 90000, caste="General"),
+    # No head recorded: the first member stands in
+    member("C1", "HH-C", "other", 25, 10000, state="Jharkhand"),
+    member("C2", "HH-C", "other", 22, 10000, state="Jharkhand"),
+]
+
+
+def build(records):
+    columns = CensusColumns()
+    columns.build(records)
+    table = HouseholdTable()
+    table.build(columns)
+    return columns, table
+
+
+def test_aggregates_and_head_attributes():
+    _, table = build(RECORDS)
+
+    result = table.simulate(40000, head_filters={"caste": "SC"}, benefit_per_household=100, benefit_per_dependant=10)
+
+    # HH-A (35000, head SC) and HH-C (20000, head SC); HH-B is over the threshold
+    assert result["eligible_households"] == 2
+    assert result["individuals_covered"] == 5
+    assert result["dependants_covered"] == 2
+    assert result["total_benefit_outlay"] == 220.0
+    assert result["state_distribution"] == {"Bihar": 1, "Jharkhand": 1}
+
+
+def test_per_capita_basis_and_member_bounds():
+    _, table = build(RECORDS)
+
+    per_capita = table.simulate(12000, income_basis="per_capita")
+    assert per_capita["eligible_households"] == 2  # HH-A 11667, HH-C 10000
+
+    assert table.simulate(10 ** 6, members_min=2, members_max=2)["eligible_households"] == 1
+    assert table.simulate(10 ** 6, dependants_min=1)["eligible_households"] == 1
+
+
+def test_update_recomputes_changed_household():
+    records = [dict(r) for r in RECORDS]
+    columns, table = build(records)
+
+    records[3]["income"] = 1000
+    columns.update(records[3])
+    table.update(records[3])
+
+    assert table.simulate(40000)["eligible_households"] == 3
+
+
+def test_unknown_basis_or_head_field_is_rejected():
+    _, table = build(RECORDS)
+
+    with pytest.raises(QueryError):
+        table.simulate(1000, income_basis="median")
+    with pytest.raises(QueryError):
+        table.simulate(1000, head_filters={"pin_code": "100001"})
@@ -0,0 +1,86 @@
+"""
+Tests for request timing, spans and the metrics exposition
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+import instrumentation  # noqa: E402
+from instrumentation import Histogram, InstrumentationMiddleware, render_metrics, span  # noqa: E402
+
+app = FastAPI()
+app.add_middleware(InstrumentationMiddleware)
+
+
+@app.get("/items/{item_id}")
+async def get_item(item_id: str):
+    with span("load"):
+        pass
+    with span("aggregate"):
+        total = sum(range(1000))
+    return {"item_id": item_id, "total": total}
+
+
+def get(path):
+    async def go():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get(path)
+    return asyncio.run(go())
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_seconds", "help", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(("/a",), value)
+
+    lines = histogram.render()
+
+    assert 'test_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{route="/a",le="1.0"} 3' in lines
+    assert 'test_seconds_bucket{route="/a",le="+Inf"} 4' in lines
+    assert 'test_seconds_count{route="/a"} 4' in lines
+
+
+def test_spans_reported_in_server_timing_and_metrics():
+    response = get("/items/42")
+
+    timing = response.headers["server-timing"]
+    assert timing.startswith("load;dur=") and "aggregate;dur=" in timing and "total;dur=" in timing
+
+    metrics = render_metrics()
+    # Labelled by the route template, not the concrete path
+    assert 'http_request_duration_seconds_count{method="GET",route="/items/{item_id}",status="200"}' in metrics
+    assert 'handler_span_duration_seconds_count{route="/items/{item_id}",span="aggregate"}' in metrics
+
+
+def test_unmatched_routes_share_one_label():
+    get("/nope/1")
+    get("/nope/2")
+
+    assert 'route="unmatched",status="404"} 2' in render_metrics()
+
+
+def test_collapse_skips_idle_threads_and_orders_root_first():
+    def leaf():
+        return sys._getframe()
+
+    stack = instrumentation.collapse(leaf())
+
+    assert stack.endswith("test_instrumentation.py:test_collapse_skips_idle_threads_and_orders_root_first;"
+                          "test_instrumentation.py:leaf")
+
+
+def test_metrics_endpoint_needs_a_district_admin_or_the_scrape_token(api, monkeypatch):
+    assert api.get("/metrics", role=None).status_code == 401
+    assert api.get("/metrics", "state_analyst").status_code == 403
+    assert "http_request_duration_seconds" in api.get("/metrics", "district_admin").text
+
+    monkeypatch.setattr(api.server, "METRICS_TOKEN", "scrape-secret")
+    assert api.get("/metrics", role=None, headers={"Authorization": "Bearer scrape-secret"}).status_code == 200
+    assert api.get("/metrics", role=None, headers={"Authorization": "Bearer guess"}).status_code == 401
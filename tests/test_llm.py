@@ -0,0 +1,161 @@
+"""
+Tests for the Gemini client layer against a local fake Gemini REST server
+"""
+
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("google.generativeai")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "chatbot" / "chatbotbackend"))
+
+
+class FakeGemini:
+    """Scripted generateContent responses: each entry is (status, text)."""
+
+    def __init__(self):
+        self.script = []
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def next_response(self):
+        with self.lock:
+            self.calls += 1
+            return self.script.pop(0) if self.script else (200, "OK")
+
+
+FAKE = FakeGemini()
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        status, text = FAKE.next_response()
+        if status == 200 and "streamGenerateContent" in self.path:
+            # Streamed responses are a JSON array of chunks, one per word
+            body = [
+                {"candidates": [{"content": {"role": "model", "parts": [{"text": word}]}, "index": 0}]}
+                for word in text.split("|")
+            ]
+        elif status == 200:
+            body = {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP", "index": 0}]}
+        else:
+            body = {"error": {"code": status, "message": text, "status": "ERROR"}}
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def llm():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGeminiHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # Module-scoped, so the function-scoped monkeypatch fixture is not available
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("GEMINI_API_KEY", "test-key")
+        patch.setenv("GEMINI_API_ENDPOINT", f"http://127.0.0.1:{server.server_address[1]}")
+        patch.setenv("LLM_BACKOFF_BASE", "0.01")
+        import llm as llm_module
+
+        yield llm_module
+    server.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(llm):
+    FAKE.script.clear()
+    FAKE.calls = 0
+    llm.scheduler = llm.TokenBucket(rate_per_second=100, capacity=100)
+    llm.circuit_breaker = llm.CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+
+def test_generate_answer_returns_model_text(llm):
+    FAKE.script.append((200, "The review queue lists flagged records."))
+
+    assert llm.generate_answer("question") == "The review queue lists flagged records."
+    assert llm.get_llm_metrics()["breaker_state"] == "closed"
+
+
+def test_transient_errors_are_retried(llm):
+    FAKE.script.extend([(500, "boom"), (200, "recovered")])
+
+    assert llm.generate_answer("question") == "recovered"
+    assert FAKE.calls == 2
+
+
+def test_quota_error_opens_breaker_and_short_circuits(llm):
+    FAKE.script.append((429, "quota exhausted"))
+
+    with pytest.raises(llm.LLMUnavailableError):
+        llm.generate_answer("question")
+    assert llm.circuit_breaker.state == "open"
+
+    # While open, no request reaches the provider
+    with pytest.raises(llm.LLMUnavailableError):
+        llm.generate_answer("question")
+    assert FAKE.calls == 1
+
+
+def test_breaker_half_open_trial_closes_on_success(llm):
+    llm.circuit_breaker = llm.CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    FAKE.script.extend([(500, "a"), (500, "b"), (500, "c"), (200, "back")])
+
+    with pytest.raises(llm.LLMUnavailableError):
+        llm.generate_answer("question")
+    assert llm.circuit_breaker.state == "open"
+
+    assert llm.generate_answer("question") == "back"
+    assert llm.circuit_breaker.state == "closed"
+
+
+def test_stream_answer_yields_chunks_in_order(llm):
+    FAKE.script.append((200, "The review |queue lists |flagged records."))
+
+    chunks = list(llm.stream_answer("question"))
+
+    assert chunks == ["The review ", "queue lists ", "flagged records."]
+
+
+def test_stream_answer_short_circuits_when_breaker_open(llm):
+    FAKE.script.append((429, "quota exhausted"))
+
+    with pytest.raises(llm.LLMUnavailableError):
+        list(llm.stream_answer("question"))
+    with pytest.raises(llm.LLMUnavailableError):
+        list(llm.stream_answer("question"))
+    assert FAKE.calls == 1
+
+
+def test_scheduler_rejects_when_queue_wait_exceeded(llm, monkeypatch):
+    llm.scheduler = llm.TokenBucket(rate_per_second=0.01, capacity=1)
+    monkeypatch.setattr(llm, "LLM_MAX_QUEUE_WAIT", 0.05)
+
+    assert llm.generate_answer("first") == "OK"
+    with pytest.raises(llm.LLMUnavailableError):
+        llm.generate_answer("second")
+    assert FAKE.calls == 1
+    assert llm.get_llm_metrics()["queue_timeouts"] >= 1
+
+
+def test_token_bucket_tracks_queue_depth(llm):
+    bucket = llm.TokenBucket(rate_per_second=20, capacity=1)
+    threads = [threading.Thread(target=bucket.acquire, args=(1.0,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert bucket.max_waiting >= 2
+    assert bucket.waiting == 0
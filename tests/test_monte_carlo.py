@@ -0,0 +1,120 @@
+"""
+Tests for Monte Carlo uncertainty replicates
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+import monte_carlo  # noqa: E402
+from census_columns import QueryError  # noqa: E402
+from monte_carlo import MonteCarloRun, SharedColumns, _run_shared, run_replicates  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def in_process(monkeypatch):
+    monkeypatch.setattr(monte_carlo, "MONTE_CARLO_WORKERS", 1)
+
+
+@pytest.fixture
+def population(census):
+    return census(
+        500, seed=8,
+        state=["Bihar", "Jharkhand"],
+        caste=["SC", "ST", "General"],
+        sex=["Male", "Female"],
+        income=lambda rng, r: rng.randrange(0, 100000),
+        exclusion_error_risk_score=lambda rng, r: rng.random(),
+    )
+
+
+def test_without_noise_every_replicate_is_the_exact_result(population):
+    columns, records = population
+
+    summary = asyncio.run(MonteCarloRun(
+        columns, np.arange(len(records)), 40000, replicates=30, income_noise=0, exclusion_scale=0
+    ).run())
+
+    expected = sum(1 for r in records if r["income"] <= 40000)
+    assert summary["done"] and summary["replicates_done"] == 30
+    assert summary["eligible_population"] == {"mean": expected, "std": 0, "lower": expected, "upper": expected}
+    assert summary["caste_distribution"]["SC"]["mean"] == sum(
+        1 for r in records if r["income"] <= 40000 and r["caste"] == "SC"
+    )
+
+
+def test_exclusion_risk_scales_expected_count(census):
+    # Everyone is eligible and each is excluded with probability 0.25
+    columns, records = census(
+        2000, seed=8,
+        income=lambda rng, r: rng.randrange(0, 100000),
+        exclusion_error_risk_score=0.25,
+    )
+
+    summary = asyncio.run(MonteCarloRun(
+        columns, np.arange(len(records)), 10 ** 6, replicates=100, income_noise=0, seed=1
+    ).run())
+
+    interval = summary["eligible_population"]
+    assert interval["mean"] == pytest.approx(1500, rel=0.02)
+    assert interval["lower"] < interval["mean"] < interval["upper"]
+
+
+def test_seeded_runs_repeat_and_progress_per_chunk(population, monkeypatch):
+    monkeypatch.setattr(monte_carlo, "CHUNK_REPLICATES", 10)
+    columns, records = population
+    rows = np.arange(len(records))
+
+    async def collect():
+        return [s async for s in MonteCarloRun(columns, rows, 50000, replicates=25, seed=3).progress()]
+
+    first, second = asyncio.run(collect()), asyncio.run(collect())
+
+    assert [s["replicates_done"] for s in first] == [10, 20, 25]
+    assert first[-1] == second[-1] and first[-1]["seed"] == 3
+
+
+def test_shared_memory_chunks_match_in_process_replicates(population):
+    columns, records = population
+    run = MonteCarloRun(columns, np.arange(len(records)), 50000, replicates=5, seed=9)
+
+    shared = SharedColumns(run.arrays)
+    try:
+        result = _run_shared(shared.spec, run.params, run.seeds)
+    finally:
+        shared.close()
+
+    assert np.array_equal(result, run_replicates(run.arrays, run.params, run.seeds))
+
+
+def test_invalid_parameters_are_rejected(census):
+    columns, _ = census(10, income=lambda rng, r: rng.randrange(0, 100000))
+    rows = np.arange(10)
+
+    for kwargs in ({"replicates": 0}, {"income_noise": -1}, {"confidence": 1.5}, {"seed": -1}):
+        with pytest.raises(QueryError):
+            MonteCarloRun(columns, rows, 1000, **kwargs)
+
+
+def test_endpoint_reports_a_drawn_seed_that_repeats_the_run(api):
+    body = {"income_threshold": 50000, "replicates": 20}
+
+    response = api.post("/api/policy/simulate/uncertainty", "policy_maker", json=body)
+    assert response.status_code == 200
+    seed = response.json()["seed"]
+    assert 0 <= seed < 2 ** 63
+
+    repeat = api.post("/api/policy/simulate/uncertainty", "policy_maker", json={**body, "seed": seed})
+    assert repeat.json()["eligible_population"] == response.json()["eligible_population"]
+
+    lines = api.post("/api/policy/simulate/uncertainty", "policy_maker", json={**body, "stream": True}).text.splitlines()
+    assert json.loads(lines[-1])["done"]
+
+    negative = api.post("/api/policy/simulate/uncertainty", "policy_maker", json={**body, "seed": -1})
+    assert negative.status_code == 422
@@ -0,0 +1,58 @@
+"""
+Tests for running several policy scenarios in one request
+"""
+
+import itertools
+
+import pytest
+
+SCENARIOS = [
+    {"name": "baseline", "income_threshold": 50000},
+    {"income_threshold": 100000, "caste_filter": "SC"},
+    {"name": "bihar", "income_threshold": 75000, "region_filter": "Bihar"},
+]
+
+
+def eligible_ids(api, scenario):
+    return {
+        r["record_id"]
+        for r in api.server.in_memory_db["census_records"].values()
+        if r["income"] <= scenario["income_threshold"]
+        and r.get("caste") == scenario.get("caste_filter", r.get("caste"))
+        and r.get("state") == scenario.get("region_filter", r.get("state"))
+    }
+
+
+def test_batch_matches_single_simulations_with_pairwise_deltas(api):
+    response = api.post("/api/policy/simulate/batch", "policy_maker", json={"scenarios": SCENARIOS})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [s["name"] for s in body["scenarios"]] == ["baseline", "scenario_2", "bihar"]
+
+    singles = []
+    for scenario, result in zip(SCENARIOS, body["scenarios"]):
+        single = api.post("/api/policy/simulate", "policy_maker", json=scenario).json()
+        assert result["eligible_population"] == single["eligible_population"] == len(eligible_ids(api, scenario))
+        # The single endpoint may answer from the policy cube, whose welfare averages can round differently
+        assert result["avg_welfare_eligible"] == pytest.approx(single["avg_welfare_eligible"], abs=0.01)
+        assert {k: v for k, v in result.items() if k not in ("name", "avg_welfare_eligible")} == {
+            k: v for k, v in single.items() if k != "avg_welfare_eligible"
+        }
+        singles.append(result)
+
+    assert [(d["a"], d["b"]) for d in body["deltas"]] == list(itertools.combinations(range(3), 2))
+    for delta in body["deltas"]:
+        a, b = singles[delta["a"]], singles[delta["b"]]
+        assert (delta["a_name"], delta["b_name"]) == (a["name"], b["name"])
+        for metric in ("eligible_population", "eligibility_percentage", "avg_income_eligible", "avg_welfare_eligible"):
+            assert delta[metric] == round(b[metric] - a[metric], 2)
+        in_a, in_b = eligible_ids(api, SCENARIOS[delta["a"]]), eligible_ids(api, SCENARIOS[delta["b"]])
+        assert delta["eligible_in_both"] == len(in_a & in_b)
+        assert delta["eligible_only_a"] == len(in_a - in_b)
+        assert delta["eligible_only_b"] == len(in_b - in_a)
+
+
+def test_batch_is_for_policy_makers_and_needs_a_scenario(api):
+    assert api.post("/api/policy/simulate/batch", "state_analyst", json={"scenarios": SCENARIOS}).status_code == 403
+    assert api.post("/api/policy/simulate/batch", "policy_maker", json={"scenarios": []}).status_code == 422
@@ -0,0 +1,161 @@
+"""
+Parity tests for the pre-aggregated policy cube
+"""
+
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+import policy_cube  # noqa: E402
+from census_columns import QueryError  # noqa: E402
+from policy_cube import PolicyCube  # noqa: E402
+
+FILTER_FIELDS = ("caste", "state", "sex", "occupation_category", "housing_type")
+
+
+def expected(records, threshold, filters, size_min=None, size_max=None):
+    """The /policy/simulate record loop"""
+    eligible = [
+        r for r in records
+        if r["income"] <= threshold
+        and all(r[field] == value for field, value in filters.items())
+        and (size_min is None or r["household_size"] >= size_min)
+        and (size_max is None or r["household_size"] <= size_max)
+    ]
+
+    def counts(key, values):
+        result = {}
+        for value in values:
+            result[key(value)] = result.get(key(value), 0) + 1
+        return result
+
+    brackets = {"0-25k": 0, "25k-50k": 0, "50k-100k": 0, "100k+": 0}
+    for r in eligible:
+        label = "0-25k" if r["income"] < 25000 else "25k-50k" if r["income"] < 50000 else (
+            "50k-100k" if r["income"] < 100000 else "100k+"
+        )
+        brackets[label] += 1
+    ages = {"0-18": 0, "18-35": 0, "35-50": 0, "50-65": 0, "65+": 0}
+    for r in eligible:
+        age = r["age"]
+        ages["0-18" if age < 18 else "18-35" if age < 35 else "35-50" if age < 50 else "50-65" if age < 65 else "65+"] += 1
+    return {
+        "eligible_population": len(eligible),
+        "avg_income_eligible": round(sum(r["income"] for r in eligible) / len(eligible)) if eligible else 0,
+        "avg_welfare_eligible": round(sum(r["welfare_score"] for r in eligible) / len(eligible), 2) if eligible else 0,
+        "region_distribution": counts(lambda r: r["state"], eligible),
+        "caste_distribution": counts(lambda r: r["caste"], eligible),
+        "sex_distribution": counts(lambda r: r["sex"], eligible),
+        "occupation_distribution": counts(lambda r: r["occupation_category"], eligible),
+        "housing_distribution": counts(lambda r: r["housing_type"], eligible),
+        "income_brackets": brackets,
+        "age_groups": ages,
+        "household_size_distribution": counts(lambda r: str(r["household_size"]), eligible),
+    }
+
+
+def leaves(filters, size_min=None, size_max=None):
+    result = [{"field": field, "op": "eq", "value": value} for field, value in filters.items()]
+    if size_min:
+        result.append({"field": "household_size", "op": "gte", "value": size_min})
+    if size_max:
+        result.append({"field": "household_size", "op": "lte", "value": size_max})
+    return result
+
+
+def assert_parity(cube, records, threshold, filters, size_min=None, size_max=None):
+    result = cube.simulate(threshold, leaves(filters, size_min, size_max))
+    reference = expected(records, threshold, filters, size_min, size_max)
+    # Welfare sums are added in a different order, which can move a rounding tie
+    assert result.pop("avg_welfare_eligible") == pytest.approx(reference.pop("avg_welfare_eligible"), abs=0.01)
+    for key, value in reference.items():
+        assert result[key] == value, key
+        if isinstance(value, dict):
+            assert list(result[key]) == list(value), key
+
+
+@pytest.fixture
+def cubed(census):
+    """A cube over records with every field /policy/simulate reports on"""
+
+    def build(n=600):
+        columns, records = census(
+            n, seed=12,
+            caste=["SC", "ST", "OBC", "General"],
+            state=["Bihar", "Jharkhand", "Odisha"],
+            sex=["Male", "Female"],
+            occupation_category=["labour", "farming", "service"],
+            housing_type=["kutcha", "pucca"],
+            household_size=lambda rng, r: rng.randint(1, 7),
+            age=lambda rng, r: rng.randint(0, 90),
+            # Round-thousand incomes land exactly on bracket edges and thresholds
+            income=lambda rng, r: rng.choice([rng.randrange(0, 150000), rng.randrange(0, 150) * 1000]),
+            welfare_score=lambda rng, r: round(rng.uniform(0, 100), 2),
+        )
+        cube = PolicyCube()
+        cube.build(columns)
+        return columns, cube, records
+    return build
+
+
+def test_cube_matches_record_loop(cubed):
+    _, cube, records = cubed()
+    rng = random.Random(3)
+
+    for _ in range(60):
+        filters = {field: rng.choice(sorted({r[field] for r in records})) for field in rng.sample(FILTER_FIELDS, rng.randint(0, 3))}
+        threshold = rng.choice([-1, 0, 999, 1000, 25000, 49999, 100000, 10 ** 7, rng.randrange(0, 160000)])
+        assert_parity(cube, records, threshold, filters, rng.choice([None, 2, 4]), rng.choice([None, 3, 6]))
+
+
+def test_updates_move_rows_through_the_overlay(cubed):
+    columns, cube, records = cubed()
+    rng = random.Random(5)
+
+    changed = rng.sample(range(len(records)), 40)
+    original = dict(records[changed[0]])
+    for i in changed:
+        records[i]["income"] = rng.randrange(0, 150000)
+        records[i]["caste"] = rng.choice(["SC", "Unlisted"])
+        columns.update(records[i])
+        cube.update(records[i])
+
+    assert len(cube.overlay) == 40
+    for threshold in (20000, 75000, 10 ** 6):
+        assert_parity(cube, records, threshold, {})
+        assert_parity(cube, records, threshold, {"caste": "SC"})
+        assert_parity(cube, records, threshold, {"caste": "Unlisted", "sex": "Female"})
+
+    # Changing a row back restores it in the cube
+    row = changed[0]
+    records[row] = original
+    columns.update(records[row])
+    cube.update(records[row])
+    assert row not in cube.overlay
+    assert_parity(cube, records, 75000, {})
+
+
+def test_overlay_limit_triggers_rebuild(cubed, monkeypatch):
+    monkeypatch.setattr(policy_cube, "CUBE_OVERLAY_LIMIT", 5)
+    columns, cube, records = cubed(100)
+
+    for record in records[:10]:
+        record["income"] += 1
+        columns.update(record)
+        cube.update(record)
+
+    assert len(cube.overlay) < 5
+    assert_parity(cube, records, 60000, {"state": "Bihar"})
+
+
+def test_unsupported_filters_are_rejected(cubed):
+    _, cube, _ = cubed(20)
+
+    with pytest.raises(QueryError):
+        cube.simulate(1000, [{"field": "district", "op": "eq", "value": "Patna"}])
+    with pytest.raises(QueryError):
+        cube.simulate(1000, [{"field": "caste", "op": "in", "value": ["SC"]}])
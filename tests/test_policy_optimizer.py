@@ -0,0 +1,113 @@
+"""
+Tests for the income-threshold optimizer
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from census_columns import QueryError  # noqa: E402
+from policy_optimizer import highest_integer, lowest_integer, optimize  # noqa: E402
+
+
+@pytest.fixture
+def two_states(census):
+    # Incomes on a 100 grid, so many people share an income
+    columns, records = census(
+        300, seed=4,
+        state=["Bihar", "Jharkhand"],
+        income=lambda rng, r: rng.randrange(0, 100000, 100),
+    )
+    return columns, [r["income"] for r in records]
+
+
+def test_integer_searches():
+    assert lowest_integer(0, 100, lambda t: t * t >= 50) == 8
+    assert highest_integer(0, 100, lambda t: t * t <= 50) == 7
+    assert lowest_integer(0, 5, lambda t: False) is None
+    assert highest_integer(3, 5, lambda t: False) is None
+
+
+def test_coverage_target_gives_lowest_sufficient_threshold(two_states):
+    columns, incomes = two_states
+    rows = np.arange(len(incomes))
+
+    result = optimize(columns, rows, "beneficiaries", 120)
+
+    threshold = result["income_threshold"]
+    assert result["feasible"] and result["eligible_population"] >= 120
+    assert sum(1 for i in incomes if i <= threshold) >= 120
+    assert sum(1 for i in incomes if i <= threshold - 1) < 120
+
+    # Tied incomes can push the count past the target
+    assert optimize(columns, rows, "percentage", 50)["eligible_population"] >= 150
+    assert not optimize(columns, rows, "beneficiaries", 301)["feasible"]
+
+
+def test_budget_targets_give_highest_affordable_threshold(two_states):
+    columns, incomes = two_states
+    rows = np.arange(len(incomes))
+
+    def top_up_cost(t):
+        return sum(t - i for i in incomes if i <= t)
+
+    result = optimize(columns, rows, "budget", 2_000_000, benefit_mode="top_up")
+    threshold = result["income_threshold"]
+    assert top_up_cost(threshold) <= 2_000_000 < top_up_cost(threshold + 1)
+    assert result["total_cost"] == top_up_cost(threshold)
+
+    flat = optimize(columns, rows, "budget", 10_000, benefit_amount=100)
+    assert flat["eligible_population"] <= 100 and flat["total_cost"] <= 10_000
+
+
+def test_group_thresholds_share_a_coverage_rate(two_states):
+    columns, incomes = two_states
+
+    result = optimize(columns, np.arange(len(incomes)), "percentage", 40, group_by="state")
+
+    assert result["feasible"] and result["eligible_population"] >= 120
+    for group in result["thresholds"].values():
+        share = group["eligible_population"] / group["base_population"]
+        assert share == pytest.approx(result["coverage_rate"], abs=0.02)
+
+
+def test_many_small_groups_match_per_group_brute_force(census):
+    columns, records = census(
+        2000, seed=9,
+        pin_code=lambda rng, r: str(rng.randrange(120)),
+        income=lambda rng, r: rng.randrange(0, 20000, 500),
+    )
+
+    result = optimize(columns, np.arange(len(records)), "budget", 3_000_000, benefit_mode="top_up", group_by="pin_code")
+
+    assert len(result["thresholds"]) == len({r["pin_code"] for r in records})
+    total_cost = 0
+    for pin_code, group in result["thresholds"].items():
+        incomes = [r["income"] for r in records if r["pin_code"] == pin_code]
+        threshold = group["income_threshold"]
+        eligible = [i for i in incomes if threshold is not None and i <= threshold]
+        assert group["base_population"] == len(incomes)
+        assert group["eligible_population"] == len(eligible)
+        assert group.get("total_cost", 0) == sum(threshold - i for i in eligible)
+        total_cost += group.get("total_cost", 0)
+    assert result["total_cost"] == total_cost <= 3_000_000
+
+
+def test_invalid_requests(census):
+    columns, _ = census(10, state=["Bihar", "Jharkhand"], income=lambda rng, r: rng.randrange(0, 100000))
+    rows = np.arange(10)
+
+    with pytest.raises(QueryError):
+        optimize(columns, rows, "welfare", 1)
+    with pytest.raises(QueryError):
+        optimize(columns, rows, "budget", 100)
+    with pytest.raises(QueryError):
+        optimize(columns, rows, "budget", 100, benefit_amount=-5)
+    with pytest.raises(QueryError):
+        optimize(columns, rows, "percentage", 10, group_by="income")
+    with pytest.raises(QueryError):
+        optimize(columns, rows, "percentage", 10, group_by="state", threshold_max=5)
@@ -0,0 +1,65 @@
+"""
+Tests for income-threshold sweeps over sorted income arrays
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from census_columns import QueryError  # noqa: E402
+from policy_sweep import default_thresholds, sweep  # noqa: E402
+
+
+@pytest.fixture
+def swept(census):
+    # Incomes on a 250 grid, so thresholds land exactly on some of them
+    return census(
+        400, seed=11,
+        caste=["SC", "ST", "OBC", "General"],
+        income=lambda rng, r: rng.randrange(0, 150000, 250),
+        welfare_score=lambda rng, r: round(rng.uniform(0, 100), 2),
+        household_size=lambda rng, r: rng.randint(1, 6),
+    )
+
+
+def test_curve_matches_per_threshold_scan(swept):
+    columns, records = swept
+    rows = np.flatnonzero(columns.values["household_size"] >= 2)
+    thresholds = [0, 250, 40000, 75000, 149750, 200000]
+
+    result = sweep(columns, rows, thresholds, breakdowns=["caste", "household_size"])
+
+    base = [r for r in records if r["household_size"] >= 2]
+    assert result["base_population"] == len(base)
+    for j, t in enumerate(thresholds):
+        eligible = [r for r in base if r["income"] <= t]
+        assert result["eligible_population"][j] == len(eligible)
+        assert result["avg_income_eligible"][j] == (round(sum(r["income"] for r in eligible) / len(eligible)) if eligible else 0)
+        assert result["avg_welfare_eligible"][j] == pytest.approx(
+            np.mean([r["welfare_score"] for r in eligible]) if eligible else 0, abs=0.01
+        )
+        for caste, counts in result["breakdowns"]["caste"].items():
+            assert counts[j] == sum(1 for r in eligible if r["caste"] == caste)
+        assert sum(counts[j] for counts in result["breakdowns"]["household_size"].values()) == len(eligible)
+
+
+def test_breakdown_keys_follow_first_seen_order(swept):
+    columns, records = swept
+
+    result = sweep(columns, np.arange(len(records)), [10 ** 6], breakdowns=["caste"])
+
+    assert list(result["breakdowns"]["caste"]) == list(dict.fromkeys(r["caste"] for r in records))
+
+
+def test_default_thresholds_and_invalid_breakdowns(census):
+    columns, _ = census(50, income=lambda rng, r: rng.randrange(0, 100000))
+
+    thresholds = default_thresholds(np.array([0, 100000]), 0, None, 4)
+    assert thresholds == [0, 25000, 50000, 75000, 100000]
+
+    with pytest.raises(QueryError):
+        sweep(columns, np.arange(50), thresholds, breakdowns=["income"])
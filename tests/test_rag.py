@@ -0,0 +1,73 @@
+"""
+Tests for incremental indexing of the governance knowledge files
+"""
+
+import json
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+chromadb = pytest.importorskip("chromadb")
+pytest.importorskip("sentence_transformers")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "chatbot" / "chatbotbackend"))
+
+
+@pytest.fixture
+def rag(tmp_path, monkeypatch):
+    import rag as rag_module
+
+    # A throwaway collection and manifest instead of the persisted knowledge_db
+    collection = chromadb.EphemeralClient().create_collection(f"test_{uuid.uuid4().hex}")
+    monkeypatch.setattr(rag_module, "collection", collection)
+    monkeypatch.setattr(rag_module, "MANIFEST_PATH", str(tmp_path / "index_manifest.json"))
+    return rag_module
+
+
+def write_knowledge(directory, documents):
+    directory.mkdir(exist_ok=True)
+    with open(directory / "knowledge.jsonl", "w", encoding="utf-8") as f:
+        for doc in documents:
+            f.write(json.dumps(doc) + "\n")
+
+
+def test_only_new_changed_and_removed_documents_are_indexed(rag, tmp_path):
+    knowledge = tmp_path / "knowledge"
+    docs = [
+        {"id": "a", "text": "Supervisors review flagged records."},
+        {"id": "b", "text": "Policy makers simulate eligibility thresholds.", "category": "policy"},
+    ]
+    write_knowledge(knowledge, docs)
+
+    assert rag.index_governance_knowledge(str(knowledge)) == {"added": 2, "updated": 0, "deleted": 0, "unchanged": 0}
+    assert rag.index_governance_knowledge(str(knowledge)) == {"added": 0, "updated": 0, "deleted": 0, "unchanged": 2}
+
+    write_knowledge(knowledge, [
+        {"id": "a", "text": "Supervisors approve or reject flagged records."},
+        {"id": "c", "text": "State analysts compare districts."},
+    ])
+
+    assert rag.index_governance_knowledge(str(knowledge)) == {"added": 1, "updated": 1, "deleted": 1, "unchanged": 0}
+    assert sorted(rag.collection.get(include=[])["ids"]) == ["a", "c"]
+    assert rag.collection.get(ids=["a"])["documents"] == ["Supervisors approve or reject flagged records."]
+    with open(rag.MANIFEST_PATH, encoding="utf-8") as f:
+        assert sorted(json.load(f)["documents"]) == ["a", "c"]
+
+
+@pytest.mark.parametrize("empty", ["missing", "no_documents"])
+def test_missing_or_empty_directory_keeps_the_index(rag, tmp_path, empty):
+    knowledge = tmp_path / "knowledge"
+    write_knowledge(knowledge, [{"id": "a", "text": "Supervisors review flagged records."}])
+    rag.index_governance_knowledge(str(knowledge))
+    manifest = Path(rag.MANIFEST_PATH).read_text(encoding="utf-8")
+
+    target = tmp_path / "elsewhere"
+    if empty == "no_documents":
+        target.mkdir()
+        (target / "notes.txt").write_text("not a knowledge file", encoding="utf-8")
+
+    assert rag.index_governance_knowledge(str(target)) == {"added": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+    assert rag.collection.get(include=[])["ids"] == ["a"]
+    assert Path(rag.MANIFEST_PATH).read_text(encoding="utf-8") == manifest
@@ -0,0 +1,65 @@
+"""
+Tests for the version-invalidated analytics response cache
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from response_cache import ResponseCache, etag_matches  # noqa: E402
+
+
+def test_key_normalizes_params_and_includes_role():
+    key = ResponseCache.make_key("analytics/pincode-points", {"limit": 10, "state_filter": None}, "state_analyst")
+
+    assert key == ResponseCache.make_key("analytics/pincode-points", {"limit": 10}, "state_analyst")
+    assert key != ResponseCache.make_key("analytics/pincode-points", {"limit": 10}, "policy_maker")
+
+
+def test_version_bump_invalidates_entries():
+    cache = ResponseCache(max_bytes=1000)
+    cache.put("a", b'{"x":1}', cache.version)
+    assert cache.get("a").body == b'{"x":1}'
+
+    cache.bump_version()
+
+    assert cache.get("a") is None
+    assert cache.status()["bytes"] == 0
+
+
+def test_response_computed_before_a_write_is_not_cached():
+    cache = ResponseCache(max_bytes=1000)
+    version = cache.version
+    cache.bump_version()
+
+    entry = cache.put("a", b"stale", version)
+
+    assert entry.body == b"stale"
+    assert cache.get("a") is None
+
+
+def test_lru_eviction_respects_byte_budget():
+    cache = ResponseCache(max_bytes=10)
+    cache.put("a", b"1234", 0)
+    cache.put("b", b"1234", 0)
+    cache.get("a")
+    cache.put("c", b"1234", 0)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.status()["bytes"] == 8
+    assert cache.stats["evictions"] == 1
+
+
+def test_etag_depends_on_body_and_matches_if_none_match():
+    cache = ResponseCache()
+    first = cache.put("a", b'{"x":1}', 0)
+    cache.bump_version()
+    same_body = cache.put("a", b'{"x":1}', 1)
+
+    assert first.etag == same_body.etag and first.etag.startswith('W/"')
+    assert etag_matches(f'"other", {first.etag}', first.etag)
+    # Clients may send the validator back without the weak marker
+    assert etag_matches(first.etag.removeprefix("W/"), first.etag)
+    assert not etag_matches(None, first.etag)
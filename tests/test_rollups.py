@@ -0,0 +1,71 @@
+"""
+Tests for the state/district/pincode rollup cube
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from rollups import RollupCube  # noqa: E402
+
+
+def make_record(state, district, pin_code, income, flag_status="normal", welfare=50.0, leakage=0):
+    return {
+        "state": state, "district": district, "pin_code": pin_code, "income": income,
+        "flag_status": flag_status, "welfare_score": welfare, "scheme_leakage_flag": leakage,
+    }
+
+
+RECORDS = [
+    make_record("Bihar", "D-1", "100001", 1000, "review", leakage=1),
+    make_record("Bihar", "D-1", "100002", 3000, "priority", welfare=70.0),
+    make_record("Bihar", "D-2", "200001", 5000),
+    make_record("Jharkhand", "D-9", "900001", 2000, "approved"),
+]
+
+
+def test_states_match_legacy_shape():
+    cube = RollupCube()
+    cube.build(RECORDS)
+
+    assert cube.states() == {
+        "Bihar": {"total_population": 3, "normal": 1, "review": 1, "priority": 1, "avg_income": 3000,
+                  "avg_welfare_score": 56.67, "scheme_leakage_count": 1},
+        "Jharkhand": {"total_population": 1, "normal": 0, "review": 0, "priority": 0, "avg_income": 2000,
+                      "avg_welfare_score": 50.0, "scheme_leakage_count": 0},
+    }
+
+
+def test_subtree_depth_and_missing_paths():
+    cube = RollupCube()
+    cube.build(RECORDS)
+
+    national = cube.subtree((), depth=1)
+    assert national["level"] == "national" and national["total_population"] == 4
+    assert set(national["children"]) == {"Bihar", "Jharkhand"}
+    assert "children" not in national["children"]["Bihar"]
+
+    bihar = cube.subtree(("Bihar",), depth=2)
+    assert bihar["child_level"] == "district"
+    assert bihar["children"]["D-1"]["children"]["100002"]["priority"] == 1
+
+    assert cube.subtree(("Bihar", "D-1", "100001"), depth=3)["level"] == "pincode"
+    assert cube.subtree(("Bihar", "D-7")) is None
+
+
+def test_incremental_updates_match_rebuild():
+    cube = RollupCube()
+    records = [dict(r) for r in RECORDS]
+    cube.build(records)
+
+    # Review a record the way apply_review does, then drop Jharkhand's only record
+    cube.remove(records[1])
+    records[1]["flag_status"] = "approved"
+    cube.add(records[1])
+    cube.remove(records[3])
+
+    rebuilt = RollupCube()
+    rebuilt.build(records[:3])
+    assert cube.subtree((), depth=3) == rebuilt.subtree((), depth=3)
+    assert "Jharkhand" not in cube.states()
@@ -0,0 +1,103 @@
+"""
+Tests for the stratified sample and its estimators
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+import sampling  # noqa: E402
+from sampling import StratifiedSample  # noqa: E402
+
+
+def skewed_census(census, n=4000):
+    """Three Bihar records to each Odisha one, with Odisha incomes 100k higher."""
+    return census(
+        n, seed=2,
+        state=["Bihar", "Bihar", "Bihar", "Odisha"],
+        region=["urban", "rural"],
+        caste=["SC", "ST", "General"],
+        # Strata differ in income, which stratification should exploit
+        income=lambda rng, r: rng.randrange(0, 50000) + (100000 if r["state"] == "Odisha" else 0),
+    )
+
+
+def build(columns, seed=0):
+    sample = StratifiedSample(seed)
+    sample.build(columns)
+    return sample
+
+
+def test_samples_are_nested_and_cover_every_stratum(census):
+    columns, records = skewed_census(census)
+    sample = build(columns)
+
+    small, large = sample.rows(0.01), sample.rows(0.2)
+
+    assert set(small.tolist()) <= set(large.tolist())
+    strata = {(r["state"], r["region"]) for r in records}
+    for stratum in strata:
+        in_stratum = [i for i, r in enumerate(records) if (r["state"], r["region"]) == stratum]
+        taken = len(set(in_stratum) & set(small.tolist()))
+        assert taken == max(sampling.SAMPLE_MIN_PER_STRATUM, int(np.ceil(len(in_stratum) * 0.01)))
+
+
+def test_full_sample_is_exact(census):
+    columns, records = skewed_census(census, 500)
+    estimate = build(columns).estimate(1.0)
+    rows = estimate.rows
+    sc = columns.codes["caste"][rows] == columns.code_of("caste", "SC")
+    income = columns.values["income"][rows]
+
+    count = estimate.count(sc)
+    average = estimate.ratio(income * sc, sc)
+
+    expected = [r["income"] for r in records if r["caste"] == "SC"]
+    assert count == pytest.approx((len(expected),) * 3)
+    assert average == pytest.approx((np.mean(expected),) * 3)
+
+
+def test_intervals_cover_the_true_values(census):
+    columns, records = skewed_census(census)
+    truth_count = sum(1 for r in records if r["caste"] == "SC" and r["income"] < 120000)
+    truth_mean = np.mean([r["income"] for r in records])
+    covered_count = covered_mean = 0
+
+    for seed in range(40):
+        estimate = build(columns, seed).estimate(0.05)
+        rows = estimate.rows
+        mask = (columns.codes["caste"][rows] == columns.code_of("caste", "SC")) & (columns.values["income"][rows] < 120000)
+        _, low, high = estimate.count(mask)
+        covered_count += low <= truth_count <= high
+        _, low, high = estimate.ratio(columns.values["income"][rows], np.ones(len(rows)))
+        covered_mean += low <= truth_mean <= high
+
+    assert covered_count >= 32 and covered_mean >= 32
+
+
+def test_distribution_counts_sum_to_population_and_moves_restratify(census):
+    columns, records = skewed_census(census, 1000)
+    sample = build(columns)
+    estimate = sample.estimate(0.1)
+
+    counts, intervals = estimate.distribution(columns.codes["state"][estimate.rows], columns.categories["state"])
+    assert counts == {"Bihar": sum(1 for r in records if r["state"] == "Bihar"), "Odisha": sum(1 for r in records if r["state"] == "Odisha")}
+    assert intervals["Bihar"][0] == intervals["Bihar"][1]
+
+    records[0]["state"] = "Odisha" if records[0]["state"] == "Bihar" else "Bihar"
+    columns.update(records[0])
+    sample.update(records[0])
+    counts, _ = sample.estimate(0.1).distribution(columns.codes["state"][sample.rows(0.1)], columns.categories["state"])
+    assert counts["Odisha"] == sum(1 for r in records if r["state"] == "Odisha")
+
+
+def test_filter_mask_on_a_row_subset(census):
+    columns, _ = census(200, caste=["SC", "ST", "General"], income=lambda rng, r: rng.randrange(0, 80000))
+    rows = np.arange(0, 200, 7)
+    filters = [{"field": "caste", "op": "in", "value": ["SC", "ST"]}, {"field": "income", "op": "lt", "value": 40000}]
+
+    assert np.array_equal(columns.filter_mask(filters, rows), columns.filter_mask(filters)[rows])
@@ -0,0 +1,108 @@
+"""
+Tests for single-flight coalescing of identical in-flight computations
+"""
+
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+import httpx
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from singleflight import SingleFlight  # noqa: E402
+
+
+def test_concurrent_callers_share_one_computation():
+    flights = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def compute(key):
+        calls.append(key)
+        release.wait(5)
+        return f"result {key}"
+
+    async def main():
+        waiters = [
+            asyncio.ensure_future(flights.do(key, lambda key=key: asyncio.to_thread(compute, key)))
+            for key in ("a", "a", "a", "b")
+        ]
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.gather(*waiters)
+
+    results = asyncio.run(main())
+
+    assert results == ["result a", "result a", "result a", "result b"]
+    assert sorted(calls) == ["a", "b"]
+    assert flights.status() == {"leaders": 2, "coalesced": 2, "errors": 0, "in_flight": 0}
+
+
+def test_errors_reach_every_waiter_and_are_not_remembered():
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("bad query")
+
+    async def succeed():
+        return "ok"
+
+    async def main():
+        outcomes = await asyncio.gather(flights.do("k", fail), flights.do("k", fail), return_exceptions=True)
+        # The failed flight has landed; the next caller computes afresh
+        return outcomes, await flights.do("k", succeed)
+
+    outcomes, retried = asyncio.run(main())
+
+    assert [str(outcome) for outcome in outcomes] == ["bad query", "bad query"]
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+    assert retried == "ok"
+    assert flights.stats == {"leaders": 2, "coalesced": 1, "errors": 1}
+
+
+def test_cancelled_waiter_does_not_cancel_the_shared_computation():
+    flights = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return 42
+
+    async def main():
+        leader = asyncio.ensure_future(flights.do("k", slow))
+        follower = asyncio.ensure_future(flights.do("k", slow))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == 42
+
+
+def test_concurrent_summary_requests_compute_once_on_the_event_loop(api, monkeypatch):
+    compute = api.server.compute_analytics_summary
+    threads = []
+
+    def counted():
+        threads.append(threading.current_thread())
+        return compute()
+
+    monkeypatch.setattr(api.server, "compute_analytics_summary", counted)
+    api.server.response_cache.bump_version()
+    headers = {"Authorization": f"Bearer {api.tokens['state_analyst']}"}
+
+    async def main():
+        transport = httpx.ASGITransport(app=api.server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(client.get("/api/analytics/summary", headers=headers) for _ in range(3)))
+
+    responses = asyncio.run(main())
+
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    assert len({r.content for r in responses}) == 1
+    # Reviews change the derived stores on the loop, so reads must not move to a worker thread
+    assert threads == [threading.main_thread()]
@@ -0,0 +1,116 @@
+"""
+Tests for the HyperLogLog and KLL sketches and the per-area sketch cube
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from sketches import HyperLogLog, KLLSketch, SketchCube, hash64  # noqa: E402
+
+
+def rank_error(sorted_values, value, q):
+    """How far the rank of `value` is from q, as a fraction of the data."""
+    low = np.searchsorted(sorted_values, value, side="left") / len(sorted_values)
+    high = np.searchsorted(sorted_values, value, side="right") / len(sorted_values)
+    return 0.0 if low <= q <= high else min(abs(low - q), abs(high - q))
+
+
+def test_hll_is_exact_when_small_and_close_when_large():
+    small = HyperLogLog()
+    small.add_hashes(hash64([f"HH{i}" for i in range(300)] * 2))
+    assert small.estimate() == 300
+
+    large = HyperLogLog()
+    large.add_hashes(hash64([f"HH{i}" for i in range(50000)]))
+    assert abs(large.estimate() - 50000) / 50000 < 0.05
+
+
+def test_hll_merge_is_the_union():
+    left, right, both = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    left_ids, right_ids = [f"HH{i}" for i in range(0, 6000)], [f"HH{i}" for i in range(4000, 9000)]
+    left.add_hashes(hash64(left_ids))
+    right.add_hashes(hash64(right_ids))
+    both.add_hashes(hash64(left_ids + right_ids))
+
+    merged = HyperLogLog.union([left, right])
+
+    assert merged.estimate() == both.estimate()
+    assert abs(merged.estimate() - 9000) / 9000 < 0.05
+
+
+def test_kll_is_exact_until_it_compacts():
+    values = np.array([5.0, 1.0, 3.0, 2.0, 4.0])
+    sketch = KLLSketch()
+    sketch.update_many(values)
+
+    qs = [0.0, 0.2, 0.5, 0.9, 1.0]
+    assert sketch.quantiles(qs) == np.quantile(values, qs, method="inverted_cdf").tolist()
+
+
+def test_kll_rank_error_stays_small_across_merges():
+    rng = np.random.default_rng(4)
+    parts = [rng.lognormal(11, 0.8, size) for size in (3, 50, 700, 20000, 40000)]
+    sketches = []
+    for part in parts:
+        sketch = KLLSketch()
+        for chunk in np.array_split(part, 7):
+            sketch.update_many(chunk)
+        sketches.append(sketch)
+    merged = KLLSketch.union(sketches)
+    values = np.sort(np.concatenate(parts))
+
+    qs = [0.01, 0.25, 0.5, 0.75, 0.9, 0.99]
+    assert merged.n == len(values)
+    assert sum(len(level) for level in merged.levels) < 2000
+    for q, estimate in zip(qs, merged.quantiles(qs)):
+        assert rank_error(values, estimate, q) < 0.02
+
+
+def test_cube_matches_brute_force_and_follows_updates(census):
+    # About 125 records per pincode, well under the 512 households kept as exact hashes
+    columns, records = census(
+        3000, seed=6,
+        household_id=lambda rng, r: f"HH{rng.randrange(800)}",
+        state=["Bihar", "Odisha"],
+        district=lambda rng, r: f"{r['state']}-{rng.randrange(3)}",
+        pin_code=lambda rng, r: f"{r['district']}-{rng.randrange(4)}",
+        income=lambda rng, r: rng.randrange(0, 200000),
+        welfare_score=lambda rng, r: round(rng.uniform(0, 100), 2),
+    )
+    cube = SketchCube()
+    cube.build(columns)
+
+    def check(path):
+        node = cube.subtree(path, 0, (0.5,))
+        members = [r for r in records if tuple(r[f] for f in ("state", "district", "pin_code")[:len(path)]) == path]
+        assert node["population"] == len(members)
+        households = len({r["household_id"] for r in members})
+        # Exact below 512 households, where the sketch keeps hashes rather than registers
+        assert abs(node["households"] - households) <= (0 if households <= 512 else 0.05 * households)
+        incomes = np.sort([r["income"] for r in members])
+        assert rank_error(incomes, node["income"]["p50"], 0.5) < 0.02
+
+    check(())
+    check(("Odisha", "Odisha-1"))
+
+    # Move a record's income to the top and its household elsewhere
+    record = next(r for r in records if r["pin_code"] == "Odisha-1-2")
+    record["income"], record["household_id"] = 10 ** 7, "HH-new"
+    columns.update(record)
+    cube.update(record)
+    leaf = cube.subtree(("Odisha", "Odisha-1", "Odisha-1-2"), 0, (1.0,))
+    assert leaf["income"]["p100"] == 10 ** 7
+    check(("Odisha", "Odisha-1", "Odisha-1-2"))
+    check(())
+
+    # A record moving pincode rebuilds the hierarchy
+    record["state"], record["district"], record["pin_code"] = "Bihar", "Bihar-0", "Bihar-0-9"
+    columns.update(record)
+    cube.update(record)
+    check(("Bihar", "Bihar-0", "Bihar-0-9"))
+    check(("Odisha",))
+    check(())
@@ -0,0 +1,48 @@
+"""
+Tests for the synthetic census generator used by the benchmarks
+"""
+
+import json
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend" / "benchmarks"))
+
+from synthetic_census import generate_records, parse_rows, write_dataset  # noqa: E402
+
+
+EXPECTED_FIELDS = {
+    "individual_id", "household_id", "age", "sex", "relationship_to_head", "caste_category",
+    "monthly_income", "urban_rural", "pin_code", "state", "timestamp", "welfare_score",
+    "ration_card_type", "scheme_enrollment_count", "scheme_leakage_flag", "exclusion_error_risk_score",
+    "employment_status", "occupation_category", "sector", "housing_type", "water_source",
+    "toilet_access", "cooking_fuel", "internet_access", "household_size", "parent_id", "spouse_id",
+}
+
+
+def test_records_match_schema_and_households_are_consistent():
+    records = list(generate_records(1000, seed=1))
+
+    assert len(records) == 1000
+    assert all(set(r) == EXPECTED_FIELDS for r in records)
+
+    households = defaultdict(list)
+    for r in records:
+        households[r["household_id"]].append(r)
+    for members in list(households.values())[:-1]:
+        assert len(members) == members[0]["household_size"]
+        assert len({(m["state"], m["pin_code"]) for m in members}) == 1
+        assert members[0]["relationship_to_head"] == "Head"
+
+
+def test_generation_is_deterministic():
+    assert list(generate_records(50, seed=7)) == list(generate_records(50, seed=7))
+
+
+def test_json_and_jsonl_outputs(tmp_path):
+    as_json = json.loads(write_dataset(tmp_path / "c.json", 20, "json").read_text())
+    as_jsonl = [json.loads(line) for line in write_dataset(tmp_path / "c.jsonl", 20, "jsonl").read_text().splitlines()]
+
+    assert as_json == as_jsonl == list(generate_records(20))
+    assert parse_rows("1m") == 1_000_000 and parse_rows("2500") == 2500